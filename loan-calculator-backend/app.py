@@ -1,19 +1,118 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, Header, HTTPException, Request
+from pydantic import BaseModel, Field, ValidationError, confloat, conint
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import date
 from decimal import Decimal, getcontext, ROUND_HALF_DOWN, ROUND_HALF_UP
-from dateutil.relativedelta import relativedelta
+import copy
+import csv
+import hashlib
+import itertools
 import io
-from fastapi.responses import StreamingResponse
-from typing import Optional, List
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, List, Union
 import xlsxwriter
+from arm_simulation import DEFAULT_PERCENTILES, SIMULATION_MODELS, simulate_arm
+from arrow_export import COLUMNAR_FILE_EXTENSIONS, COLUMNAR_MEDIA_TYPES, ColumnarScheduleWriter
+from cents_kernel import KernelFallback, amortize_in_cents, supports_cents_kernel
+from engine_state import AmortizationScenario, EngineState, ScheduleCheckpoints
+from execution import DeadlineExceeded, ExecutionLane, Overloaded
+from goal_seek import BracketedSearch, annuity_periods, annuity_principal
+from loan_book import LEDGER_PERIODS, LOAN_BOOK_FORMATS, CashFlowLedger, iter_loan_rows, project_loan_book
+from metrics import (REGISTRY, Gauge, InstrumentationMiddleware, captured_metrics, instrumented, record_calculation,
+                     record_error, replay_metrics, timed_phase)
+from payment_calendar import get_payment_calendar, get_periods_per_year, next_payment_date
+from result_cache import ResultCache, canonical_request_hash
+from rollups import ScheduleRollup
+from schedule import SCHEDULE_FIELDS, SCHEDULE_HEADERS, Schedule
+from schedule_store import ScheduleStore
+from vector_engine import amortize_fixed_rate
+from wire_formats import (JSON_MEDIA_TYPE, compress, encode_result, negotiate_encoding, negotiate_media_type,
+                          offered_media_types, representation_etag)
 
 app = FastAPI()
 
 # Set decimal precision higher to ensure accurate calculations
 getcontext().prec = 28
 
+# Upper bound on average-premium simulations when solving for the insured payment
+INSURANCE_SOLVER_MAX_ITERATIONS = 64
+# Fixed-point steps tried first, and the step size at which they count as settled
+INSURANCE_FIXED_POINT_STEPS = 48
+INSURANCE_SOLVER_TOLERANCE = Decimal('0.05')
+
+# Payments between engine state checkpoints kept with cached results (0 disables checkpoints)
+CHECKPOINT_INTERVAL = int(os.environ.get("CHECKPOINT_INTERVAL", 60))
+
+# Engine for single-loan calculations: "cents" runs loans the integer-cents kernel can take
+# (cents_kernel.py) on it and everything else on the Decimal engine, "decimal" runs all of them on
+# the Decimal engine
+SCALAR_KERNELS = ("cents", "decimal")
+SCALAR_KERNEL = os.environ.get("SCALAR_KERNEL", "cents")
+
+# Process pool settings for /calculate-batch
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", os.cpu_count() or 1))
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", 8))
+BATCH_MAX_PENDING_CHUNKS = int(os.environ.get("BATCH_MAX_PENDING_CHUNKS", BATCH_MAX_WORKERS * 4))
+# /project-loan-book runs on the same pool, in larger chunks: a chunk's fixed-rate loans are amortized
+# together by the vector engine. At most LOAN_BOOK_MAX_REPORTED_FAILURES failed rows are listed
+LOAN_BOOK_CHUNK_SIZE = int(os.environ.get("LOAN_BOOK_CHUNK_SIZE", 256))
+LOAN_BOOK_MAX_REPORTED_FAILURES = int(os.environ.get("LOAN_BOOK_MAX_REPORTED_FAILURES", 1000))
+
+# Execution lanes for /calculate-loan-amortization (see execution.py). Loans whose estimated cost
+# (payments, times INSURANCE_COST_FACTOR when insured, times the number of compared scenarios)
+# reaches HEAVY_COST_THRESHOLD run in the heavy lane. A lane with 0 workers calculates in the
+# request thread
+LIGHT_LANE_WORKERS = int(os.environ.get("LIGHT_LANE_WORKERS", os.cpu_count() or 1))
+LIGHT_LANE_MAX_QUEUED = int(os.environ.get("LIGHT_LANE_MAX_QUEUED", LIGHT_LANE_WORKERS * 8))
+HEAVY_LANE_WORKERS = int(os.environ.get("HEAVY_LANE_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+HEAVY_LANE_MAX_QUEUED = int(os.environ.get("HEAVY_LANE_MAX_QUEUED", HEAVY_LANE_WORKERS * 2))
+HEAVY_COST_THRESHOLD = int(os.environ.get("HEAVY_COST_THRESHOLD", 4000))
+INSURANCE_COST_FACTOR = 4
+# Default and maximum calculation deadline; clients may ask for less with an X-Request-Timeout header
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 30))
+
+light_lane = ExecutionLane("light", LIGHT_LANE_WORKERS, LIGHT_LANE_MAX_QUEUED)
+heavy_lane = ExecutionLane("heavy", HEAVY_LANE_WORKERS, HEAVY_LANE_MAX_QUEUED)
+
+# Cache of serialized /calculate-loan-amortization responses
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", 300))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    size_of=lambda entry: len(entry[0]) + entry[2].nbytes(),
+)
+REGISTRY.register(Gauge(
+    "loan_result_cache", "Result cache entries, bytes and counters",
+    lambda: {(stat,): value for stat, value in result_cache.stats().items()}, ("stat",)))
+
+# JSON responses (in any negotiated format, see wire_formats.py) are compressed when the client
+# accepts gzip or brotli and their JSON form is at least this long
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+
+# Persistent store of computed schedules (schedule_store.py). A schedule's ID is its request's cache
+# key; JSON responses with a schedule carry it in X-Schedule-Id. The store is off unless
+# SCHEDULE_STORE_PATH names the database file (e.g. on a data volume)
+SCHEDULE_STORE_PATH = os.environ.get("SCHEDULE_STORE_PATH", "")
+SCHEDULE_STORE_MAX_BYTES = int(os.environ.get("SCHEDULE_STORE_MAX_BYTES", 256 * 1024 * 1024))
+
+schedule_store = ScheduleStore(SCHEDULE_STORE_PATH, SCHEDULE_STORE_MAX_BYTES) if SCHEDULE_STORE_PATH else None
+if schedule_store is not None:
+    REGISTRY.register(Gauge(
+        "loan_schedule_store", "Schedule store entries, bytes and evictions",
+        lambda: {(stat,): value for stat, value in schedule_store.stats().items()}, ("stat",)))
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -21,8 +120,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Schedule-Id"],
 )
 
+# Request latency per endpoint (labelled by route template), Server-Timing and on-demand profiling
+# (see metrics.py)
+app.add_middleware(InstrumentationMiddleware)
+
+class PeriodOverride(BaseModel):
+    payment_number: int = Field(..., ge=1, description="Payment the override takes effect on")
+    interest_rate: Optional[float] = Field(default=None, ge=0, description="Annual interest rate (percentage) from this payment on; later adjustments of an adjustable-rate loan start from it")
+    payment_amount: Optional[float] = Field(default=None, ge=0, description="Payment amount from this payment on")
+    additional_principal: Optional[float] = Field(default=None, ge=0, description="Additional principal per period from this payment on")
+    lump_sum: Optional[float] = Field(default=None, ge=0, description="Extra principal paid with this payment only")
+
+class Rollup(BaseModel):
+    by: str = Field(..., description="'calendar_year', 'fiscal_year' or 'periods'")
+    fiscal_year_start_month: int = Field(default=1, ge=1, le=12, description="First month of the fiscal year; fiscal years are named for the year they end in")
+    periods: Optional[int] = Field(default=None, ge=1, description="Payments per bucket ('periods')")
+
 class RateAdjustment(BaseModel):
     effective_date: date = Field(..., description="Date when the index rate adjustment takes effect")
     index_rate: float = Field(..., ge=0, description="New index rate (percentage)")
@@ -39,6 +155,12 @@ class LoanRequest(BaseModel):
     amort_term: Optional[int] = Field(None, ge=1, description="Amortization term in payments (optional)")
     additional_principal: float = Field(default=0.0, ge=0, description="Additional principal payment per period")
     credit_insurance: bool = Field(default=False, description="Include credit insurance")
+    summary_only: bool = Field(default=False, description="Return only the summary totals, without the amortization schedule")
+    compare_additional_principal: Optional[List[confloat(ge=0)]] = Field(default=None, description="Additional principal amounts to report interest savings for, computed in the same pass")
+    response_format: Optional[str] = Field(default=None, description="'ndjson' or 'csv' to stream the schedule, or 'arrow'/'parquet' for a columnar file, instead of returning one JSON document")
+    loan_id: Optional[str] = Field(default=None, description="Caller's identifier for the loan, carried into columnar exports")
+    period_overrides: Optional[List[PeriodOverride]] = Field(default=None, description="Changes from a given payment on (rate, payment, additional principal) or to one payment (lump sum)")
+    rollup: Optional[Rollup] = Field(default=None, description="Also report totals by calendar year, fiscal year or every N payments; with summary_only, instead of the schedule")
 
     # Fields for adjustable-rate loans
     initial_interest_rate: Optional[float] = Field(default=None, ge=0, description="Initial interest rate for adjustable-rate loans")
@@ -52,11 +174,42 @@ class LoanRequest(BaseModel):
     adjustment_frequency: Optional[int] = Field(default=None, ge=1, description="Number of periods between rate adjustments after fixed period")
     minimum_interest_rate: Optional[float] = Field(default=0.0, ge=0, description="Minimum allowable interest rate during the loan term")
 
+class SweepRange(BaseModel):
+    start: float = Field(..., description="First value")
+    stop: float = Field(..., description="Last value (included when a whole number of steps from start)")
+    step: float = Field(..., gt=0, description="Distance between values")
+
+class SweepRequest(BaseModel):
+    base: LoanRequest = Field(..., description="Loan the swept values are applied to")
+    annual_interest_rate: Optional[Union[List[confloat(ge=0)], SweepRange]] = Field(default=None, description="Annual interest rates to sweep (fixed-rate loans)")
+    loan_term: Optional[Union[List[conint(ge=1)], SweepRange]] = Field(default=None, description="Loan terms to sweep, in payments")
+    amort_term: Optional[Union[List[conint(ge=1)], SweepRange]] = Field(default=None, description="Amortization terms to sweep, in payments")
+    payment_amount: Optional[Union[List[confloat(ge=0)], SweepRange]] = Field(default=None, description="Payment amounts to sweep")
+    additional_principal: Optional[Union[List[confloat(ge=0)], SweepRange]] = Field(default=None, description="Additional principal amounts to sweep")
+
+class ArmSimulationRequest(BaseModel):
+    loan: LoanRequest = Field(..., description="Adjustable-rate loan to simulate; its rate_adjustments are replaced by simulated index paths")
+    paths: int = Field(default=1000, ge=1, description="Number of index paths to simulate")
+    seed: Optional[int] = Field(default=None, ge=0, description="Random seed; the response reports the seed used")
+    model: str = Field(default="random_walk", description="'random_walk' or 'mean_reverting'")
+    volatility: float = Field(default=1.0, ge=0, description="Annual volatility of the index, in percentage points")
+    mean_reversion: float = Field(default=0.5, ge=0, description="Speed of reversion to long_run_index per year (mean_reverting)")
+    long_run_index: Optional[float] = Field(default=None, ge=0, description="Long-run index rate (mean_reverting); defaults to the initial index rate")
+    percentiles: List[confloat(ge=0, le=100)] = Field(default=list(DEFAULT_PERCENTILES), description="Percentiles to report")
+
+class SolveRequest(BaseModel):
+    loan: LoanRequest = Field(..., description="Loan with every field fixed except solve_for")
+    solve_for: str = Field(..., description="'loan_amount', 'annual_interest_rate', 'loan_term', 'additional_principal' or 'payment_amount'")
+    target: str = Field(..., description="'payment_amount', 'total_interest', 'actual_loan_term' or 'payoff_date'")
+    value: Optional[float] = Field(default=None, ge=0, description="Target payment amount, total interest or number of payments")
+    payoff_date: Optional[date] = Field(default=None, description="Target payoff date (target 'payoff_date')")
+
 class LoanCalculator:
     def __init__(self, principal, annual_interest_rate, initial_interest_rate, payment_amount, payment_frequency, first_due_date,
                  days_method, year_basis, loan_term, amort_term=None, additional_principal=0.0, credit_insurance=False,
                  initial_index_rate=None, margin=0.0, rate_adjustments=None, max_rate_change=None, max_interest_rate=None,
-                 adjust_payment=True, fixed_rate_period=None, adjustment_frequency=None, minimum_interest_rate=0.0):
+                 adjust_payment=True, fixed_rate_period=None, adjustment_frequency=None, minimum_interest_rate=0.0,
+                 period_overrides=None, rollup=None):
         self.principal = Decimal(str(principal))
         self.payment_amount = Decimal(str(payment_amount)) if payment_amount is not None else None
         self.payment_frequency = payment_frequency
@@ -93,6 +246,7 @@ class LoanCalculator:
             # Fixed-rate loan
             self.current_interest_rate = Decimal(str(annual_interest_rate)) / Decimal('100')
             self.is_adjustable_rate = False
+            self.current_index_rate = None
         else:
             raise ValueError("Either annual_interest_rate or initial_interest_rate must be provided.")
 
@@ -104,9 +258,31 @@ class LoanCalculator:
         # Sort rate adjustments by effective date
         self.rate_adjustments.sort(key=lambda x: x['effective_date'])
 
+        # Period overrides by payment number, applied in the order given
+        self.period_overrides = {}
+        for override in period_overrides or []:
+            self.period_overrides.setdefault(override['payment_number'], []).append(override)
+
+        # Rollup options (ScheduleRollup arguments); each iter_schedule() run fills a new self.rollup
+        self.rollup_options = rollup
+        self.rollup = ScheduleRollup(**rollup) if rollup else None
+
+        # Seconds spent per phase (payment, insurance_solver, amortization, totals), for metrics
+        self.phase_timings = {}
+
+        # Insurance solver statistics, reported in the response metadata
+        self.insurance_solver_iterations = 0
+        self.insurance_simulated_periods = 0
+        self.average_insurance_premiums = {}
+
         # Calculate payment amount if not provided
+        self.payment_amount_provided = self.payment_amount is not None
         if self.payment_amount is None:
             self.payment_amount = self.calculate_payment_amount()
+        self.initial_payment_amount = self.payment_amount
+
+        # Additional-principal scenarios of the last iter_schedule() run, keyed by amount
+        self.scenarios = {}
 
 
     def calculate_insurance_premium(self, balance):
@@ -115,10 +291,14 @@ class LoanCalculator:
         max_insurance = Decimal('45.00')
         return min(insurance_premium.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), max_insurance)
 
-    def calculate_payment_amount(self):
+    def add_phase_time(self, phase, started):
+        self.phase_timings[phase] = self.phase_timings.get(phase, 0.0) + time.perf_counter() - started
+
+    def calculate_payment_amount(self, additional_principal=None):
+        started = time.perf_counter()
         # Initial payment amount without insurance
         if self.days_method == '30 Day Month' and self.year_basis == 360:
-            payment_without_insurance = self.calculate_loan_payment_30_360()
+            payment_without_insurance = self.calculate_loan_payment_30_360(additional_principal)
         else:
             payment_without_insurance = self.calculate_loan_payment_actual()
 
@@ -127,47 +307,103 @@ class LoanCalculator:
         payment = payment_without_insurance
 
         if self.credit_insurance:
-            # Iteratively adjust payment amount to include insurance premiums
-            max_iterations = 500
-            tolerance = Decimal('0.05')
-            for _ in range(max_iterations):
-                previous_payment = payment
-                # Estimate average insurance premium based on current payment
-                average_insurance_premium = self.calculate_average_insurance_premium(payment)
-                # Adjust payment amount
-                payment = (payment_without_insurance + average_insurance_premium).quantize(Decimal('0.01'), rounding=ROUND_HALF_DOWN)
-                # Check for convergence
-                if abs(payment - previous_payment) < tolerance:
-                    break
-            else:
-                raise Exception("Failed to converge on payment amount with insurance")
+            solver_started = time.perf_counter()
+            payment = self.solve_insured_payment(payment_without_insurance)
+            self.add_phase_time('insurance_solver', solver_started)
         else:
             payment = payment_without_insurance
 
+        self.add_phase_time('payment', started)
         return payment
 
+    def solve_insured_payment(self, payment_without_insurance):
+        # Step the payment to the payment without insurance plus the average insurance premium at the
+        # current payment until a step moves it by less than INSURANCE_SOLVER_TOLERANCE, which is the
+        # cent the calculator has always settled on. The average premium never increases with the
+        # payment, so residual(payment) is monotone decreasing and the steps land on alternate sides of
+        # the fixed point, bracketing it. When the steps cycle, or haven't settled within
+        # INSURANCE_FIXED_POINT_STEPS, secant steps narrow that bracket instead, with a bisection step
+        # whenever a secant step fails to halve it, so the bracket (at most $45.00 wide) closes within
+        # INSURANCE_SOLVER_MAX_ITERATIONS evaluations.
+        cent = Decimal('0.01')
+
+        def residual(payment):
+            self.insurance_solver_iterations += 1
+            return payment_without_insurance + self.calculate_average_insurance_premium(payment) - payment
+
+        low = high = None
+        payment = payment_without_insurance
+        seen = {payment}
+        for _ in range(INSURANCE_FIXED_POINT_STEPS):
+            payment_residual = residual(payment)
+            if abs(payment_residual) < INSURANCE_SOLVER_TOLERANCE:
+                return payment + payment_residual
+            if payment_residual > 0:
+                if low is None or payment > low:
+                    low, low_residual = payment, payment_residual
+            elif high is None or payment < high:
+                high, high_residual = payment, payment_residual
+            payment += payment_residual
+            if payment in seen:
+                # The steps cycle without settling
+                break
+            seen.add(payment)
+        if high is None:
+            high = payment
+            high_residual = residual(high)
+
+        bisect = False
+        while high_residual != 0 and high - low > cent:
+            if self.insurance_solver_iterations >= INSURANCE_SOLVER_MAX_ITERATIONS:
+                break
+            if bisect:
+                candidate = (low + high) / 2
+            else:
+                candidate = low + (high - low) * low_residual / (low_residual - high_residual)
+            candidate = min(max(candidate.quantize(cent, rounding=ROUND_HALF_DOWN), low + cent), high - cent)
+
+            width = high - low
+            candidate_residual = residual(candidate)
+            if candidate_residual > 0:
+                low, low_residual = candidate, candidate_residual
+            else:
+                high, high_residual = candidate, candidate_residual
+            bisect = high - low > width / 2
+
+        # Without an exact fixed point, use the smallest payment that covers the average premium
+        return high
+
     def calculate_average_insurance_premium(self, payment_amount):
         # Ensure payment_amount is Decimal
         payment_amount = Decimal(payment_amount)
         # Estimate average insurance premium over the loan term
+        # The simulation is deterministic per payment, so reuse earlier results (e.g. the solver's last
+        # step when calculate() derives the payment without insurance)
+        if payment_amount in self.average_insurance_premiums:
+            return self.average_insurance_premiums[payment_amount]
+
         total_insurance = Decimal('0.00')
         balance = self.principal
         periods = self.amort_term
+        periods_per_year = self.get_periods_per_year()
 
         for _ in range(periods):
+            self.insurance_simulated_periods += 1
             insurance_premium = self.calculate_insurance_premium(balance)
             total_insurance += insurance_premium
             # Estimate principal reduction (approximate)
-            interest = balance * self.current_interest_rate / self.get_periods_per_year()
+            interest = balance * self.current_interest_rate / periods_per_year
             principal_paid = payment_amount - insurance_premium - interest
             balance -= principal_paid
             if balance <= Decimal('0.00'):
                 break
 
         average_insurance_premium = total_insurance / Decimal(str(periods))
-        return average_insurance_premium.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        average_insurance_premium = average_insurance_premium.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        self.average_insurance_premiums[payment_amount] = average_insurance_premium
+        return average_insurance_premium
 
-    def calculate_loan_payment_30_360(self):
+    def calculate_loan_payment_30_360(self, additional_principal=None):
         periods_per_year = self.get_periods_per_year()
         rate_per_period = self.current_interest_rate / Decimal('12')  # Monthly rate
         n = self.amort_term
@@ -176,7 +412,7 @@ class LoanCalculator:
         payment = (self.principal * rate_per_period * (1 + rate_per_period) ** n) / ((1 + rate_per_period) ** n - 1)
 
         # Adjust for additional principal
-        payment += self.additional_principal
+        payment += self.additional_principal if additional_principal is None else additional_principal
 
         return payment
 
@@ -208,29 +444,104 @@ class LoanCalculator:
 
         return payment
 
-    def calculate(self):
-        schedule = []
-        balance = self.principal
-        payment_number = 1
-        current_date = self.first_due_date
-        total_interest = Decimal('0')
-        total_insurance = Decimal('0')
-        total_additional_principal = Decimal('0')
-
+    def scenario_payment_amount(self, additional_principal):
+        # Payment a separate calculator with this additional principal would use
+        if self.payment_amount_provided or additional_principal == self.additional_principal:
+            return self.initial_payment_amount
+        return self.calculate_payment_amount(additional_principal)
+
+    def iter_schedule(self, summary_only=False, scenarios=None, schedule=None, resume=None, checkpoints=None):
+        # Appends each schedule row to schedule (a new Schedule by default, kept in self.schedule) and
+        # yields after each one, so callers can consume rows as they are produced; nothing is appended
+        # in summary-only mode. Totals are kept as running totals
+        # in self.total_interest, self.total_insurance, self.total_additional_principal,
+        # self.total_payments and self.total_payment_amount, and self.payment_amount_no_insurance
+        # is set once iteration ends.
+        #
+        # scenarios is an optional list of other additional principal amounts (e.g. 0.0 for the
+        # interest savings baseline). Each is amortized in the same loop, sharing the payment dates,
+        # day counts and rate timeline, and only its totals are kept in self.scenarios.
+        #
+        # checkpoints, a ScheduleCheckpoints, collects an EngineState every CHECKPOINT_INTERVAL
+        # payments. resume, a ScheduleCheckpoints from ScheduleCheckpoints.before(), continues from its
+        # latest state, for the same loan with the same scenarios up to that payment; its schedule rows
+        # are copied into schedule up front, without yielding.
+        started = time.perf_counter()
+        self.schedule = schedule = schedule if schedule is not None else Schedule()
+        self.payment_amount_no_insurance = None
         periods_per_year = self.get_periods_per_year()
-        current_interest_rate = self.current_interest_rate
-        rate_adjustment_index = 0
+        actual_days = self.days_method == 'Actual'
+        if resume is None:
+            self.scenarios = {}
+            for amount in scenarios or []:
+                additional_principal = Decimal(str(amount))
+                self.scenarios[amount] = AmortizationScenario(
+                    additional_principal, self.principal, self.scenario_payment_amount(additional_principal))
+            self.total_interest = Decimal('0')
+            self.total_insurance = Decimal('0')
+            self.total_additional_principal = Decimal('0')
+            self.total_payments = 0
+            self.total_payment_amount = Decimal('0')
+            self.rollup = ScheduleRollup(**self.rollup_options) if self.rollup_options else None
+            balance = self.principal
+            payment_number = 1
+            current_interest_rate = base_interest_rate = self.current_interest_rate
+            additional_principal = self.additional_principal
+            rate_adjustment_index = 0
+        else:
+            state = resume.latest
+            self.scenarios = copy.deepcopy(state.scenarios)
+            (self.total_interest, self.total_insurance, self.total_additional_principal,
+             self.total_payments, self.total_payment_amount) = state.totals
+            balance = state.balance
+            payment_number = state.payment_number
+            current_interest_rate = state.interest_rate
+            base_interest_rate = state.base_interest_rate
+            self.current_index_rate = state.index_rate
+            self.payment_amount = state.payment_amount
+            additional_principal = state.additional_principal
+            rate_adjustment_index = state.rate_adjustment_index
+            self.insurance_solver_iterations, self.insurance_simulated_periods, premiums = state.insurance_solver
+            self.average_insurance_premiums = dict(premiums)
+            self.rollup = copy.deepcopy(state.rollup)
+            if not summary_only and resume.schedule is not None:
+                schedule.extend(resume.schedule)
+            if checkpoints is not None:
+                checkpoints.states.extend(resume.states)
+
+        # Due dates and day counts come from the shared calendar, regenerated longer if the loan outlives it
+        calendar = self.get_payment_calendar(max(self.loan_term, payment_number))
+        resumed_at = payment_number
+
+        while balance > 0 or any(scenario.is_active() for scenario in self.scenarios.values()):
+            period = payment_number - 1
+            if period >= len(calendar):
+                calendar = self.get_payment_calendar(payment_number * 2)
+                if period >= len(calendar):
+                    # The next due date can't be represented; raise the error computing it gives
+                    self.get_next_payment_date(calendar.dates[period])
+            current_date = calendar.dates[period]
+
+            if (checkpoints is not None and CHECKPOINT_INTERVAL > 0 and payment_number != resumed_at
+                    and (payment_number - 1) % CHECKPOINT_INTERVAL == 0):
+                checkpoints.states.append(EngineState(
+                    payment_number, current_date, balance, current_interest_rate, base_interest_rate,
+                    self.current_index_rate, self.payment_amount, additional_principal, rate_adjustment_index,
+                    (self.total_interest, self.total_insurance, self.total_additional_principal,
+                     self.total_payments, self.total_payment_amount),
+                    copy.deepcopy(self.scenarios),
+                    (self.insurance_solver_iterations, self.insurance_simulated_periods, dict(self.average_insurance_premiums)),
+                    copy.deepcopy(self.rollup)))
 
-        while balance > 0:
             # Determine the current interest rate
             if not self.is_adjustable_rate:
                 # Fixed-rate loan
-                current_interest_rate = self.current_interest_rate
+                current_interest_rate = base_interest_rate
             else:
                 # Adjustable-rate loan
                 if payment_number <= self.fixed_rate_period:
                     # During fixed-rate period
-                    current_interest_rate = self.current_interest_rate
+                    current_interest_rate = base_interest_rate
                 else:
                     # After fixed-rate period
                     # Check if it's time to adjust the interest rate
@@ -281,23 +592,45 @@ class LoanCalculator:
                         if self.adjust_payment:
                             # Recalculate payment amount to pay off over remaining term
                             remaining_payments = self.loan_term - payment_number + 1
-                            self.payment_amount = self.recalculate_payment_amount(balance, current_interest_rate, periods_per_year, remaining_payments)
+                            if balance > 0:
+                                self.payment_amount = self.recalculate_payment_amount(balance, current_interest_rate, periods_per_year, remaining_payments)
+                            for scenario in self.scenarios.values():
+                                if scenario.is_active():
+                                    scenario.payment_amount = self.recalculate_payment_amount(scenario.balance, current_interest_rate, periods_per_year, remaining_payments)
                     else:
                         # Keep current_interest_rate and payment_amount
                         pass  # No changes in this period
 
+            lump_sum = Decimal('0')
+            for override in self.period_overrides.get(payment_number, ()):
+                if override.get('interest_rate') is not None:
+                    current_interest_rate = base_interest_rate = Decimal(str(override['interest_rate'])) / Decimal('100')
+                if override.get('payment_amount') is not None:
+                    self.payment_amount = Decimal(str(override['payment_amount']))
+                    for scenario in self.scenarios.values():
+                        scenario.payment_amount = self.payment_amount
+                if override.get('additional_principal') is not None:
+                    additional_principal = Decimal(str(override['additional_principal']))
+                if override.get('lump_sum') is not None:
+                    lump_sum += Decimal(str(override['lump_sum']))
+
             # Calculate interest for the period
-            next_date = self.get_next_payment_date(current_date)
-            days_in_period = self.calculate_days_in_period(current_date, next_date)
+            if actual_days:
+                days_in_period = calendar.days[period]
+            else:
+                days_in_period = self.calculate_days_in_period(current_date, calendar.dates[period + 1])
+
+            for scenario in self.scenarios.values():
+                if scenario.is_active():
+                    self.advance_scenario(scenario, current_interest_rate, days_in_period, payment_number)
+
+            if balance <= 0:
+                # Paid off; the loop only continues for slower scenarios
+                payment_number += 1
+                continue
 
             # Calculate interest based on the current interest rate
-            if self.days_method == 'Actual':
-                daily_rate = current_interest_rate / Decimal(str(self.year_basis))
-                interest_paid = balance * daily_rate * Decimal(str(days_in_period))
-            elif self.days_method == '30 Day Month' and self.year_basis == 360:
-                interest_paid = balance * (current_interest_rate / Decimal('12'))
-            else:
-                raise ValueError("Unsupported days method")
+            interest_paid = self.calculate_interest(balance, current_interest_rate, days_in_period)
 
             # Calculate insurance premium
             if self.credit_insurance:
@@ -305,116 +638,155 @@ class LoanCalculator:
             else:
                 insurance_paid = Decimal('0.00')
 
-            # Adjust payment amount for final payment if necessary
-            total_payment = self.payment_amount + self.additional_principal
-            if balance + interest_paid + insurance_paid <= total_payment:
-                # Adjust total payment to pay off the loan exactly
-                total_payment = balance + interest_paid + insurance_paid
-                total_payment = total_payment.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-                # Adjust scheduled payment and additional principal
-                principal_payment = total_payment - interest_paid - insurance_paid
-                principal_payment = principal_payment.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                if principal_payment >= balance:
-                    principal_paid = balance
-                    actual_additional_principal = Decimal('0.00')
-                else:
-                    principal_paid = principal_payment
-                    actual_additional_principal = Decimal('0.00')
-            else:
-                # Calculate principal paid
-                principal_paid = self.payment_amount - interest_paid - insurance_paid
-
-                # Prevent negative amortization
-                if principal_paid < Decimal('0.00'):
-                    raise Exception(f"Payment amount is insufficient to cover interest and fees on payment number {payment_number}. Negative amortization is not allowed.")
+            total_payment, principal_paid, actual_additional_principal, ending_balance = self.apply_payment(
+                balance, interest_paid, insurance_paid, payment_number, additional_principal=additional_principal + lump_sum)
 
-                # Apply additional principal
-                actual_additional_principal = min(self.additional_principal, balance - principal_paid)
-
-            # Update balance
-            ending_balance = balance - principal_paid - actual_additional_principal
-            ending_balance = ending_balance.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-            total_interest += interest_paid
-            total_insurance += insurance_paid
-            total_additional_principal += actual_additional_principal
+            self.total_interest += interest_paid
+            self.total_insurance += insurance_paid
+            self.total_additional_principal += actual_additional_principal
+            # Total payment is summed from the amounts as reported in the schedule (rounded to cents)
+            self.total_payments += 1
+            self.total_payment_amount += round(total_payment, 2) + round(actual_additional_principal, 2)
+            if self.rollup is not None:
+                self.rollup.add(payment_number, current_date, total_payment, actual_additional_principal, interest_paid,
+                                principal_paid, insurance_paid, round(total_payment, 2) + round(actual_additional_principal, 2),
+                                ending_balance)
 
             # Record the payment details
-            schedule.append({
-                'payment_number': payment_number,
-                'payment_date': current_date.strftime('%Y-%m-%d'),
-                'start_balance': float(round(balance, 2)),
-                'payment_amount': float(round(total_payment, 2)),  # Adjusted payment amount
-                'additional_principal': float(round(actual_additional_principal, 2)),
-                'interest_paid': float(round(interest_paid, 2)),
-                'principal_paid': float(round(principal_paid, 2)),
-                'insurance_paid': float(round(insurance_paid, 2)),
-                'ending_balance': float(round(ending_balance, 2)),
-                'interest_rate': float(current_interest_rate * Decimal('100')),  # For reporting purposes
-            })
+            if not summary_only:
+                schedule.append(payment_number, current_date, balance, total_payment, actual_additional_principal,
+                                interest_paid, principal_paid, insurance_paid, ending_balance,
+                                float(current_interest_rate * Decimal('100')))  # Rate in percent, for reporting purposes
+                # Time the caller spends between rows isn't amortization time
+                self.add_phase_time('amortization', started)
+                yield
+                started = time.perf_counter()
 
             # Update balance and payment number
             balance = ending_balance
             payment_number += 1
-            current_date = next_date
 
             if balance <= Decimal('0.00'):
                 balance = Decimal('0.00')
-                break
 
+        self.add_phase_time('amortization', started)
+
+        # A scenario that failed fails the calculation, as a separate calculation would have
+        for scenario in self.scenarios.values():
+            if scenario.error is not None:
+                raise scenario.error
+
+        self.finish_totals()
+
+    def finish_totals(self):
+        started = time.perf_counter()
         # Payment amount without insurance (for comparison)
         payment_amount_no_insurance = self.payment_amount
         if self.credit_insurance:
             average_insurance_premium = self.calculate_average_insurance_premium(self.payment_amount)
             payment_amount_no_insurance -= average_insurance_premium
+        self.payment_amount_no_insurance = payment_amount_no_insurance
+        self.add_phase_time('totals', started)
+
+    def run_schedule(self, summary_only=False, scenarios=None, resume=None, checkpoints=None, kernel=None):
+        # Runs iter_schedule() to the end, or the same calculation on the integer-cents kernel when
+        # kernel (SCALAR_KERNEL by default) is "cents" and the kernel can take the loan
+        kernel = kernel or SCALAR_KERNEL
+        if kernel not in SCALAR_KERNELS:
+            raise ValueError(f"Unsupported scalar kernel: {kernel}")
+        if kernel == "cents" and resume is None and supports_cents_kernel(self, scenarios):
+            solver_state = (self.insurance_solver_iterations, self.insurance_simulated_periods,
+                            dict(self.average_insurance_premiums))
+            try:
+                amortize_in_cents(self, summary_only, scenarios, checkpoints, CHECKPOINT_INTERVAL)
+                return
+            except KernelFallback:
+                # Scenario payments may have run the insurance solver; the Decimal engine runs it again
+                self.insurance_solver_iterations, self.insurance_simulated_periods, premiums = solver_state
+                self.average_insurance_premiums = premiums
+        for _ in self.iter_schedule(summary_only, scenarios, resume=resume, checkpoints=checkpoints):
+            pass
+
+    def calculate(self, summary_only=False, scenarios=None):
+        self.run_schedule(summary_only, scenarios)
+        return self.schedule, self.total_interest, self.total_insurance, self.total_additional_principal, self.payment_amount_no_insurance
+
+    def calculate_interest(self, balance, interest_rate, days_in_period):
+        if self.days_method == 'Actual':
+            daily_rate = interest_rate / Decimal(str(self.year_basis))
+            return balance * daily_rate * Decimal(str(days_in_period))
+        elif self.days_method == '30 Day Month' and self.year_basis == 360:
+            return balance * (interest_rate / Decimal('12'))
+        else:
+            raise ValueError("Unsupported days method")
 
-        return schedule, total_interest, total_insurance, total_additional_principal, payment_amount_no_insurance
-
-    def get_periods_per_year(self):
-        periods_per_year_map = {
-            'Monthly': Decimal('12'), 'Annually': Decimal('1'), 'Bi-Weekly': Decimal('26'),
-            'Biweekly': Decimal('26'), 'Weekly': Decimal('52'), 'Daily': Decimal('365'),
-            'Quarterly': Decimal('4'), 'Semiannually': Decimal('2'), 'Semimonthly': Decimal('24'),
-            'Semimonthly 15th and EOM': Decimal('24'), 'Semimonthly 1st and 15th': Decimal('24'),
-            # Add more frequencies as needed
-        }
+    def advance_scenario(self, scenario, interest_rate, days_in_period, payment_number):
+        balance = scenario.balance
+        try:
+            interest_paid = self.calculate_interest(balance, interest_rate, days_in_period)
+            if self.credit_insurance:
+                insurance_paid = self.calculate_insurance_premium(balance)
+            else:
+                insurance_paid = Decimal('0.00')
+            total_payment, principal_paid, actual_additional_principal, ending_balance = self.apply_payment(
+                balance, interest_paid, insurance_paid, payment_number, scenario.payment_amount, scenario.additional_principal)
+        except Exception as e:
+            scenario.error = e
+            return
+
+        scenario.total_interest += interest_paid
+        scenario.total_insurance += insurance_paid
+        scenario.total_additional_principal += actual_additional_principal
+        scenario.total_payments += 1
+        scenario.total_payment_amount += round(total_payment, 2) + round(actual_additional_principal, 2)
+        scenario.balance = max(ending_balance, Decimal('0.00'))
+
+    def apply_payment(self, balance, interest_paid, insurance_paid, payment_number, payment_amount=None, additional_principal=None):
+        # Defaults to this loan's payment amount and additional principal
+        payment_amount = self.payment_amount if payment_amount is None else payment_amount
+        additional_principal = self.additional_principal if additional_principal is None else additional_principal
+
+        # Adjust payment amount for final payment if necessary
+        total_payment = payment_amount + additional_principal
+        if balance + interest_paid + insurance_paid <= total_payment:
+            # Adjust total payment to pay off the loan exactly
+            total_payment = balance + interest_paid + insurance_paid
+            total_payment = total_payment.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+            # Adjust scheduled payment and additional principal
+            principal_payment = total_payment - interest_paid - insurance_paid
+            principal_payment = principal_payment.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if principal_payment >= balance:
+                principal_paid = balance
+                actual_additional_principal = Decimal('0.00')
+            else:
+                principal_paid = principal_payment
+                actual_additional_principal = Decimal('0.00')
+        else:
+            # Calculate principal paid
+            principal_paid = payment_amount - interest_paid - insurance_paid
 
-        if self.payment_frequency not in periods_per_year_map:
-            raise ValueError(f"Unsupported payment frequency: {self.payment_frequency}")
+            # Prevent negative amortization
+            if principal_paid < Decimal('0.00'):
+                raise Exception(f"Payment amount is insufficient to cover interest and fees on payment number {payment_number}. Negative amortization is not allowed.")
 
-        return periods_per_year_map[self.payment_frequency]
+            # Apply additional principal
+            actual_additional_principal = min(additional_principal, balance - principal_paid)
 
-    def get_next_payment_date(self, current_date):
-        frequency_map = {
-            'Monthly': relativedelta(months=1),
-            'Annually': relativedelta(years=1),
-            'Bi-Weekly': relativedelta(weeks=2),
-            'Biweekly': relativedelta(weeks=2),
-            'Daily': relativedelta(days=1),
-            'Quarterly': relativedelta(months=3),
-            'Semiannually': relativedelta(months=6),
-            'Semimonthly': relativedelta(days=15),
-            'Semimonthly 15th and EOM': relativedelta(days=15),
-            'Semimonthly 1st and 15th': relativedelta(days=15),
-            'Weekly': relativedelta(weeks=1),
-            # Add more frequencies as needed
-        }
+        # Update balance
+        ending_balance = balance - principal_paid - actual_additional_principal
+        ending_balance = ending_balance.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-        if self.payment_frequency not in frequency_map:
-            raise ValueError(f"Unsupported payment frequency: {self.payment_frequency}")
+        return total_payment, principal_paid, actual_additional_principal, ending_balance
 
-        next_date = current_date + frequency_map[self.payment_frequency]
+    def get_periods_per_year(self):
+        return get_periods_per_year(self.payment_frequency)
 
-        # Special handling for "Semimonthly 15th and EOM" and "Semimonthly 1st and 15th"
-        if self.payment_frequency in ['Semimonthly 15th and EOM', 'Semimonthly 1st and 15th']:
-            if current_date.day < 15:
-                next_date = current_date.replace(day=15)
-            else:
-                next_date = current_date + relativedelta(months=1)
-                next_date = next_date.replace(day=1)
+    def get_next_payment_date(self, current_date):
+        return next_payment_date(self.payment_frequency, current_date)
 
-        return next_date
+    def get_payment_calendar(self, periods):
+        return get_payment_calendar(self.payment_frequency, self.first_due_date, periods)
 
     def calculate_days_in_period(self, start_date, end_date):
         if self.days_method == 'Actual':
@@ -424,187 +796,1097 @@ class LoanCalculator:
         else:
             raise ValueError("Unsupported days method")
 
-    def get_amortization_schedule(self):
-        schedule, total_interest, total_insurance, total_additional_principal, payment_amount_no_insurance = self.calculate()
-        total_payments = len(schedule)
-        total_payment_amount = sum(
-            Decimal(str(payment['payment_amount'])) + Decimal(str(payment['additional_principal']))
-            for payment in schedule
-        )
+    def get_totals(self):
+        # Summary of the last iter_schedule() run; only complete once iteration has ended
         return {
-            'schedule': schedule,
-            'total_interest': float(round(total_interest, 2)),
-            'total_insurance': float(round(total_insurance, 2)),
-            'total_additional_principal': float(round(total_additional_principal, 2)),
-            'total_payments': total_payments,
-            'total_payment': float(round(total_payment_amount, 2)),
+            'total_interest': float(round(self.total_interest, 2)),
+            'total_insurance': float(round(self.total_insurance, 2)),
+            'total_additional_principal': float(round(self.total_additional_principal, 2)),
+            'total_payments': self.total_payments,
+            'total_payment': float(round(self.total_payment_amount, 2)),
             'insurance_premium_per_payment': None,  # Insurance premium varies each period
-            'actual_loan_term': total_payments,
-            'payment_amount_no_insurance': float(round(payment_amount_no_insurance, 2)),
+            'actual_loan_term': self.total_payments,
+            'payment_amount_no_insurance': float(round(self.payment_amount_no_insurance, 2)),
         }
 
-@app.post("/calculate-loan-amortization")
-def calculate_loan_amortization(request: LoanRequest):
+    def get_amortization_schedule(self, summary_only=False, scenarios=None, kernel=None):
+        self.run_schedule(summary_only, scenarios, kernel=kernel)
+        return {'schedule': self.schedule, **self.get_totals()}
+
+SUMMARY_LABELS = [
+    ("Payment Amount", "payment_amount"),
+    ("Payment Amount without Insurance", "payment_amount_no_insurance"),
+    ("Total Interest", "total_interest"),
+    ("Total Insurance", "total_insurance"),
+    ("Total Additional Principal", "total_additional_principal"),
+    ("Total Payment", "total_payment"),
+    ("Interest Savings", "interest_savings"),
+]
+
+# Streaming response formats for /calculate-loan-amortization
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+STREAM_CHUNK_ROWS = 256
+
+# Excel and columnar exports are built in a temporary file that stays in memory only up to this size
+EXPORT_SPOOL_MAX_BYTES = int(os.environ.get("EXPORT_SPOOL_MAX_BYTES", 8 * 1024 * 1024))
+EXPORT_READ_CHUNK_BYTES = 64 * 1024
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def create_calculator(request: LoanRequest, additional_principal=None):
+    # Set amort_term equal to loan_term if not provided
+    amort_term = request.amort_term if request.amort_term is not None else request.loan_term
+
+    # Convert rate_adjustments to list of dictionaries with effective_date and index_rate
+    rate_adjustments = []
+    if request.rate_adjustments:
+        for adj in request.rate_adjustments:
+            rate_adjustments.append({
+                'effective_date': adj.effective_date,
+                'index_rate': adj.index_rate
+            })
+
+    return LoanCalculator(
+        principal=request.loan_amount,
+        annual_interest_rate=request.annual_interest_rate,
+        initial_interest_rate=request.initial_interest_rate,
+        payment_amount=request.payment_amount,
+        payment_frequency=request.payment_frequency,
+        first_due_date=request.first_due_date,
+        days_method=request.days_method,
+        year_basis=request.year_basis,
+        loan_term=request.loan_term,
+        amort_term=amort_term,
+        additional_principal=request.additional_principal if additional_principal is None else additional_principal,
+        credit_insurance=request.credit_insurance,
+        initial_index_rate=request.initial_index_rate,
+        margin=request.margin,
+        rate_adjustments=rate_adjustments,
+        max_rate_change=request.max_rate_change,
+        max_interest_rate=request.max_interest_rate,
+        adjust_payment=request.adjust_payment,
+        fixed_rate_period=request.fixed_rate_period,
+        adjustment_frequency=request.adjustment_frequency,
+        period_overrides=[override.dict() for override in request.period_overrides or []],
+        rollup=request.rollup.dict() if request.rollup else None
+    )
+
+def additional_principal_scenarios(request: LoanRequest):
+    # Additional principal amounts amortized alongside the request: 0.0 as the interest savings
+    # baseline, plus any amounts the caller wants to compare
+    scenarios = []
+    if request.additional_principal > 0 or request.compare_additional_principal:
+        scenarios.append(0.0)
+    for amount in request.compare_additional_principal or []:
+        if amount not in scenarios:
+            scenarios.append(amount)
+    return scenarios
+
+def calculate_interest_savings(request: LoanRequest, calculator, total_interest):
+    # Calculate interest savings if additional principal is paid
+    if request.additional_principal > 0:
+        total_interest_no_additional = calculator.scenarios[0.0].get_totals()['total_interest']
+        return total_interest_no_additional - total_interest
+    return 0.0
+
+def build_additional_principal_comparison(request: LoanRequest, calculator):
+    if not request.compare_additional_principal:
+        return None
+    total_interest_no_additional = calculator.scenarios[0.0].get_totals()['total_interest']
+    comparison = []
+    for amount in request.compare_additional_principal:
+        totals = calculator.scenarios[amount].get_totals()
+        totals['interest_savings'] = float(round(total_interest_no_additional - totals['total_interest'], 2))
+        comparison.append(totals)
+    return comparison
+
+def build_loan_summary(request: LoanRequest, calculator, totals):
+    interest_savings = calculate_interest_savings(request, calculator, totals['total_interest'])
+
+    # Calculate payment increase due to insurance
+    if request.credit_insurance:
+        payment_increase = float(calculator.payment_amount) - totals['payment_amount_no_insurance']
+    else:
+        payment_increase = 0.0
+
+    summary = {
+        "payment_amount": float(calculator.payment_amount),  # Regular payment amount
+        "additional_principal": request.additional_principal,  # Additional principal
+        "payment_amount_no_insurance": totals['payment_amount_no_insurance'],
+        "payment_increase": float(round(payment_increase, 2)),
+        "insurance_premium_per_payment": None,  # Varies each period
+        "total_interest": totals['total_interest'],
+        "total_insurance": totals['total_insurance'],
+        "total_additional_principal": totals['total_additional_principal'],
+        "total_payment": totals['total_payment'],
+        "actual_loan_term": totals['actual_loan_term'],
+        "interest_savings": float(round(interest_savings, 2)),
+        "additional_principal_comparison": build_additional_principal_comparison(request, calculator),
+        "metadata": {
+            "insurance_solver_iterations": calculator.insurance_solver_iterations,
+            "insurance_simulated_periods": calculator.insurance_simulated_periods,
+        },
+    }
+    if request.rollup:
+        summary["rollups"] = calculator.rollup.report()
+    return summary
+
+def iterate_schedule_ndjson(request: LoanRequest, calculator):
+    # One JSON object per schedule row, followed by a {"summary": ...} line once the totals are known.
+    # Errors after the response has started can only be reported in-band, as an {"error": ...} line
+    schedule = Schedule()
+    lines = []
     try:
-        # Set amort_term equal to loan_term if not provided
-        amort_term = request.amort_term if request.amort_term is not None else request.loan_term
-
-        # Convert rate_adjustments to list of dictionaries with effective_date and index_rate
-        rate_adjustments = []
-        if request.rate_adjustments:
-            for adj in request.rate_adjustments:
-                rate_adjustments.append({
-                    'effective_date': adj.effective_date,
-                    'index_rate': adj.index_rate
-                })
-
-        # Create LoanCalculator instance
-        calculator = LoanCalculator(
-            principal=request.loan_amount,
-            annual_interest_rate=request.annual_interest_rate,
-            initial_interest_rate=request.initial_interest_rate,
-            payment_amount=request.payment_amount,
-            payment_frequency=request.payment_frequency,
-            first_due_date=request.first_due_date,
-            days_method=request.days_method,
-            year_basis=request.year_basis,
-            loan_term=request.loan_term,
-            amort_term=amort_term,
-            additional_principal=request.additional_principal,
-            credit_insurance=request.credit_insurance,
-            initial_index_rate=request.initial_index_rate,
-            margin=request.margin,
-            rate_adjustments=rate_adjustments,
-            max_rate_change=request.max_rate_change,
-            max_interest_rate=request.max_interest_rate,
-            adjust_payment=request.adjust_payment,
-            fixed_rate_period=request.fixed_rate_period,
-            adjustment_frequency=request.adjustment_frequency
-        )
+        for _ in calculator.iter_schedule(request.summary_only, additional_principal_scenarios(request), schedule):
+            if len(schedule) >= STREAM_CHUNK_ROWS:
+                yield "\n".join(schedule.iter_json()) + "\n"
+                schedule.clear()
+        lines.extend(schedule.iter_json())
+        lines.append(json.dumps({"summary": build_loan_summary(request, calculator, calculator.get_totals())}))
+        record_calculation(calculator)
+    except Exception as e:
+        record_error("/calculate-loan-amortization", e)
+        lines.extend(schedule.iter_json())
+        lines.append(json.dumps({"error": str(e)}))
+    yield "\n".join(lines) + "\n"
+
+def iterate_schedule_csv(request: LoanRequest, calculator):
+    # Schedule rows followed by a summary section laid out like the Excel export
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCHEDULE_HEADERS)
+    schedule = Schedule()
+    try:
+        for _ in calculator.iter_schedule(request.summary_only, additional_principal_scenarios(request), schedule):
+            if len(schedule) >= STREAM_CHUNK_ROWS:
+                writer.writerows(schedule.rows())
+                schedule.clear()
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        writer.writerows(schedule.rows())
+        summary = build_loan_summary(request, calculator, calculator.get_totals())
+        writer.writerow([])
+        writer.writerow(["Summary"])
+        for label, key in SUMMARY_LABELS:
+            writer.writerow([label, summary[key]])
+        record_calculation(calculator)
+    except Exception as e:
+        record_error("/calculate-loan-amortization", e)
+        writer.writerows(schedule.rows())
+        writer.writerow(["Error", str(e)])
+    yield buffer.getvalue()
 
-        amortization_data = calculator.get_amortization_schedule()
-
-        # Calculate interest savings if additional principal is paid
-        if request.additional_principal > 0:
-            # Recalculate without additional principal
-            calculator_no_additional = LoanCalculator(
-                principal=request.loan_amount,
-                annual_interest_rate=request.annual_interest_rate,
-                initial_interest_rate=request.initial_interest_rate,
-                payment_amount=request.payment_amount,
-                payment_frequency=request.payment_frequency,
-                first_due_date=request.first_due_date,
-                days_method=request.days_method,
-                year_basis=request.year_basis,
-                loan_term=request.loan_term,
-                amort_term=amort_term,
-                additional_principal=0.0,
-                credit_insurance=request.credit_insurance,
-                initial_index_rate=request.initial_index_rate,
-                margin=request.margin,
-                rate_adjustments=rate_adjustments,
-                max_rate_change=request.max_rate_change,
-                max_interest_rate=request.max_interest_rate,
-                adjust_payment=request.adjust_payment,
-                fixed_rate_period=request.fixed_rate_period,
-                adjustment_frequency=request.adjustment_frequency
-            )
-            amortization_data_no_additional = calculator_no_additional.get_amortization_schedule()
-            total_interest_no_additional = amortization_data_no_additional['total_interest']
-            interest_savings = total_interest_no_additional - amortization_data['total_interest']
-        else:
-            interest_savings = 0.0
-
-        # Prepare response
-        schedule = [
-            {
-                "payment_number": payment['payment_number'],
-                "payment_date": payment['payment_date'],
-                "payment_amount": payment['payment_amount'],
-                "principal_paid": payment['principal_paid'],
-                "interest_paid": payment['interest_paid'],
-                "additional_principal": payment['additional_principal'],
-                "insurance_paid": payment['insurance_paid'],
-                "ending_balance": payment['ending_balance'],
-                "interest_rate": payment.get('interest_rate', None),
-            }
-            for payment in amortization_data['schedule']
-        ]
-
-        # Calculate payment increase due to insurance
-        if request.credit_insurance:
-            payment_increase = float(calculator.payment_amount) - amortization_data['payment_amount_no_insurance']
-        else:
-            payment_increase = 0.0
+@app.post("/calculate-loan-amortization")
+@instrumented("/calculate-loan-amortization")
+def calculate_loan_amortization(request: LoanRequest, if_none_match: Optional[str] = Header(None),
+                                x_request_timeout: Optional[float] = Header(None), accept: Optional[str] = Header(None),
+                                accept_encoding: Optional[str] = Header(None)):
+    try:
+        if request.response_format is not None:
+            return stream_loan_amortization(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        return {
-            "payment_amount": float(calculator.payment_amount),  # Regular payment amount
-            "additional_principal": request.additional_principal,  # Additional principal
-            "payment_amount_no_insurance": amortization_data['payment_amount_no_insurance'],
-            "payment_increase": float(round(payment_increase, 2)),
-            "insurance_premium_per_payment": None,  # Varies each period
-            "total_interest": amortization_data['total_interest'],
-            "total_insurance": amortization_data['total_insurance'],
-            "total_additional_principal": amortization_data['total_additional_principal'],
-            "total_payment": amortization_data['total_payment'],
-            "actual_loan_term": amortization_data['actual_loan_term'],
-            "interest_savings": float(round(interest_savings, 2)),
-            "amortization_schedule": schedule
-        }
+    media_type = negotiate_media_type(accept)
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported media types: {', '.join(offered_media_types())}")
+    key = request_cache_key(request)
+    body, etag, checkpoints = cached_loan_amortization(request, key, x_request_timeout)
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= RESPONSE_COMPRESSION_MIN_BYTES else None
+    headers = {"ETag": representation_etag(etag, media_type, encoding), "Vary": "Accept, Accept-Encoding"}
+    if schedule_store is not None and checkpoints.schedule is not None:
+        headers["X-Schedule-Id"] = key
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    body = encode_representation(body, checkpoints.schedule, media_type, encoding)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def encode_representation(body, schedule, media_type, encoding):
+    # The cached JSON body in the negotiated media type and content coding
+    if media_type != JSON_MEDIA_TYPE:
+        with timed_phase("serialize"):
+            body = encode_result(json.loads(loan_amortization_summary(body)), schedule, media_type)
+    if encoding is not None:
+        with timed_phase("compress"):
+            body = compress(body, encoding)
+    return body
+
+def cached_loan_amortization(request, key, x_request_timeout):
+    # (body, etag, checkpoints) of the JSON response from the result cache, or calculated in an
+    # execution lane (and stored in the schedule store), with failures as HTTP errors
+    try:
+        deadline = time.time() + request_deadline_seconds(x_request_timeout)
+        return result_cache.get_or_compute(key, lambda: store_schedule(key, execute_loan_amortization(request, deadline)))
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # For backward compatibility, include the existing /calculate endpoint
 @app.post("/calculate")
-def calculate_loan(request: LoanRequest):
-    return calculate_loan_amortization(request)
+def calculate_loan(request: LoanRequest, if_none_match: Optional[str] = Header(None),
+                   x_request_timeout: Optional[float] = Header(None), accept: Optional[str] = Header(None),
+                   accept_encoding: Optional[str] = Header(None)):
+    return calculate_loan_amortization(request, if_none_match, x_request_timeout, accept, accept_encoding)
+
+@app.get("/cache-stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.get("/execution-stats")
+def execution_stats():
+    return {"light": light_lane.stats(), "heavy": heavy_lane.stats()}
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def compute_loan_amortization(request, resume=None, checkpoints=None):
+    # resume and checkpoints are passed through to LoanCalculator.run_schedule
+    calculator = create_calculator(request)
+    calculator.run_schedule(request.summary_only, additional_principal_scenarios(request),
+                            resume=resume, checkpoints=checkpoints)
+    amortization_data = {'schedule': calculator.schedule, **calculator.get_totals()}
+    record_calculation(calculator)
+
+    return {
+        **build_loan_summary(request, calculator, amortization_data),
+        "amortization_schedule": None if request.summary_only else amortization_data['schedule']
+    }
+
+def stream_loan_amortization(request):
+    if request.response_format in COLUMNAR_MEDIA_TYPES:
+        return columnar_export_response([request], request.response_format)
+    calculator = create_calculator(request)
+    if request.response_format == "ndjson":
+        rows = iterate_schedule_ndjson(request, calculator)
+    elif request.response_format == "csv":
+        rows = iterate_schedule_csv(request, calculator)
+    else:
+        raise ValueError(f"Unsupported response format: {request.response_format}")
+    return StreamingResponse(rows, media_type=STREAM_MEDIA_TYPES[request.response_format])
+
+def request_cache_key(request):
+    # Requests that calculate the same thing hash the same: field order doesn't matter, rate
+    # adjustments are ordered the way LoanCalculator orders them (stable sort by effective date), and
+    # period overrides by payment number (overrides of the same payment keep their order)
+    payload = request.dict(exclude={"response_format", "loan_id"})
+    if payload["rate_adjustments"]:
+        payload["rate_adjustments"] = sorted(payload["rate_adjustments"], key=lambda adj: adj["effective_date"])
+    payload["period_overrides"] = sorted_period_overrides(request) or None
+    return canonical_request_hash(payload)
+
+def sorted_period_overrides(request):
+    return sorted((override.dict() for override in request.period_overrides or []),
+                  key=lambda override: override["payment_number"])
+
+def find_checkpoint(request):
+    # A what-if request is usually a cached request plus overrides from some payment on. Looks for
+    # the cached request with the longest prefix of this one's overrides (by payment number) and
+    # returns its checkpoints up to the first override it lacks, or None
+    if CHECKPOINT_INTERVAL <= 0:
+        return None
+    overrides = [PeriodOverride(**override) for override in sorted_period_overrides(request)]
+    for count in range(len(overrides) - 1, -1, -1):
+        cached = result_cache.peek(request_cache_key(request.copy(update={"period_overrides": overrides[:count]})))
+        if cached is not None:
+            resume = cached[2].before(overrides[count].payment_number)
+            if resume is not None:
+                return resume
+    return None
+
+def encode_loan_amortization(result):
+    # JSON of a compute_loan_amortization() result, with the schedule written straight from its columns
+    schedule = result["amortization_schedule"]
+    summary = {key: value for key, value in result.items() if key != "amortization_schedule"}
+    encoded = json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+    schedule_json = "null" if schedule is None else schedule.to_json()
+    return encoded[:-1] + ',"amortization_schedule":' + schedule_json + "}"
+
+def loan_amortization_summary(body):
+    # The summary of an encode_loan_amortization() body (everything but the schedule), as JSON bytes
+    return body[:body.rindex(b',"amortization_schedule":')] + b"}"
+
+def serialize_loan_amortization(request, resume=None):
+    # Cached as (body, etag, checkpoints) so hits skip both the calculation and JSON encoding, and
+    # requests that change this one from some payment on can resume from its checkpoints
+    checkpoints = ScheduleCheckpoints()
+    result = compute_loan_amortization(request, resume, checkpoints)
+    checkpoints.schedule = result["amortization_schedule"]
+    with timed_phase("serialize"):
+        body = encode_loan_amortization(result).encode()
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"', checkpoints
+
+def estimate_cost(request):
+    # Relative cost of a calculation: one unit per payment, per schedule calculated in the pass
+    cost = request.loan_term * (1 + len(request.compare_additional_principal or []))
+    if request.credit_insurance:
+        cost *= INSURANCE_COST_FACTOR
+    return cost
+
+def request_deadline_seconds(requested):
+    if requested is None or requested <= 0:
+        return REQUEST_DEADLINE_SECONDS
+    return min(requested, REQUEST_DEADLINE_SECONDS)
+
+def execute_loan_amortization(request, deadline):
+    resume = find_checkpoint(request)
+    cost = estimate_cost(request)
+    if resume is not None:
+        # Only the payments after the checkpoint are calculated
+        cost = cost * max(request.loan_term - resume.latest.payment_number + 1, 1) // request.loan_term
+    return run_in_lane(cost, deadline, serialize_loan_amortization, request, resume)
+
+def run_in_lane(cost, deadline, func, *args):
+    lane = heavy_lane if cost >= HEAVY_COST_THRESHOLD else light_lane
+    result, observations = lane.run(deadline, call_with_metrics, func, *args)
+    replay_metrics(observations)
+    return result
+
+def call_with_metrics(func, *args):
+    # Runs in a lane worker process, so its metrics travel back with the result
+    with captured_metrics() as observations:
+        result = func(*args)
+    return result, observations
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak validators compare equal for If-None-Match
+    return "*" in candidates or any(candidate.replace("W/", "", 1) == etag for candidate in candidates)
 
 @app.post("/export-excel")
-async def export_excel(data: dict):
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output)
-    worksheet = workbook.add_worksheet()
-
-    # Add headers
-    headers = ["Payment Number", "Payment Date", "Payment Amount", "Principal Paid", "Interest Paid", "Additional Principal", "Insurance Paid", "Ending Balance", "Interest Rate"]
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header)
-
-    # Write data
-    for row, payment in enumerate(data['amortization_schedule'], start=1):
-        worksheet.write(row, 0, payment['payment_number'])
-        worksheet.write(row, 1, payment['payment_date'])
-        worksheet.write(row, 2, payment['payment_amount'])
-        worksheet.write(row, 3, payment['principal_paid'])
-        worksheet.write(row, 4, payment['interest_paid'])
-        worksheet.write(row, 5, payment['additional_principal'])
-        worksheet.write(row, 6, payment['insurance_paid'])
-        worksheet.write(row, 7, payment['ending_balance'])
-        worksheet.write(row, 8, payment['interest_rate'])
-
-    # Add summary
-    summary_row = len(data['amortization_schedule']) + 2
-    worksheet.write(summary_row, 0, "Summary")
-    worksheet.write(summary_row + 1, 0, "Payment Amount")
-    worksheet.write(summary_row + 1, 1, data['payment_amount'])
-    worksheet.write(summary_row + 2, 0, "Payment Amount without Insurance")
-    worksheet.write(summary_row + 2, 1, data['payment_amount_no_insurance'])
-    worksheet.write(summary_row + 3, 0, "Total Interest")
-    worksheet.write(summary_row + 3, 1, data['total_interest'])
-    worksheet.write(summary_row + 4, 0, "Total Insurance")
-    worksheet.write(summary_row + 4, 1, data['total_insurance'])
-    worksheet.write(summary_row + 5, 0, "Total Additional Principal")
-    worksheet.write(summary_row + 5, 1, data['total_additional_principal'])
-    worksheet.write(summary_row + 6, 0, "Total Payment")
-    worksheet.write(summary_row + 6, 1, data['total_payment'])
-    worksheet.write(summary_row + 7, 0, "Interest Savings")
-    worksheet.write(summary_row + 7, 1, data['interest_savings'])
-
-    workbook.close()
-    output.seek(0)
+@instrumented("/export-excel")
+def export_excel(data: dict):
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    with timed_phase("excel"):
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        worksheet = workbook.add_worksheet()
+
+        # Add headers
+        worksheet.write_row(0, 0, SCHEDULE_HEADERS)
+
+        # Write data
+        row = write_schedule_rows(worksheet, 1, ([payment[field] for field in SCHEDULE_FIELDS]
+                                                 for payment in data['amortization_schedule']))
+
+        # Add summary
+        write_summary_rows(worksheet, row + 1, data)
+
+        workbook.close()
+    return excel_response(output)
+
+@app.post("/export-loan-excel")
+@instrumented("/export-loan-excel")
+def export_loan_excel(loans: Union[List[LoanRequest], LoanRequest]):
+    # Computes the schedules server-side, one sheet per loan. Rows are written as they are computed
+    # and, in constant_memory mode, flushed to disk row by row; the workbook itself is spooled to a
+    # temporary file. This is a plain def, so it runs in the threadpool rather than on the event loop.
+    if isinstance(loans, LoanRequest):
+        loans = [loans]
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        for number, request in enumerate(loans, start=1):
+            worksheet = workbook.add_worksheet(f"Loan {number}")
+            try:
+                write_loan_worksheet(worksheet, request, create_calculator(request))
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e) if len(loans) == 1 else f"Loan {number}: {e}")
+        with timed_phase("excel"):
+            workbook.close()
+    except BaseException:
+        output.close()
+        raise
+    return excel_response(output)
+
+@app.post("/export-schedules")
+@instrumented("/export-schedules")
+def export_schedules(loans: Union[List[LoanRequest], LoanRequest], format: str = "parquet"):
+    # Schedules of one or more loans in a single Arrow IPC or Parquet file, with a loan_id column
+    # (the request's loan_id, or the loan's 1-based position)
+    if isinstance(loans, LoanRequest):
+        loans = [loans]
+    if format not in COLUMNAR_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    return columnar_export_response(loans, format)
+
+def columnar_export_response(loans, format):
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        writer = ColumnarScheduleWriter(output, format)
+    except ImportError:
+        output.close()
+        raise HTTPException(status_code=501, detail="Arrow and Parquet export require pyarrow")
+    except BaseException:
+        output.close()
+        raise
+    try:
+        for number, request in enumerate(loans, start=1):
+            loan_id = request.loan_id if request.loan_id is not None else str(number)
+            try:
+                calculator = create_calculator(request)
+                schedule = calculator.get_amortization_schedule()['schedule']
+                record_calculation(calculator)
+                with timed_phase("columnar"):
+                    writer.write(loan_id, schedule)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e) if len(loans) == 1 else f"Loan {loan_id}: {e}")
+        with timed_phase("columnar"):
+            writer.close()
+    except BaseException:
+        writer.discard()
+        output.close()
+        raise
+    return StreamingResponse(
+        iterate_file(output),
+        media_type=COLUMNAR_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=Loan_Schedules.{COLUMNAR_FILE_EXTENSIONS[format]}"}
+    )
 
+def write_loan_worksheet(worksheet, request, calculator):
+    worksheet.write_row(0, 0, SCHEDULE_HEADERS)
+    schedule = Schedule()
+    row = 1
+    for _ in calculator.iter_schedule(request.summary_only, additional_principal_scenarios(request), schedule):
+        if len(schedule) >= STREAM_CHUNK_ROWS:
+            row = write_schedule_rows(worksheet, row, schedule.rows())
+            schedule.clear()
+    row = write_schedule_rows(worksheet, row, schedule.rows())
+    write_summary_rows(worksheet, row + 1, build_loan_summary(request, calculator, calculator.get_totals()))
+    record_calculation(calculator)
+
+def write_schedule_rows(worksheet, row, rows):
+    # Returns the first row after the ones written
+    for values in rows:
+        worksheet.write_row(row, 0, values)
+        row += 1
+    return row
+
+def write_summary_rows(worksheet, row, summary):
+    worksheet.write(row, 0, "Summary")
+    for offset, (label, key) in enumerate(SUMMARY_LABELS, start=1):
+        worksheet.write(row + offset, 0, label)
+        worksheet.write(row + offset, 1, summary[key])
+
+def excel_response(output):
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        iterate_file(output),
+        media_type=EXCEL_MEDIA_TYPE,
         headers={"Content-Disposition": "attachment; filename=Loan_Calculation.xlsx"}
     )
+
+def iterate_file(file):
+    # Streams a finished temporary file from the start and closes (and so deletes) it afterwards
+    try:
+        file.seek(0)
+        while True:
+            chunk = file.read(EXPORT_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+def store_schedule(schedule_id, result):
+    # Saves a serialize_loan_amortization() result with a schedule to the schedule store, and returns
+    # it. The calculation has succeeded by now, so a store failure is only counted
+    body, _, checkpoints = result
+    if schedule_store is not None and checkpoints.schedule is not None:
+        try:
+            with timed_phase("schedule_store"):
+                schedule_store.save(schedule_id, loan_amortization_summary(body), checkpoints.schedule)
+        except sqlite3.Error as e:
+            record_error("schedule_store", e)
+    return result
+
+def read_stored_schedule(schedule_id, method, *args):
+    # Calls ScheduleStore.<method>(schedule_id, *args). A schedule evicted from the store but still in
+    # the result cache is stored again
+    if schedule_store is None:
+        raise HTTPException(status_code=501, detail="The schedule store is disabled")
+    read = getattr(schedule_store, method)
+    found = read(schedule_id, *args)
+    if found is None:
+        cached = result_cache.peek(schedule_id)
+        if cached is not None and cached[2].schedule is not None:
+            store_schedule(schedule_id, cached)
+            found = read(schedule_id, *args)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown schedule: {schedule_id}")
+    return found
+
+def stored_summary_response(schedule_id, payments, summary):
+    head = json.dumps({"schedule_id": schedule_id, "payments": payments}, separators=(",", ":"))
+    return Response(content=head[:-1].encode() + b',"summary":' + summary + b"}", media_type="application/json")
+
+@app.post("/schedules")
+@instrumented("/schedules")
+def save_schedule(request: LoanRequest, x_request_timeout: Optional[float] = Header(None)):
+    # Calculates the loan's full schedule (or finds it in the result cache), stores it and returns its
+    # ID with the summary, for later reads and exports by ID
+    if schedule_store is None:
+        raise HTTPException(status_code=501, detail="The schedule store is disabled")
+    request = request.copy(update={"summary_only": False, "response_format": None})
+    key = request_cache_key(request)
+    result = cached_loan_amortization(request, key, x_request_timeout)
+    found = schedule_store.summary(key)
+    if found is None:
+        store_schedule(key, result)
+        found = read_stored_schedule(key, "summary")
+    return stored_summary_response(key, *found)
+
+@app.get("/schedules/{schedule_id}")
+@instrumented("/schedules/{schedule_id}")
+def get_stored_summary(schedule_id: str):
+    return stored_summary_response(schedule_id, *read_stored_schedule(schedule_id, "summary"))
+
+@app.get("/schedules/{schedule_id}/rows")
+@instrumented("/schedules/{schedule_id}/rows")
+def get_stored_rows(schedule_id: str, start: int = 1, count: Optional[int] = None):
+    # Rows from payment number start (1-based), count of them or the rest of the schedule
+    if start < 1 or (count is not None and count < 0):
+        raise HTTPException(status_code=400, detail="start must be at least 1 and count not negative")
+    payments, schedule = read_stored_schedule(schedule_id, "rows", start - 1, count)
+    with timed_phase("serialize"):
+        head = json.dumps({"schedule_id": schedule_id, "payments": payments, "start": start}, separators=(",", ":"))
+        body = head[:-1] + ',"rows":' + schedule.to_json() + "}"
+    return Response(content=body.encode(), media_type="application/json")
+
+@app.get("/schedules/{schedule_id}/export")
+@instrumented("/schedules/{schedule_id}/export")
+def export_stored_schedule(schedule_id: str, format: str = "xlsx"):
+    # Excel workbook or CSV of a stored schedule and its summary, laid out like /export-loan-excel
+    # and the CSV response format
+    if format not in ("xlsx", "csv"):
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    _, summary = read_stored_schedule(schedule_id, "summary")
+    _, schedule = read_stored_schedule(schedule_id, "rows")
+    summary = json.loads(summary)
+    if format == "csv":
+        return StreamingResponse(
+            iterate_stored_schedule_csv(schedule, summary),
+            media_type=STREAM_MEDIA_TYPES["csv"],
+            headers={"Content-Disposition": "attachment; filename=Loan_Calculation.csv"}
+        )
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        with timed_phase("excel"):
+            workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+            worksheet = workbook.add_worksheet()
+            worksheet.write_row(0, 0, SCHEDULE_HEADERS)
+            row = write_schedule_rows(worksheet, 1, schedule.rows())
+            write_summary_rows(worksheet, row + 1, summary)
+            workbook.close()
+    except BaseException:
+        output.close()
+        raise
+    return excel_response(output)
+
+def iterate_stored_schedule_csv(schedule, summary):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCHEDULE_HEADERS)
+    rows = schedule.rows()
+    while True:
+        chunk = list(itertools.islice(rows, STREAM_CHUNK_ROWS))
+        if not chunk:
+            break
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    writer.writerow([])
+    writer.writerow(["Summary"])
+    for label, key in SUMMARY_LABELS:
+        writer.writerow([label, summary[key]])
+    yield buffer.getvalue()
+
+@app.get("/schedule-store-stats")
+def schedule_store_stats():
+    if schedule_store is None:
+        raise HTTPException(status_code=501, detail="The schedule store is disabled")
+    return schedule_store.stats()
+
+# Process pool shared by batch requests, created on first use
+batch_executor = None
+
+def get_batch_executor():
+    global batch_executor
+    if batch_executor is None:
+        batch_executor = ProcessPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+    return batch_executor
+
+@app.on_event("shutdown")
+def shutdown_batch_executor():
+    global batch_executor
+    if batch_executor is not None:
+        batch_executor.shutdown(cancel_futures=True)
+        batch_executor = None
+
+@app.on_event("shutdown")
+def shutdown_execution_lanes():
+    light_lane.shutdown()
+    heavy_lane.shutdown()
+
+@app.on_event("shutdown")
+def close_schedule_store():
+    if schedule_store is not None:
+        schedule_store.close()
+
+def calculate_batch_chunk(chunk):
+    # Runs in a worker process; each loan is validated and calculated on its own
+    # so that one bad loan only fails its own result line. Lines are encoded here, so only strings
+    # travel back to the parent process
+    lines = []
+    for index, loan in chunk:
+        try:
+            request = LoanRequest.parse_obj(loan)
+            result = encode_loan_amortization(compute_loan_amortization(request))
+            lines.append(f'{{"index":{index},"result":{result}}}')
+        except ValidationError as e:
+            lines.append(json.dumps({"index": index, "error": e.errors()}, default=str))
+        except Exception as e:
+            lines.append(json.dumps({"index": index, "error": str(e)}))
+    return lines
+
+def iterate_batch_results(loans):
+    executor = get_batch_executor()
+    pending = {}
+
+    def drain(futures):
+        for future in futures:
+            chunk = pending.pop(future)
+            try:
+                lines = future.result()
+            except Exception as e:
+                # The worker itself failed (e.g. it was killed); report every loan in its chunk
+                lines = [json.dumps({"index": index, "error": str(e) or type(e).__name__}) for index, _ in chunk]
+            for line in lines:
+                yield line + "\n"
+
+    try:
+        for start in range(0, len(loans), BATCH_CHUNK_SIZE):
+            chunk = list(enumerate(loans[start:start + BATCH_CHUNK_SIZE], start=start))
+            pending[executor.submit(calculate_batch_chunk, chunk)] = chunk
+            # Bound the number of chunks in flight so results never pile up in memory
+            if len(pending) >= BATCH_MAX_PENDING_CHUNKS:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from drain(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from drain(done)
+    finally:
+        # Client went away or the pool broke; don't keep computing results nobody will read
+        for future in pending:
+            future.cancel()
+
+@app.post("/calculate-batch")
+@instrumented("/calculate-batch")
+def calculate_batch(loans: List[dict]):
+    # Results are streamed as NDJSON in completion order; each line carries the loan's index in the request
+    return StreamingResponse(iterate_batch_results(loans), media_type="application/x-ndjson")
+
+def validation_error_message(error: ValidationError):
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+
+def project_loan_book_chunk(chunk, period):
+    # Runs in a worker process: validates and amortizes a chunk of loan book rows and returns their
+    # CashFlowLedger with the (row number, loan_id, error) of each row that failed
+    ledger = CashFlowLedger(period)
+    failures = []
+    # Loans are amortized together only with loans of the same frequency and a term within a factor
+    # of two, so one long loan doesn't keep a whole chunk of short ones iterating
+    groups = {}
+    for number, loan in chunk:
+        try:
+            request = LoanRequest.parse_obj(loan)
+            calculator = create_calculator(request)
+        except ValidationError as e:
+            failures.append((number, loan.get("loan_id"), validation_error_message(e)))
+            continue
+        except Exception as e:
+            failures.append((number, loan.get("loan_id"), str(e)))
+            continue
+        group = groups.setdefault((calculator.payment_frequency, calculator.amort_term.bit_length()), ([], []))
+        group[0].append((number, request.loan_id))
+        group[1].append(calculator)
+    # Payments are summed into the ledger as they're amortized; no schedule is kept
+    for accepted, calculators in groups.values():
+        for (number, loan_id), result in zip(accepted, amortize_fixed_rate(calculators, ledger=ledger)):
+            if "error" in result:
+                failures.append((number, loan_id, result["error"]))
+    return ledger, failures
+
+@instrumented("/project-loan-book")
+def project_uploaded_loan_book(file, format, period):
+    failures = []
+
+    def report(chunk_failures):
+        failures.extend(chunk_failures[:LOAN_BOOK_MAX_REPORTED_FAILURES - len(failures)])
+
+    executor = get_batch_executor()
+    try:
+        ledger = project_loan_book(
+            iter_loan_rows(file, format), lambda chunk: executor.submit(project_loan_book_chunk, chunk, period),
+            period, LOAN_BOOK_CHUNK_SIZE, BATCH_MAX_PENDING_CHUNKS, report)
+    except Exception as e:
+        # Unreadable file (bad CSV encoding, not Parquet)
+        raise HTTPException(status_code=400, detail=f"Could not read the loan book: {e}")
+    return {
+        "period": period,
+        "loans": ledger.loans,
+        "failed": ledger.failed,
+        "totals": ledger.totals_report(),
+        "ledger": ledger.report(),
+        "failures": [{"row": number, "loan_id": loan_id, "error": error} for number, loan_id, error in failures],
+        "failures_truncated": ledger.failed > len(failures),
+    }
+
+@app.post("/project-loan-book")
+async def project_loan_book_upload(request: Request, format: str = "csv", period: str = "month"):
+    # Combined cash flows of the loans in the request body, a CSV or Parquet loan book (see
+    # loan_book.py): per-period totals plus the rows that failed validation or calculation. The body
+    # is spooled to a temporary file, so the book is never held in memory
+    if format not in LOAN_BOOK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if period not in LEDGER_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported period: {period}")
+    with tempfile.TemporaryFile() as file:
+        async for data in request.stream():
+            file.write(data)
+        file.seek(0)
+        return await run_in_threadpool(project_uploaded_loan_book, file, format, period)
+
+# Swept fields, in grid order. additional_principal varies fastest, so the points calculated in one
+# pass are adjacent
+SWEEP_AXES = ("annual_interest_rate", "loan_term", "amort_term", "payment_amount", "additional_principal")
+SWEEP_INTEGER_AXES = ("loan_term", "amort_term")
+SWEEP_MAX_POINTS = int(os.environ.get("SWEEP_MAX_POINTS", 2500))
+
+@app.post("/sweep")
+@instrumented("/sweep")
+def sweep(request: SweepRequest, x_request_timeout: Optional[float] = Header(None)):
+    # Summary grid over every combination of the swept values. Points that differ only in additional
+    # principal are amortized in one pass, sharing payment dates, day counts and the rate timeline,
+    # and every pass shares the cached payment calendars
+    try:
+        axes = sweep_axes(request)
+        deadline = time.time() + request_deadline_seconds(x_request_timeout)
+        return run_in_lane(estimate_sweep_cost(request, axes), deadline, calculate_sweep, request, axes)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def sweep_axes(request: SweepRequest):
+    # Swept values per field, ranges expanded; raises ValueError for grids that can't be calculated.
+    # The grid size is checked as each axis is added, before a range's values are generated
+    axes = {}
+    points = 1
+    for field in SWEEP_AXES:
+        spec = getattr(request, field)
+        if spec is None:
+            continue
+        if isinstance(spec, SweepRange):
+            steps = (spec.stop - spec.start) / spec.step
+            if not math.isfinite(steps):
+                raise ValueError(f"{field} range must have finite start, stop and step")
+            count = max(int(steps + 1e-9) + 1, 0)
+            if points * count > SWEEP_MAX_POINTS:
+                raise ValueError(f"The sweep has {points * count} points; the limit is {SWEEP_MAX_POINTS}")
+            values = [round(spec.start + index * spec.step, 10) for index in range(count)]
+        else:
+            values = list(spec)
+        if field in SWEEP_INTEGER_AXES:
+            if any(value != int(value) or value < 1 for value in values):
+                raise ValueError(f"{field} values must be whole numbers of at least 1")
+            values = [int(value) for value in values]
+        elif any(value < 0 for value in values):
+            raise ValueError(f"{field} values must not be negative")
+        if not values:
+            raise ValueError(f"{field} has no values to sweep")
+        axes[field] = list(dict.fromkeys(values))
+        points *= len(axes[field])
+        if points > SWEEP_MAX_POINTS:
+            raise ValueError(f"The sweep has {points} points; the limit is {SWEEP_MAX_POINTS}")
+    if not axes:
+        raise ValueError("Provide at least one field to sweep")
+    if "annual_interest_rate" in axes and request.base.initial_interest_rate is not None:
+        raise ValueError("annual_interest_rate can't be swept for adjustable-rate loans")
+    return axes
+
+def estimate_sweep_cost(request: SweepRequest, axes):
+    cost = 0
+    for loan_term in axes.get("loan_term", [request.base.loan_term]):
+        cost += estimate_cost(request.base.copy(update={"loan_term": loan_term, "compare_additional_principal": None}))
+    for field, values in axes.items():
+        if field != "loan_term":
+            cost *= len(values)
+    return cost
+
+def calculate_sweep(request: SweepRequest, axes):
+    outer = [field for field in axes if field != "additional_principal"]
+    amounts = axes.get("additional_principal", [request.base.additional_principal])
+    points = []
+    for combination in itertools.product(*(axes[field] for field in outer)):
+        overrides = dict(zip(outer, combination))
+        group = request.base.copy(update={**overrides, "summary_only": True, "compare_additional_principal": None,
+                                          "response_format": None, "rollup": None})
+        for amount, totals in zip(amounts, calculate_sweep_group(group, amounts)):
+            # The swept values of the point, then its results as /calculate-loan-amortization reports them
+            parameters = dict(overrides)
+            if "additional_principal" in axes:
+                parameters["additional_principal"] = amount
+            points.append({"parameters": parameters, **totals})
+    return {"axes": axes, "points": points}
+
+def calculate_sweep_group(request: LoanRequest, amounts):
+    # Summary totals for each additional principal amount, from one pass over the schedule: the first
+    # amount is the main calculation and the others, plus the 0.0 savings baseline, are scenarios
+    if len(amounts) > 1 and any(override.additional_principal is not None or override.lump_sum is not None
+                                for override in request.period_overrides or []):
+        # Those overrides apply to the main calculation only, so each amount needs its own pass
+        return [calculate_sweep_group(request, [amount])[0] for amount in amounts]
+    main = amounts[0]
+    scenarios = [amount for amount in dict.fromkeys([0.0] + amounts[1:]) if amount != main]
+    try:
+        calculator = create_calculator(request.copy(update={"additional_principal": main}))
+        totals = calculator.get_amortization_schedule(summary_only=True, scenarios=scenarios)
+    except Exception as e:
+        if len(amounts) > 1:
+            # A failing scenario fails the whole pass; calculate the amounts one by one to tell which
+            return [calculate_sweep_group(request, [amount])[0] for amount in amounts]
+        return [{"error": str(e)}]
+    record_calculation(calculator)
+
+    results = {main: {"payment_amount": float(calculator.payment_amount), **sweep_totals(totals)}}
+    for amount in scenarios:
+        scenario = calculator.scenarios[amount]
+        results[amount] = {"payment_amount": float(scenario.payment_amount), **sweep_totals(scenario.get_totals())}
+    baseline_interest = results[0.0]["total_interest"]
+    for result in results.values():
+        result["interest_savings"] = float(round(baseline_interest - result["total_interest"], 2))
+    return [results[amount] for amount in amounts]
+
+def sweep_totals(totals):
+    return {
+        "total_interest": totals["total_interest"],
+        "total_insurance": totals["total_insurance"],
+        "total_payment": totals["total_payment"],
+        "actual_loan_term": totals["actual_loan_term"],
+    }
+
+# Upper bound on simulated paths per request
+SIMULATION_MAX_PATHS = int(os.environ.get("SIMULATION_MAX_PATHS", 100000))
+# A vectorized path-period costs about a thousandth of a scalar payment, for lane routing
+SIMULATION_COST_DIVISOR = 1000
+
+@app.post("/simulate-arm")
+@instrumented("/simulate-arm")
+def simulate_arm_paths(request: ArmSimulationRequest, x_request_timeout: Optional[float] = Header(None)):
+    # Distributions of total interest, peak payment and payoff term over simulated index paths
+    try:
+        if request.paths > SIMULATION_MAX_PATHS:
+            raise ValueError(f"At most {SIMULATION_MAX_PATHS} paths can be simulated")
+        if request.model not in SIMULATION_MODELS:
+            raise ValueError(f"Unsupported simulation model: {request.model}")
+        if request.seed is None:
+            request = request.copy(update={"seed": int.from_bytes(os.urandom(4), "big")})
+        deadline = time.time() + request_deadline_seconds(x_request_timeout)
+        cost = estimate_cost(request.loan) * request.paths // SIMULATION_COST_DIVISOR
+        return run_in_lane(cost, deadline, calculate_arm_simulation, request)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def calculate_arm_simulation(request: ArmSimulationRequest):
+    if request.loan.period_overrides:
+        raise ValueError("Simulation doesn't support period overrides")
+    calculator = create_calculator(request.loan)
+    with timed_phase("simulation"):
+        result = simulate_arm(calculator, request.paths, seed=request.seed, model=request.model,
+                              volatility=request.volatility, mean_reversion=request.mean_reversion,
+                              long_run_index=request.long_run_index, percentiles=request.percentiles)
+    return {"seed": request.seed, "model": request.model, **result}
+
+# Solvable fields: grid unit, and lowest and highest grid values (in units) searched. Loan amounts
+# start at 100.00: much below that, a long loan's payment rounds to 0.00 and can't amortize it
+SOLVE_FIELDS = {
+    "loan_amount": (0.01, 10_000, 100_000_000_000),
+    "annual_interest_rate": (0.0001, 1, 1_000_000),
+    "loan_term": (1, 1, 10_000),
+    "additional_principal": (0.01, 0, 100_000_000_000),
+    "payment_amount": (0.01, 1, 100_000_000_000),
+}
+SOLVE_TARGETS = ("payment_amount", "total_interest", "actual_loan_term", "payoff_date")
+# Fields the target shrinks with as they grow (payoff_date compares as actual_loan_term); the target
+# grows with the others
+SOLVE_DECREASING = {("loan_term", "payment_amount"), ("additional_principal", "total_interest"),
+                    ("additional_principal", "actual_loan_term"), ("payment_amount", "total_interest"),
+                    ("payment_amount", "actual_loan_term")}
+# Engine evaluations a solve is expected to take, for lane routing
+SOLVE_COST_EVALUATIONS = 40
+
+@app.post("/solve")
+@instrumented("/solve")
+def solve(request: SolveRequest, x_request_timeout: Optional[float] = Header(None)):
+    # The value of solve_for that meets the target: the largest value whose payment, total interest or
+    # payoff does not exceed it (or the smallest, for fields the target shrinks with)
+    try:
+        check_solve_request(request)
+        deadline = time.time() + request_deadline_seconds(x_request_timeout)
+        return run_in_lane(estimate_cost(request.loan) * SOLVE_COST_EVALUATIONS, deadline, calculate_solve, request)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def check_solve_request(request: SolveRequest):
+    if request.solve_for not in SOLVE_FIELDS:
+        raise ValueError(f"Unsupported solve_for: {request.solve_for}")
+    if request.target not in SOLVE_TARGETS:
+        raise ValueError(f"Unsupported target: {request.target}")
+    if request.target == "payoff_date":
+        if request.payoff_date is None:
+            raise ValueError("payoff_date is required for target 'payoff_date'")
+    elif request.value is None:
+        raise ValueError(f"value is required for target '{request.target}'")
+    if request.target == "payment_amount":
+        if request.solve_for not in ("loan_amount", "annual_interest_rate", "loan_term"):
+            raise ValueError(f"{request.solve_for} doesn't determine the payment amount")
+        if request.loan.payment_amount is not None:
+            raise ValueError("The loan's payment_amount is fixed; leave it out to solve for a payment")
+    if request.solve_for == "annual_interest_rate" and request.loan.initial_interest_rate is not None:
+        raise ValueError("annual_interest_rate can't be solved for adjustable-rate loans")
+    if request.solve_for == "loan_term" and request.loan.amort_term is not None:
+        raise ValueError("loan_term can only be solved for when amort_term follows it")
+
+def calculate_solve(request: SolveRequest):
+    loan = request.loan.copy(update={"summary_only": True, "compare_additional_principal": None, "response_format": None,
+                                     "rollup": None})
+    unit, lower, upper = SOLVE_FIELDS[request.solve_for]
+    if request.solve_for == "additional_principal":
+        # Paying the whole balance as additional principal pays the loan off with the first payment
+        upper = max(round(loan.loan_amount * 100), 1)
+    calculator = create_calculator(loan)
+    if request.target == "payoff_date":
+        target = payments_due_by(calculator, request.payoff_date)
+        if target == 0:
+            raise ValueError("payoff_date is before the first due date")
+    else:
+        target = request.value
+    metric = "actual_loan_term" if request.target == "payoff_date" else request.target
+
+    evaluations = {}
+
+    def evaluate(units):
+        if units not in evaluations:
+            try:
+                evaluations[units] = solve_outcome(field_value(loan, request.solve_for, units), request.target == "payment_amount")
+            except Exception:
+                # e.g. negative amortization: the payment doesn't cover the interest
+                evaluations[units] = None
+        return evaluations[units]
+
+    def satisfies(units):
+        outcome = evaluate(units)
+        return outcome is not None and outcome[metric] <= target
+
+    start = closed_form_solution(request, loan, calculator)
+    method = "closed_form" if start is not None else "bracketed_search"
+    if start is None:
+        start = current_solve_units(request.solve_for, loan, calculator)
+    search = BracketedSearch(satisfies, lower, upper, (request.solve_for, metric) not in SOLVE_DECREASING)
+    with timed_phase("solve"):
+        units = search.run(start)
+    if units is None:
+        raise ValueError(f"No {request.solve_for} between {lower * unit:g} and {upper * unit:g} meets the target")
+
+    solved = field_value(loan, request.solve_for, units)
+    return {
+        "solve_for": request.solve_for,
+        "target": request.target,
+        request.solve_for: getattr(solved, request.solve_for),
+        "method": method,
+        "iterations": search.iterations,
+        "result": solve_outcome(solved),
+    }
+
+def field_value(loan: LoanRequest, field, units):
+    unit = SOLVE_FIELDS[field][0]
+    if unit == 1:
+        value = units
+    else:
+        value = round(units * unit, 4 if field == "annual_interest_rate" else 2)
+    return loan.copy(update={field: value})
+
+def solve_outcome(loan: LoanRequest, payment_only=False):
+    # What the target is compared against; the payment alone needs no amortization
+    calculator = create_calculator(loan)
+    if payment_only:
+        return {"payment_amount": float(calculator.payment_amount)}
+    totals = calculator.get_amortization_schedule(summary_only=True)
+    calendar = calculator.get_payment_calendar(totals["actual_loan_term"])
+    return {
+        "payment_amount": float(calculator.initial_payment_amount),
+        "total_interest": totals["total_interest"],
+        "total_payment": totals["total_payment"],
+        "actual_loan_term": totals["actual_loan_term"],
+        "payoff_date": calendar.dates[totals["actual_loan_term"] - 1].isoformat() if totals["actual_loan_term"] else None,
+    }
+
+def payments_due_by(calculator, payoff_date):
+    # Number of due dates on or before payoff_date
+    periods = calculator.loan_term
+    while True:
+        calendar = calculator.get_payment_calendar(periods)
+        dates = calendar.dates[:periods]
+        if dates[-1] > payoff_date or len(dates) < periods:
+            return sum(1 for due in dates if due <= payoff_date)
+        periods *= 2
+
+def closed_form_solution(request: SolveRequest, loan: LoanRequest, calculator):
+    # Grid units from inverting the payment formula, or None where there's no closed form: insured
+    # payments include the average premium, and a zero rate has no annuity factor
+    if request.target != "payment_amount" or request.solve_for not in ("loan_amount", "loan_term") or loan.credit_insurance:
+        return None
+    if calculator.days_method == '30 Day Month' and calculator.year_basis == 360:
+        rate_per_period = calculator.current_interest_rate / Decimal('12')
+        payment = Decimal(str(request.value)) - calculator.additional_principal
+    else:
+        rate_per_period = calculator.current_interest_rate / calculator.get_periods_per_year()
+        payment = Decimal(str(request.value))
+    if rate_per_period <= 0 or payment <= 0:
+        return None
+    if request.solve_for == "loan_amount":
+        # The engine rounds the payment half down to cents, so payments up to half a cent over round to it
+        return int(annuity_principal(payment + Decimal('0.005'), rate_per_period, calculator.amort_term) * 100)
+    periods = annuity_periods(calculator.principal, payment, rate_per_period)
+    return None if periods is None else math.ceil(periods)
+
+def current_solve_units(field, loan: LoanRequest, calculator):
+    # The loan's own value of field, where the search starts
+    unit = SOLVE_FIELDS[field][0]
+    if field == "payment_amount":
+        value = float(calculator.payment_amount)
+    else:
+        value = getattr(loan, field)
+    return round(value / unit)
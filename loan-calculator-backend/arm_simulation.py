@@ -0,0 +1,202 @@
+# Monte Carlo simulation of adjustable-rate loans over stochastic index paths.
+#
+# Every path is a lane in a set of NumPy float64 arrays, amortized under the same rules as
+# LoanCalculator.iter_schedule: the fixed-rate period, adjustments every adjustment_frequency
+# payments, the rate floor, periodic and lifetime caps, and (with adjust_payment) the payment
+# recalculated over the remaining term. At each adjustment the path's next index value replaces
+# the rate_adjustments list. Amounts are floats rounded to cents where the Decimal engine rounds,
+# so totals track it to within cents per path; the output is a distribution, not a schedule.
+#
+# Index models, with rates and volatility in percentage points and time in years:
+#   random_walk:     index += volatility * sqrt(dt) * Z
+#   mean_reverting:  index += mean_reversion * (long_run_index - index) * dt + volatility * sqrt(dt) * Z
+# Index values are floored at zero.
+
+import math
+
+import numpy as np
+
+SIMULATION_MODELS = ("random_walk", "mean_reverting")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Insurance is $0.15 per $100 of balance, capped at $45.00
+INSURANCE_RATE = 0.0015
+MAX_INSURANCE = 45.0
+
+# Paths still unpaid after this many times the longer of the loan and amortization terms are
+# reported as not paying off
+HORIZON_TERMS = 4
+
+# Reasons a path fails, matching the errors the Decimal engine raises on the same path
+FAILURE_REASONS = ("negative_amortization", "payment_recalculation", "no_payoff")
+
+
+def round_cents(values):
+    return np.round(values, 2)
+
+
+class IndexPaths:
+    # Seeded generator of index values (as fractions), one draw per path at each adjustment
+
+    def __init__(self, paths, initial_index, model, volatility, mean_reversion, long_run_index, years_per_step, seed):
+        if model not in SIMULATION_MODELS:
+            raise ValueError(f"Unsupported simulation model: {model}")
+        self.model = model
+        self.rng = np.random.default_rng(seed)
+        self.index = np.full(paths, initial_index, dtype=np.float64)
+        self.step_volatility = volatility * math.sqrt(years_per_step)
+        self.mean_reversion = mean_reversion
+        self.long_run_index = long_run_index
+        self.years_per_step = years_per_step
+
+    def advance(self):
+        shock = self.rng.standard_normal(len(self.index)) * self.step_volatility
+        if self.model == "mean_reverting":
+            self.index += self.mean_reversion * (self.long_run_index - self.index) * self.years_per_step
+        self.index += shock
+        np.maximum(self.index, 0.0, out=self.index)
+        return self.index
+
+
+def simulate_arm(calculator, paths, seed=None, model="random_walk", volatility=1.0, mean_reversion=0.5,
+                 long_run_index=None, percentiles=DEFAULT_PERCENTILES):
+    # calculator is a LoanCalculator for an adjustable-rate loan; its rate_adjustments are ignored.
+    # volatility and long_run_index are in percent (long_run_index defaults to the initial index).
+    # Returns the percentiles of total interest, peak payment and payoff term over the paths that
+    # paid off, and the number of paths that failed for each reason
+    if not calculator.is_adjustable_rate:
+        raise ValueError("Simulation requires an adjustable-rate loan (initial_interest_rate)")
+    initial_index = float(calculator.initial_index_rate)
+    index_paths = IndexPaths(
+        paths, initial_index, model, volatility / 100, mean_reversion,
+        initial_index if long_run_index is None else long_run_index / 100,
+        calculator.adjustment_frequency / float(calculator.get_periods_per_year()), seed)
+    results = amortize_paths(calculator, index_paths, paths)
+
+    completed = results["failure"] < 0
+    return {
+        "paths": paths,
+        "completed_paths": int(completed.sum()),
+        "failed_paths": {reason: int((results["failure"] == number).sum()) for number, reason in enumerate(FAILURE_REASONS)},
+        "total_interest": distribution(results["total_interest"][completed], percentiles),
+        "peak_payment": distribution(results["peak_payment"][completed], percentiles),
+        "payoff_term": distribution(results["payoff_term"][completed], percentiles),
+    }
+
+
+def amortize_paths(calculator, index_paths, paths):
+    # Amortizes the loan once per path, taking index values from index_paths.advance() at each
+    # adjustment. Returns per-path arrays: total_interest, peak_payment, payoff_term and failure
+    # (an index into FAILURE_REASONS, or -1 for paths that paid off)
+    if calculator.days_method == 'Actual':
+        year_basis = float(calculator.year_basis)
+    elif calculator.days_method == '30 Day Month' and calculator.year_basis == 360:
+        year_basis = None
+    else:
+        raise ValueError("Unsupported days method")
+
+    periods_per_year = float(calculator.get_periods_per_year())
+    horizon = max(calculator.loan_term, calculator.amort_term) * HORIZON_TERMS
+    days = np.asarray(calculator.get_payment_calendar(calculator.loan_term).days, dtype=np.float64)
+
+    margin = float(calculator.margin)
+    minimum_rate = float(calculator.minimum_interest_rate)
+    max_rate_change = float(calculator.max_rate_change) if calculator.max_rate_change is not None else None
+    max_rate = float(calculator.max_interest_rate) if calculator.max_interest_rate is not None else None
+    additional = float(calculator.additional_principal)
+
+    balance = np.full(paths, float(calculator.principal))
+    rate = np.full(paths, float(calculator.current_interest_rate))
+    payment = np.full(paths, float(calculator.payment_amount))
+    peak_payment = payment.copy()
+    total_interest = np.zeros(paths)
+    payoff_term = np.zeros(paths, dtype=np.int64)
+    active = balance > 0
+    failure = np.full(paths, -1, dtype=np.int8)
+
+    for payment_number in range(1, horizon + 1):
+        if not active.any():
+            break
+        period = payment_number - 1
+        if period >= len(days):
+            # Some paths outlive the calendar; extend it as the Decimal engine does
+            days = np.asarray(calculator.get_payment_calendar(min(payment_number * 2, horizon)).days, dtype=np.float64)
+            if period >= len(days):
+                # The calendar stopped at a date that can't be represented
+                failure[active] = FAILURE_REASONS.index("no_payoff")
+                active[:] = False
+                break
+
+        adjustment_period = payment_number - calculator.fixed_rate_period
+        if adjustment_period > 0 and (adjustment_period - 1) % calculator.adjustment_frequency == 0:
+            proposed = np.maximum(index_paths.advance() + margin, minimum_rate)
+            change = proposed - rate
+            if max_rate_change is not None:
+                change = np.clip(change, -max_rate_change, max_rate_change)
+            rate = rate + change
+            if max_rate is not None:
+                rate = np.minimum(rate, max_rate)
+
+            if calculator.adjust_payment:
+                remaining = calculator.loan_term - payment_number + 1
+                rate_per_period = rate / periods_per_year
+                if remaining <= 0:
+                    # The Decimal engine divides by zero recalculating a payment past the term
+                    failed = active & (balance > 0)
+                    failure[failed] = FAILURE_REASONS.index("payment_recalculation")
+                    active &= ~failed
+                else:
+                    growth = (1 + rate_per_period) ** remaining
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        recalculated = round_cents(balance * rate_per_period * growth / (growth - 1))
+                    # A zero rate has no annuity payment either
+                    failed = active & (rate_per_period == 0)
+                    failure[failed] = FAILURE_REASONS.index("payment_recalculation")
+                    active &= ~failed
+                    payment = np.where(active, recalculated, payment)
+                    peak_payment = np.where(active, np.maximum(peak_payment, payment), peak_payment)
+
+        if year_basis is None:
+            interest = balance * (rate / 12)
+        else:
+            interest = balance * (rate / year_basis) * days[period]
+        if calculator.credit_insurance:
+            insurance = np.minimum(round_cents(balance * INSURANCE_RATE), MAX_INSURANCE)
+        else:
+            insurance = 0.0
+
+        owed = balance + interest + insurance
+        final = owed <= payment + additional
+        principal = payment - interest - insurance
+        short = active & ~final & (principal < 0)
+        failure[short] = FAILURE_REASONS.index("negative_amortization")
+        active &= ~short
+
+        paid_additional = np.minimum(additional, balance - principal)
+        ending = np.where(final, 0.0, round_cents(balance - principal - paid_additional))
+
+        total_interest += np.where(active, interest, 0.0)
+        payoff_term += active
+        balance = np.where(active, np.maximum(ending, 0.0), balance)
+        active &= balance > 0
+    else:
+        failure[active] = FAILURE_REASONS.index("no_payoff")
+
+    return {
+        "total_interest": round_cents(total_interest),
+        "peak_payment": peak_payment,
+        "payoff_term": payoff_term,
+        "failure": failure,
+    }
+
+
+def distribution(values, percentiles):
+    if not len(values):
+        return None
+    # Reported to the cent (or hundredth of a payment), like the engine's totals
+    summary = {f"p{percentile:g}": round(float(value), 2)
+               for percentile, value in zip(percentiles, np.percentile(values, percentiles))}
+    summary["mean"] = round(float(values.mean()), 2)
+    summary["min"] = round(float(values.min()), 2)
+    summary["max"] = round(float(values.max()), 2)
+    return summary
@@ -0,0 +1,109 @@
+# Arrow IPC and Parquet export of schedules, one row per payment with a loan_id column. Amounts are
+# decimal128 columns built straight from the schedule's cents, so values are exact.
+#
+# pyarrow is imported on first use, keeping it off the import path of the rest of the app.
+
+from datetime import date
+
+import numpy as np
+
+from schedule import MONEY_FIELDS, ROW_FIELDS
+
+COLUMNAR_MEDIA_TYPES = {"arrow": "application/vnd.apache.arrow.file", "parquet": "application/vnd.apache.parquet"}
+COLUMNAR_FILE_EXTENSIONS = {"arrow": "arrow", "parquet": "parquet"}
+# Rows buffered before a record batch (Parquet row group) is written
+COLUMNAR_BATCH_ROWS = 65536
+# Enough digits for any int64 number of cents
+CENTS_DECIMAL_PRECISION = 19
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def import_pyarrow():
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    return pyarrow
+
+
+def schedule_schema(pa):
+    fields = [pa.field("loan_id", pa.string(), nullable=False)]
+    for field in ROW_FIELDS:
+        if field == "payment_number":
+            fields.append(pa.field(field, pa.int32(), nullable=False))
+        elif field == "payment_date":
+            fields.append(pa.field(field, pa.date32(), nullable=False))
+        elif field in MONEY_FIELDS:
+            fields.append(pa.field(field, pa.decimal128(CENTS_DECIMAL_PRECISION, 2), nullable=False))
+        else:
+            fields.append(pa.field(field, pa.float64(), nullable=False))
+    return pa.schema(fields)
+
+
+def cents_array(pa, cents):
+    # decimal128 values are little-endian 128-bit integers of the unscaled amount, i.e. the cents
+    cents = np.frombuffer(cents, dtype=np.int64) if len(cents) else np.zeros(0, dtype=np.int64)
+    words = np.empty((len(cents), 2), dtype=np.int64)
+    words[:, 0] = cents
+    words[:, 1] = cents >> 63
+    return pa.Array.from_buffers(pa.decimal128(CENTS_DECIMAL_PRECISION, 2), len(cents), [None, pa.py_buffer(words)])
+
+
+def schedule_record_batch(pa, schema, loan_id, schedule):
+    arrays = [pa.array([loan_id] * len(schedule), pa.string())]
+    for field in ROW_FIELDS:
+        column = getattr(schedule, field)
+        if field == "payment_number":
+            arrays.append(pa.array(np.array(column, dtype=np.int32)))
+        elif field == "payment_date":
+            arrays.append(pa.array(np.array(column, dtype=np.int32) - EPOCH_ORDINAL, pa.int32()).cast(pa.date32()))
+        elif field in MONEY_FIELDS:
+            arrays.append(cents_array(pa, column))
+        else:
+            arrays.append(pa.array(np.array(column, dtype=np.float64)))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ColumnarScheduleWriter:
+    # Writes schedules of one or more loans to sink as an Arrow IPC file or a Parquet file
+
+    def __init__(self, sink, format):
+        if format not in COLUMNAR_MEDIA_TYPES:
+            raise ValueError(f"Unsupported columnar format: {format}")
+        self.pa = import_pyarrow()
+        self.schema = schedule_schema(self.pa)
+        self.format = format
+        if format == "arrow":
+            self.writer = self.pa.ipc.new_file(sink, self.schema)
+        else:
+            self.writer = self.pa.parquet.ParquetWriter(sink, self.schema)
+        self.pending = []
+        self.pending_rows = 0
+
+    def write(self, loan_id, schedule):
+        if not len(schedule):
+            return
+        self.pending.append(schedule_record_batch(self.pa, self.schema, loan_id, schedule))
+        self.pending_rows += len(schedule)
+        if self.pending_rows >= COLUMNAR_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        table = self.pa.Table.from_batches(self.pending, schema=self.schema)
+        if self.format == "arrow":
+            for batch in table.combine_chunks().to_batches():
+                self.writer.write_batch(batch)
+        else:
+            self.writer.write_table(table)
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def discard(self):
+        # Closes the writer without flushing, when the output is being thrown away
+        self.pending = []
+        self.writer.close()
@@ -0,0 +1,80 @@
+# Cost of solving the credit-insurance payment for insured loans of 12 to 480 periods, compared with
+# the 500-iteration fixed-point loop it replaced, and how many loans get a different payment from it.
+#
+#   python benchmarks/bench_insurance_solver.py [--loans 20]
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+from decimal import Decimal, ROUND_HALF_DOWN
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import LoanCalculator  # noqa: E402
+
+TERMS = [12, 36, 60, 120, 180, 240, 360, 480]
+
+
+def legacy_fixed_point(calculator, payment_without_insurance):
+    # Returns (payment or None if it failed to converge, simulations run), including the extra
+    # simulation calculate() used to make for the payment without insurance
+    payment = payment_without_insurance
+    simulations = 0
+    for _ in range(500):
+        previous_payment = payment
+        calculator.average_insurance_premiums.clear()
+        average_insurance_premium = calculator.calculate_average_insurance_premium(payment)
+        simulations += 1
+        payment = (payment_without_insurance + average_insurance_premium).quantize(Decimal('0.01'), rounding=ROUND_HALF_DOWN)
+        if abs(payment - previous_payment) < Decimal('0.05'):
+            return payment, simulations + 1
+    return None, simulations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Insured payment solver benchmark')
+    parser.add_argument('--loans', type=int, default=20, help='Loans per term')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f'{"term":>5} {"solver ms":>10} {"evals":>6} {"periods":>8} | {"legacy ms":>10} {"evals":>6} {"failed":>6} {"differ":>6}')
+    for term in TERMS:
+        loans = [dict(principal=round(rng.uniform(2000, 300000), 2), annual_interest_rate=round(rng.uniform(2, 18), 2),
+                      initial_interest_rate=None, payment_amount=None, payment_frequency='Monthly',
+                      first_due_date=date(2024, 1, 1), days_method='Actual', year_basis=365, loan_term=term)
+                 for _ in range(args.loans)]
+
+        solver_time = solver_evals = solver_periods = 0
+        payments = []
+        for loan in loans:
+            start = time.perf_counter()
+            calculator = LoanCalculator(credit_insurance=True, **loan)
+            # calculate() derives the payment without insurance from the solver's last simulation
+            calculator.calculate_average_insurance_premium(calculator.payment_amount)
+            solver_time += time.perf_counter() - start
+            solver_evals += calculator.insurance_solver_iterations
+            solver_periods += calculator.insurance_simulated_periods
+            payments.append(calculator.payment_amount)
+
+        legacy_time = legacy_evals = legacy_failed = legacy_differ = 0
+        for loan, solved in zip(loans, payments):
+            calculator = LoanCalculator(credit_insurance=False, **loan)
+            calculator.credit_insurance = True
+            start = time.perf_counter()
+            payment, simulations = legacy_fixed_point(calculator, calculator.payment_amount)
+            legacy_time += time.perf_counter() - start
+            legacy_evals += simulations
+            legacy_failed += payment is None
+            legacy_differ += payment is not None and payment != solved
+
+        count = len(loans)
+        print(f'{term:>5} {solver_time / count * 1000:>10.2f} {solver_evals / count:>6.1f} {solver_periods / count:>8.0f} | '
+              f'{legacy_time / count * 1000:>10.2f} {legacy_evals / count:>6.1f} {legacy_failed:>6} {legacy_differ:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# Throughput and memory of the loan book projection (loan_book.py): generates CSV books of the given
+# sizes, runs the CLI on each with each worker count, and reports loans per second with the peak RSS
+# of the CLI process and of its largest worker. Peak RSS should stay flat as the book grows.
+#
+#   python benchmarks/bench_loan_book.py [--loans 10000,40000] [--workers 1,2,4] [--seed 1]
+
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from load_test import ProcessSampler
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+BOOK_FIELDS = ['loan_id', 'loan_amount', 'annual_interest_rate', 'initial_interest_rate', 'margin',
+               'initial_index_rate', 'fixed_rate_period', 'adjustment_frequency', 'rate_adjustments',
+               'payment_frequency', 'first_due_date', 'days_method', 'year_basis', 'loan_term',
+               'credit_insurance', 'additional_principal']
+# (frequency, weight, terms)
+BOOK_MIX = [('Monthly', 12, (36, 60, 120, 180, 360)), ('Bi-Weekly', 2, (130, 260)), ('Weekly', 1, (156, 260)),
+            ('Quarterly', 1, (20, 40))]
+
+
+def write_book(path, loans, seed):
+    rng = random.Random(seed)
+    frequencies = [entry for entry in BOOK_MIX for _ in range(entry[1])]
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, BOOK_FIELDS)
+        writer.writeheader()
+        for number in range(loans):
+            frequency, _, terms = rng.choice(frequencies)
+            row = {
+                'loan_id': f'L{number}',
+                'loan_amount': round(rng.uniform(2000, 600000), 2),
+                'payment_frequency': frequency,
+                'first_due_date': date(2025, 1, 1) + timedelta(days=rng.randint(0, 364)),
+                'days_method': rng.choice(['Actual', '30 Day Month']),
+                'year_basis': 360,
+                'loan_term': rng.choice(terms),
+                'credit_insurance': rng.random() < 0.2,
+                'additional_principal': rng.choice(['', '', 25, 100]),
+            }
+            if frequency == 'Monthly' and rng.random() < 0.1:
+                # 354 payments: a term that is a whole number of adjustment periods runs into a payment
+                # recalculation over zero remaining payments in the engine
+                row.update(initial_interest_rate=round(rng.uniform(3, 7), 3), margin=2.5, initial_index_rate=2.0,
+                           fixed_rate_period=60, adjustment_frequency=12, loan_term=354,
+                           rate_adjustments=json.dumps([{'effective_date': '2029-06-01', 'index_rate': 3.5}]))
+            else:
+                row['annual_interest_rate'] = round(rng.uniform(2, 15), 3)
+            if rng.random() < 0.01:
+                row['loan_amount'] = 'n/a'
+            writer.writerow(row)
+
+
+def run_projection(book, workers, directory):
+    command = [sys.executable, 'loan_book.py', book, '--workers', str(workers),
+               '--output', os.path.join(directory, 'ledger.csv'), '--failures', os.path.join(directory, 'failures.csv')]
+    environment = {**os.environ, 'SCHEDULE_STORE_PATH': ''}
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=environment, stderr=subprocess.PIPE, text=True)
+    sampler = ProcessSampler(process.pid)
+    sampler.start()
+    _, summary = process.communicate()
+    elapsed = time.perf_counter() - started
+    processes = sampler.stop()
+    if process.returncode:
+        raise RuntimeError(f'loan_book.py failed: {summary}')
+    return elapsed, processes, summary.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Loan book projection throughput and memory')
+    parser.add_argument('--loans', default='10000,40000', help='Comma-separated book sizes')
+    parser.add_argument('--workers', default=','.join(sorted({'1', str(os.cpu_count() or 1)}, key=int)),
+                        help='Comma-separated worker counts')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for loans in [int(value) for value in args.loans.split(',')]:
+            book = os.path.join(directory, f'book-{loans}.csv')
+            write_book(book, loans, args.seed)
+            for workers in [int(value) for value in args.workers.split(',')]:
+                elapsed, processes, summary = run_projection(book, workers, directory)
+                cli_rss = max((entry['peak_rss_bytes'] for entry in processes if entry['role'] == 'server'), default=0)
+                worker_rss = max((entry['peak_rss_bytes'] for entry in processes if entry['role'] == 'worker'), default=0)
+                print(f'{loans:>8} loans {workers:>3} workers {loans / elapsed:9.0f} loans/s   '
+                      f'CLI peak RSS {cli_rss / 2 ** 20:7.1f} MiB   worker peak RSS {worker_rss / 2 ** 20:7.1f} MiB   '
+                      f'({summary})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# Benchmark suite for the loan engine and its HTTP endpoints.
+#
+#   python benchmarks/bench_suite.py [--filter Daily] [--repeat 5] [--save baseline.json]
+#   python benchmarks/bench_suite.py --compare baseline.json [--threshold 0.25]
+#
+# Covers every payment frequency, both day-count methods, terms up to 480 periods, credit insurance
+# on and off, ARMs with many capped rate adjustments, and full round trips through
+# /calculate-loan-amortization and the Excel exports. Each case runs in a fresh process and reports
+# the best and median wall time per run over --repeat samples, the peak of Python allocations during one run
+# (tracemalloc) and the peak RSS of the process.
+#
+# With --compare, exits with status 1 if any case's best wall time, allocation peak or peak RSS
+# grew by more than --threshold over the saved baseline. Baselines are machine specific; save one
+# on the machine that runs the comparison.
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+FREQUENCIES = ['Monthly', 'Bi-Weekly', 'Semimonthly', 'Semimonthly 1st and 15th', 'Weekly', 'Daily']
+DAY_COUNTS = [('Actual', 365), ('30 Day Month', 360)]
+TERMS = [120, 480]
+
+# Wall-time regressions smaller than this are noise, whatever the ratio
+MIN_WALL_REGRESSION_SECONDS = 0.002
+MIN_SAMPLE_SECONDS = 0.05
+
+
+def loan(frequency='Monthly', days_method='Actual', year_basis=365, loan_term=360, credit_insurance=False, **overrides):
+    payload = {
+        'loan_amount': 250000.0,
+        'annual_interest_rate': 6.5,
+        'payment_frequency': frequency,
+        'first_due_date': '2025-01-15',
+        'days_method': days_method,
+        'year_basis': year_basis,
+        'loan_term': loan_term,
+        'credit_insurance': credit_insurance,
+    }
+    payload.update(overrides)
+    return payload
+
+
+def arm_loan(adjustments, credit_insurance=False, adjust_payment=True, payment_amount=None):
+    # Monthly ARM with a 5-year fixed period, annual adjustments and periodic/lifetime/floor caps
+    first_adjustment = date(2030, 1, 1)
+    rate_adjustments = [
+        {
+            'effective_date': (first_adjustment + timedelta(days=365 * index // max(1, adjustments // 30))).isoformat(),
+            'index_rate': round(2.0 + (index * 37 % 50) / 10, 2),
+        }
+        for index in range(adjustments)
+    ]
+    return loan(loan_term=360, credit_insurance=credit_insurance, annual_interest_rate=None,
+                initial_interest_rate=5.25, initial_index_rate=3.0, margin=2.25, rate_adjustments=rate_adjustments,
+                max_rate_change=2.0, max_interest_rate=11.25, minimum_interest_rate=3.0, fixed_rate_period=60,
+                adjustment_frequency=12, adjust_payment=adjust_payment, payment_amount=payment_amount)
+
+
+def build_cases():
+    cases = []
+    for frequency in FREQUENCIES:
+        for days_method, year_basis in DAY_COUNTS:
+            for loan_term in TERMS:
+                for credit_insurance in (False, True):
+                    name = f"engine/{frequency}/{days_method}/{loan_term}/{'insured' if credit_insurance else 'uninsured'}"
+                    cases.append({'name': name, 'kind': 'engine',
+                                  'request': loan(frequency, days_method, year_basis, loan_term, credit_insurance)})
+    for adjustments in (30, 300):
+        for credit_insurance in (False, True):
+            name = f"engine/ARM/{adjustments} adjustments/{'insured' if credit_insurance else 'uninsured'}"
+            cases.append({'name': name, 'kind': 'engine', 'request': arm_loan(adjustments, credit_insurance)})
+    for credit_insurance in (False, True):
+        # A payment that covers the lifetime cap, so the loan amortizes without payment recalculation
+        name = f"engine/ARM/300 adjustments/fixed payment/{'insured' if credit_insurance else 'uninsured'}"
+        cases.append({'name': name, 'kind': 'engine',
+                      'request': arm_loan(300, credit_insurance, adjust_payment=False, payment_amount=2600.0)})
+
+    monthly = loan(loan_term=480, additional_principal=100.0)
+    cases.append({'name': 'http/calculate-loan-amortization/Monthly 480', 'kind': 'http-calculate', 'request': monthly})
+    cases.append({'name': 'http/calculate-loan-amortization/Monthly 480 cached', 'kind': 'http-calculate-cached',
+                  'request': monthly})
+    cases.append({'name': 'http/calculate-loan-amortization/Daily 480 insured', 'kind': 'http-calculate',
+                  'request': loan('Daily', loan_term=480, credit_insurance=True)})
+    cases.append({'name': 'http/calculate-loan-amortization/ARM 300 ndjson', 'kind': 'http-calculate',
+                  'request': {**arm_loan(300), 'response_format': 'ndjson'}})
+    cases.append({'name': 'http/export-excel/Monthly 480', 'kind': 'http-export-excel', 'request': monthly})
+    cases.append({'name': 'http/export-loan-excel/Monthly 480', 'kind': 'http-export-loan-excel', 'request': monthly})
+    return cases
+
+
+def prepare(case):
+    # Returns a callable running the case once; setup (imports, request parsing, the payload an
+    # export uploads) stays out of the timings
+    sys.path.insert(0, BACKEND_DIR)
+    import app
+
+    if case['kind'] == 'engine':
+        request = app.LoanRequest(**case['request'])
+        return lambda: app.compute_loan_amortization(request)
+
+    from fastapi.testclient import TestClient
+    client = TestClient(app.app)
+
+    def post(path, payload, clear_cache=True):
+        if clear_cache:
+            app.result_cache.clear()
+        response = client.post(path, json=payload)
+        # Read the whole body so streamed responses are fully produced
+        if len(response.content) == 0 or response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+
+    if case['kind'] == 'http-calculate':
+        return lambda: post('/calculate-loan-amortization', case['request'])
+    if case['kind'] == 'http-calculate-cached':
+        post('/calculate-loan-amortization', case['request'])
+        return lambda: post('/calculate-loan-amortization', case['request'], clear_cache=False)
+    if case['kind'] == 'http-export-excel':
+        computed = client.post('/calculate-loan-amortization', json=case['request']).json()
+        return lambda: post('/export-excel', computed)
+    if case['kind'] == 'http-export-loan-excel':
+        return lambda: post('/export-loan-excel', case['request'])
+    raise ValueError(f"Unknown case kind: {case['kind']}")
+
+
+def shutdown_app():
+    # Runs the app's shutdown handlers, which stop its process pools; a pool left running keeps this
+    # process from exiting
+    app = sys.modules.get('app')
+    if app is not None:
+        for handler in app.app.router.on_shutdown:
+            handler()
+
+
+def measure(case, repeat):
+    # Runs in a fresh process so peak RSS belongs to this case alone
+    run = prepare(case)
+    try:
+        run()
+    except Exception as e:
+        # Cases that fail (e.g. negative amortization) are still timed; the error path is a path too
+        error = str(e)
+    else:
+        error = None
+
+    def run_quietly():
+        try:
+            run()
+        except Exception:
+            pass
+
+    # Short cases are looped so each timing covers at least MIN_SAMPLE_SECONDS, which keeps timer
+    # resolution and scheduler noise out of the per-run figure
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run_quietly()
+        if time.perf_counter() - start >= MIN_SAMPLE_SECONDS:
+            break
+        loops *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run_quietly()
+        timings.append((time.perf_counter() - start) / loops)
+
+    tracemalloc.start()
+    run_quietly()
+    allocation_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    shutdown_app()
+
+    return {
+        'best_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'allocation_peak_bytes': allocation_peak,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'error': error,
+    }
+
+
+def run_cases(cases, repeat):
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for case in cases:
+        # Not a multiprocessing.Pool: its workers are daemonic and can't start the app's execution lanes
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(measure, case, repeat).result()
+        results[case['name']] = result
+        note = f"  ({result['error'][:60]})" if result['error'] else ''
+        print(f"{case['name']:<62} best {result['best_seconds'] * 1000:9.2f} ms  "
+              f"median {result['median_seconds'] * 1000:9.2f} ms  "
+              f"alloc {result['allocation_peak_bytes'] / 2 ** 20:7.2f} MiB  "
+              f"rss {result['peak_rss_bytes'] / 2 ** 20:7.1f} MiB{note}", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ('best_seconds', 'allocation_peak_bytes', 'peak_rss_bytes'):
+            old, new = before[metric], result[metric]
+            if old <= 0 or new <= old * (1 + threshold):
+                continue
+            if metric == 'best_seconds' and new - old < MIN_WALL_REGRESSION_SECONDS:
+                continue
+            regressions.append(f"{name}: {metric} {old:.6g} -> {new:.6g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Loan engine and endpoint benchmark suite')
+    parser.add_argument('--filter', default='', help='Only run cases whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--list', action='store_true', help='List the cases and exit')
+    parser.add_argument('--save', help='Write the results to this baseline file')
+    parser.add_argument('--compare', help='Compare against this baseline file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed relative growth of each metric before it counts as a regression')
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases() if args.filter in case['name']]
+    if args.list:
+        for case in cases:
+            print(case['name'])
+        return 0
+
+    results = run_cases(cases, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        print(f"{len(results)} cases compared against {args.compare}, {len(regressions)} regressions")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# Loans per second of vector_engine.amortize_fixed_rate against the scalar Decimal engine (run with
+# kernel='decimal'; single loans default to the cents kernel, see parity_cents_kernel.py).
+#
+#   python benchmarks/bench_vector_engine.py [--loans 5000] [--scalar-sample 200]
+#
+# The portfolio mimics a loan book: fixed-rate loans on a handful of frequencies and start dates.
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import LoanCalculator  # noqa: E402
+from vector_engine import amortize_fixed_rate  # noqa: E402
+
+
+def portfolio(count, seed, insured_share):
+    rng = random.Random(seed)
+    start_dates = [date(2024, month, 1) for month in range(1, 13)]
+    loans = []
+    for _ in range(count):
+        frequency = rng.choice(['Monthly', 'Monthly', 'Monthly', 'Bi-Weekly'])
+        loan_term = rng.choice([60, 120, 180, 240, 360]) if frequency == 'Monthly' else rng.choice([130, 260, 520])
+        loans.append({
+            'principal': round(rng.uniform(5000, 500000), 2),
+            'annual_interest_rate': round(rng.uniform(2, 12), 3),
+            'initial_interest_rate': None,
+            'payment_amount': None,
+            'payment_frequency': frequency,
+            'first_due_date': rng.choice(start_dates),
+            'days_method': 'Actual',
+            'year_basis': 365,
+            'loan_term': loan_term,
+            'additional_principal': rng.choice([0.0, 0.0, 0.0, 50.0, 200.0]),
+            'credit_insurance': rng.random() < insured_share,
+        })
+    return loans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector engine vs. Decimal engine throughput')
+    parser.add_argument('--loans', type=int, default=5000)
+    parser.add_argument('--scalar-sample', type=int, default=200,
+                        help='Loans timed on the Decimal engine (it is too slow to run the full book)')
+    parser.add_argument('--insured-share', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    loans = portfolio(args.loans, args.seed, args.insured_share)
+
+    start = time.perf_counter()
+    for loan in loans[:args.scalar_sample]:
+        LoanCalculator(**loan).get_amortization_schedule(kernel='decimal')
+    scalar_rate = min(args.scalar_sample, len(loans)) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    calculators = [LoanCalculator(**loan) for loan in loans]
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    results = amortize_fixed_rate(calculators)
+    elapsed = time.perf_counter() - start
+    vector_rate = len(loans) / (setup + elapsed)
+
+    failed = sum(1 for result in results if 'error' in result)
+    print(f'scalar Decimal engine: {scalar_rate:10.1f} loans/s ({args.scalar_sample} loans)')
+    print(f'vector engine:         {vector_rate:10.1f} loans/s ({len(loans)} loans, '
+          f'{setup:.2f}s setup + {elapsed:.2f}s amortization, {failed} errors)')
+    print(f'speedup:               {vector_rate / scalar_rate:10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Payload size and encode time of each response format for one long schedule (a daily loan over 30
+# years by default), against FastAPI's default path of jsonable_encoder over row dicts.
+#
+#   python benchmarks/bench_wire_formats.py [--frequency Daily] [--years 30] [--repeat 5]
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app import LoanRequest, compute_loan_amortization, encode_loan_amortization  # noqa: E402
+from payment_calendar import get_periods_per_year  # noqa: E402
+from wire_formats import (COLUMNS_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, compress, encode_result,  # noqa: E402
+                          offered_encodings, offered_media_types)
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response format size and encode time')
+    parser.add_argument('--frequency', default='Daily')
+    parser.add_argument('--years', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    request = LoanRequest(loan_amount=250000, annual_interest_rate=6.5, payment_frequency=args.frequency,
+                          first_due_date='2025-01-01', days_method='Actual', year_basis=365,
+                          loan_term=get_periods_per_year(args.frequency) * args.years, credit_insurance=True)
+    result = compute_loan_amortization(request)
+    schedule = result['amortization_schedule']
+    summary = {key: value for key, value in result.items() if key != 'amortization_schedule'}
+    print(f"{args.frequency} loan, {len(schedule)} payments")
+
+    encoders = [('jsonable_encoder rows (FastAPI default)',
+                 lambda: json.dumps(jsonable_encoder({**summary, 'amortization_schedule': list(schedule)})).encode())]
+    for media_type in offered_media_types():
+        if media_type == JSON_MEDIA_TYPE:
+            encoders.append((JSON_MEDIA_TYPE, lambda: encode_loan_amortization(result).encode()))
+        else:
+            encoders.append((media_type, lambda media_type=media_type: encode_result(summary, schedule, media_type)))
+
+    baseline_seconds, baseline = best_time(encoders[0][1], args.repeat)
+    for label, encode in encoders:
+        seconds, body = best_time(encode, args.repeat)
+        print(f"{label:<48} {len(body) / 1024:9.1f} KiB {seconds * 1000:9.2f} ms   "
+              f"{len(baseline) / len(body):5.1f}x smaller {baseline_seconds / seconds:5.1f}x faster")
+        if label in (JSON_MEDIA_TYPE, COLUMNS_MEDIA_TYPE, MSGPACK_MEDIA_TYPE):
+            for encoding in offered_encodings():
+                compress_seconds, compressed = best_time(lambda: compress(body, encoding), args.repeat)
+                total = seconds + compress_seconds
+                print(f"  + {encoding:<44} {len(compressed) / 1024:9.1f} KiB {total * 1000:9.2f} ms   "
+                      f"{len(baseline) / len(compressed):5.1f}x smaller {baseline_seconds / total:5.1f}x faster")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
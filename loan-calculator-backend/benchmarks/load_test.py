@@ -0,0 +1,439 @@
+# Load test for the FastAPI app: replays a weighted mix of generated loan requests at a range of
+# concurrency levels and reports throughput, latency percentiles, error rate and per-process CPU/RSS.
+#
+#   python benchmarks/load_test.py [--concurrency 1,2,4,8,16] [--duration 10] [--output load.json]
+#   python benchmarks/load_test.py --transport asgi --requests 200
+#   python benchmarks/load_test.py --server-workers 2 --env LIGHT_LANE_WORKERS=2 --env HEAVY_LANE_WORKERS=1
+#
+# With --transport uvicorn (the default) the app runs under uvicorn in a child process on a free local
+# port, configured with --env settings (lane sizes, cache sizes, ...), and is driven over keep-alive
+# HTTP connections, one client thread per concurrent request. With --transport asgi the app is called
+# in this process through its ASGI interface, one asyncio task per concurrent request, without any
+# networking; the app's execution lanes still run in their own worker processes.
+#
+# The mix (MIX, weighted) is short monthly loans, long daily loans, insured loans and ARMs. Loan
+# amounts are drawn from a seeded generator so requests don't hit the result cache, except for the
+# --repeat-fraction of them that replay an earlier payload. Each level is a closed loop: every client
+# sends its next request as soon as the last one completes, for --duration seconds or --requests
+# requests. CPU time and peak RSS are sampled from /proc for the server process and each of its child
+# processes (uvicorn workers, lane workers); they are omitted where /proc isn't available. The client
+# shares the machine with the server, so on small machines its own CPU use lowers the throughput.
+#
+# --output writes the configuration and every level's results as JSON.
+
+import argparse
+import asyncio
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PATH = '/calculate-loan-amortization'
+# (kind, weight)
+MIX = [('short_monthly', 6), ('long_daily', 1), ('insured', 2), ('arm', 1)]
+SAMPLE_INTERVAL_SECONDS = 0.25
+STARTUP_TIMEOUT_SECONDS = 30
+PERCENTILES = (50, 95, 99)
+
+
+def generate_request(kind, rng):
+    first_due_date = date(2025, 1, 1) + timedelta(days=rng.randint(0, 365))
+    payload = {
+        'loan_amount': round(rng.uniform(5000, 600000), 2),
+        'annual_interest_rate': round(rng.uniform(3, 12), 3),
+        'payment_frequency': 'Monthly',
+        'first_due_date': first_due_date.isoformat(),
+        'days_method': 'Actual',
+        'year_basis': 365,
+        'loan_term': rng.choice([36, 60, 120]),
+    }
+    if kind == 'long_daily':
+        payload.update(payment_frequency='Daily', loan_term=rng.choice([1825, 3650]), loan_amount=round(rng.uniform(5000, 60000), 2))
+    elif kind == 'insured':
+        payload.update(loan_term=rng.choice([180, 360]), credit_insurance=True,
+                       days_method=rng.choice(['Actual', '30 Day Month']))
+        if payload['days_method'] == '30 Day Month':
+            payload['year_basis'] = 360
+    elif kind == 'arm':
+        # The term ends mid adjustment year: when the last payment falls on an adjustment date, a cent
+        # left over runs the loan a payment past its term and recalculating that payment fails
+        payload.update(annual_interest_rate=None, initial_interest_rate=round(rng.uniform(3, 7), 3), margin=2.5,
+                       loan_term=354, fixed_rate_period=60, adjustment_frequency=12, max_rate_change=2.0,
+                       max_interest_rate=12.0,
+                       rate_adjustments=[
+                           {'effective_date': (first_due_date + timedelta(days=365 * year)).isoformat(),
+                            'index_rate': round(rng.uniform(1, 7), 2)}
+                           for year in range(5, 30)])
+    elif kind != 'short_monthly':
+        raise ValueError(f"Unknown request kind: {kind}")
+    return payload
+
+
+class RequestSource:
+    # Thread-safe stream of (kind, JSON body) from the weighted mix
+    def __init__(self, seed, repeat_fraction):
+        self.rng = random.Random(seed)
+        self.repeat_fraction = repeat_fraction
+        self.kinds = [kind for kind, _ in MIX]
+        self.weights = [weight for _, weight in MIX]
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            if self.sent and self.rng.random() < self.repeat_fraction:
+                return self.rng.choice(self.sent)
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            request = (kind, json.dumps(generate_request(kind, self.rng)).encode())
+            self.sent.append(request)
+            return request
+
+
+class LevelBudget:
+    # Ends a level after a duration or a number of requests, whichever is set
+    def __init__(self, duration, requests):
+        self.deadline = time.perf_counter() + duration if requests is None else None
+        self.remaining = requests
+        self.lock = threading.Lock()
+
+    def take(self):
+        if self.deadline is not None:
+            return time.perf_counter() < self.deadline
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+# Process sampling from /proc (Linux)
+
+def read_process(pid):
+    # (parent pid, CPU seconds, RSS bytes), or None if the process is gone or /proc isn't available
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    # Fields after the command name start at field 3 (state): ppid is 4, utime 14, stime 15, rss 24
+    ticks = os.sysconf('SC_CLK_TCK')
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def process_tree(root):
+    # The root pid and all of its descendants
+    parents = {}
+    try:
+        pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return [root]
+    for pid in pids:
+        info = read_process(pid)
+        if info is not None:
+            parents[pid] = info[0]
+    tree, frontier = [root], [root]
+    while frontier:
+        frontier = [pid for pid, parent in parents.items() if parent in frontier]
+        tree.extend(frontier)
+    return tree
+
+
+class ProcessSampler:
+    # Samples CPU time and RSS of the server process tree in a background thread during a level
+    def __init__(self, root):
+        self.root = root
+        self.processes = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def sample(self):
+        for pid in process_tree(self.root):
+            info = read_process(pid)
+            if info is None:
+                continue
+            _, cpu_seconds, rss = info
+            seen = self.processes.setdefault(pid, {'cpu_start': cpu_seconds, 'cpu_end': cpu_seconds, 'peak_rss': rss})
+            seen['cpu_end'] = cpu_seconds
+            seen['peak_rss'] = max(seen['peak_rss'], rss)
+
+    def run(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL_SECONDS):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self.started = time.perf_counter()
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+        elapsed = time.perf_counter() - self.started
+        report = []
+        for pid, seen in sorted(self.processes.items()):
+            cpu_seconds = seen['cpu_end'] - seen['cpu_start']
+            report.append({
+                'pid': pid,
+                'role': 'server' if pid == self.root else 'worker',
+                'cpu_seconds': round(cpu_seconds, 3),
+                'cpu_percent': round(100 * cpu_seconds / elapsed, 1) if elapsed > 0 else None,
+                'peak_rss_bytes': seen['peak_rss'],
+            })
+        return report
+
+
+# Transports
+
+class UvicornServer:
+    def __init__(self, workers, env):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        self.store_dir = tempfile.TemporaryDirectory()
+        environment = {**os.environ, 'SCHEDULE_STORE_PATH': os.path.join(self.store_dir.name, 'schedules.sqlite3'),
+                       **env}
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(self.port),
+             '--workers', str(workers), '--log-level', 'warning'],
+            cwd=BACKEND_DIR, env=environment)
+        self.pid = self.process.pid
+        self.wait_ready()
+
+    def wait_ready(self):
+        deadline = time.time() + STARTUP_TIMEOUT_SECONDS
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {self.process.returncode}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                connection.request('GET', '/cache-stats')
+                if connection.getresponse().status == 200:
+                    connection.close()
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("uvicorn didn't start")
+
+    def run_level(self, concurrency, source, budget):
+        samples = []
+        lock = threading.Lock()
+
+        def client():
+            connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+            results = []
+            while budget.take():
+                kind, body = source.next()
+                started = time.perf_counter()
+                try:
+                    connection.request('POST', PATH, body, {'Content-Type': 'application/json'})
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException) as e:
+                    status = type(e).__name__
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+                results.append((kind, status, time.perf_counter() - started))
+            connection.close()
+            with lock:
+                samples.extend(results)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.store_dir.cleanup()
+
+
+class AsgiApp:
+    def __init__(self, env):
+        self.store_dir = tempfile.TemporaryDirectory()
+        os.environ.setdefault('SCHEDULE_STORE_PATH', os.path.join(self.store_dir.name, 'schedules.sqlite3'))
+        os.environ.update(env)
+        sys.path.insert(0, BACKEND_DIR)
+        import app
+        self.module = app
+        self.pid = os.getpid()
+
+    async def call(self, body):
+        # One POST through the app's ASGI interface; returns the response status
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': PATH, 'raw_path': PATH.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        status = None
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        await self.module.app(scope, receive, send)
+        return status
+
+    def run_level(self, concurrency, source, budget):
+        async def client():
+            results = []
+            while budget.take():
+                kind, body = source.next()
+                started = time.perf_counter()
+                try:
+                    status = await self.call(body)
+                except Exception as e:
+                    status = type(e).__name__
+                results.append((kind, status, time.perf_counter() - started))
+            return results
+
+        async def level():
+            return await asyncio.gather(*[client() for _ in range(concurrency)])
+
+        return [sample for results in asyncio.run(level()) for sample in results]
+
+    def close(self):
+        # The app's shutdown handlers stop its execution lanes and close the schedule store
+        for handler in self.module.app.router.on_shutdown:
+            handler()
+        self.store_dir.cleanup()
+
+
+# Reporting
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    # Nearest rank
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def latency_report(latencies):
+    latencies = sorted(latencies)
+    report = {f'p{percent}_ms': None if not latencies else round(percentile(latencies, percent) * 1000, 3)
+              for percent in PERCENTILES}
+    report['mean_ms'] = round(statistics.fmean(latencies) * 1000, 3) if latencies else None
+    report['max_ms'] = round(latencies[-1] * 1000, 3) if latencies else None
+    return report
+
+
+def level_report(concurrency, samples, elapsed, processes):
+    errors = [status for _, status, _ in samples if not (isinstance(status, int) and status < 400)]
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+        'error_rate': round(len(errors) / len(samples), 4) if samples else None,
+        'statuses': statuses,
+        'latency': latency_report([latency for _, _, latency in samples]),
+        'latency_by_kind': {kind: {'requests': len(latencies), **latency_report(latencies)}
+                            for kind, latencies in group_by_kind(samples).items()},
+        'processes': processes,
+    }
+
+
+def group_by_kind(samples):
+    groups = {}
+    for kind, _, latency in samples:
+        groups.setdefault(kind, []).append(latency)
+    return groups
+
+
+def print_level(report):
+    latency = report['latency']
+    cpu = sum(process['cpu_seconds'] for process in report['processes'])
+    rss = sum(process['peak_rss_bytes'] for process in report['processes'])
+    print(f"c={report['concurrency']:<4} {report['requests']:6d} req  {report['throughput_rps']:8.2f} req/s  "
+          f"p50 {latency['p50_ms']:9.2f} ms  p95 {latency['p95_ms']:9.2f} ms  p99 {latency['p99_ms']:9.2f} ms  "
+          f"errors {report['error_rate'] * 100:5.1f}%  cpu {cpu:7.2f} s over {len(report['processes'])} processes  "
+          f"rss {rss / 2 ** 20:8.1f} MiB", flush=True)
+
+
+def parse_env(assignments):
+    env = {}
+    for assignment in assignments:
+        name, separator, value = assignment.partition('=')
+        if not separator:
+            raise SystemExit(f"--env expects NAME=VALUE, got {assignment!r}")
+        env[name] = value
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test for the loan calculator API')
+    parser.add_argument('--transport', choices=('uvicorn', 'asgi'), default='uvicorn')
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--requests', type=int, help='Requests per level, instead of --duration')
+    parser.add_argument('--warmup', type=int, default=20, help='Requests sent before the first level')
+    parser.add_argument('--repeat-fraction', type=float, default=0.0,
+                        help='Fraction of requests replaying an earlier payload (result cache hits)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--server-workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='Setting for the app, e.g. LIGHT_LANE_WORKERS=2 (repeatable)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    env = parse_env(args.env)
+    source = RequestSource(args.seed, args.repeat_fraction)
+    target = UvicornServer(args.server_workers, env) if args.transport == 'uvicorn' else AsgiApp(env)
+    results = []
+    try:
+        if args.warmup:
+            target.run_level(1, source, LevelBudget(None, args.warmup))
+        for concurrency in levels:
+            sampler = ProcessSampler(target.pid)
+            sampler.start()
+            started = time.perf_counter()
+            samples = target.run_level(concurrency, source, LevelBudget(args.duration, args.requests))
+            elapsed = time.perf_counter() - started
+            report = level_report(concurrency, samples, elapsed, sampler.stop())
+            print_level(report)
+            results.append(report)
+    finally:
+        target.close()
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != 'output'}
+        config.update(env=env, mix=dict(MIX), path=PATH, cpu_count=os.cpu_count())
+        with open(args.output, 'w') as f:
+            json.dump({'config': config, 'levels': results}, f, indent=2)
+    return 1 if any(report['requests'] == 0 for report in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
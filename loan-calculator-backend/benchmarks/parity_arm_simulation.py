@@ -0,0 +1,118 @@
+# Runs sampled arm_simulation paths through LoanCalculator, with each path's index values as its
+# rate_adjustments, and reports how far the vectorized totals are from the Decimal engine's. Also
+# times a full simulation.
+#
+#   python benchmarks/parity_arm_simulation.py [--paths 10000] [--sample 200] [--seed 1]
+
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import LoanCalculator  # noqa: E402
+import arm_simulation  # noqa: E402
+from arm_simulation import IndexPaths, amortize_paths, simulate_arm  # noqa: E402
+
+LOANS = {
+    'adjusting payment': dict(adjust_payment=True),
+    'fixed payment': dict(adjust_payment=False, payment_amount=1800.0),
+    'insured, 30/360': dict(adjust_payment=False, payment_amount=2000.0, credit_insurance=True,
+                            days_method='30 Day Month', year_basis=360),
+    'semimonthly, additional principal': dict(adjust_payment=True, payment_frequency='Semimonthly', loan_term=720,
+                                              additional_principal=25.0, fixed_rate_period=120, adjustment_frequency=24),
+}
+MODEL = dict(model='mean_reverting', volatility=1.5, mean_reversion=0.3, long_run_index=4.0)
+
+
+def arm_calculator(**overrides):
+    loan = dict(principal=250000.0, annual_interest_rate=None, initial_interest_rate=5.25, payment_amount=None,
+                payment_frequency='Monthly', first_due_date=date(2025, 1, 15), days_method='Actual', year_basis=365,
+                loan_term=360, initial_index_rate=3.0, margin=2.25, rate_adjustments=None, max_rate_change=2.0,
+                max_interest_rate=11.25, minimum_interest_rate=3.0, fixed_rate_period=60, adjustment_frequency=12)
+    loan.update(overrides)
+    return LoanCalculator(**loan)
+
+
+def path_rate_adjustments(calculator, index_values):
+    # The path's index values, effective on the due dates of the adjustments that consume them
+    adjustments = []
+    payment_number = calculator.fixed_rate_period + 1
+    calendar = calculator.get_payment_calendar(calculator.fixed_rate_period + len(index_values) * calculator.adjustment_frequency)
+    for value in index_values:
+        if payment_number > len(calendar):
+            break
+        adjustments.append({'effective_date': calendar.dates[payment_number - 1], 'index_rate': value * 100})
+        payment_number += calculator.adjustment_frequency
+    return adjustments
+
+
+class RecordedPaths:
+    # Replays recorded index values, one row per adjustment
+
+    def __init__(self, values):
+        self.values = iter(values)
+
+    def advance(self):
+        return next(self.values).copy()
+
+
+def compare(name, overrides, sample, seed):
+    calculator = arm_calculator(**overrides)
+    horizon = max(calculator.loan_term, calculator.amort_term) * arm_simulation.HORIZON_TERMS
+    draws = IndexPaths(sample, float(calculator.initial_index_rate), MODEL['model'], MODEL['volatility'] / 100,
+                       MODEL['mean_reversion'], MODEL['long_run_index'] / 100,
+                       calculator.adjustment_frequency / float(calculator.get_periods_per_year()), seed)
+    index_values = [draws.advance().copy() for _ in range(horizon // calculator.adjustment_frequency + 1)]
+    vector = amortize_paths(arm_calculator(**overrides), RecordedPaths(index_values), sample)
+
+    worst_interest = worst_payment = 0.0
+    term_mismatches = failure_mismatches = 0
+    for path in range(sample):
+        rate_adjustments = path_rate_adjustments(calculator, [values[path] for values in index_values])
+        scalar = arm_calculator(**overrides, rate_adjustments=rate_adjustments)
+        try:
+            schedule = scalar.get_amortization_schedule(kernel='decimal')['schedule']
+        except Exception:
+            failure_mismatches += vector['failure'][path] < 0
+            continue
+        if vector['failure'][path] >= 0:
+            failure_mismatches += 1
+            continue
+        # Scheduled payments, without the additional principal
+        payments = [amount - extra for amount, extra in zip(schedule.column('payment_amount'),
+                                                            schedule.column('additional_principal'))]
+        worst_interest = max(worst_interest, abs(float(round(scalar.total_interest, 2)) - vector['total_interest'][path]))
+        worst_payment = max(worst_payment, abs(max(payments) - vector['peak_payment'][path]))
+        term_mismatches += scalar.total_payments != vector['payoff_term'][path]
+
+    print(f"{name:<36} {sample} paths: max total interest difference {worst_interest:.2f}, "
+          f"max peak payment difference {worst_payment:.2f}, payoff term mismatches {term_mismatches}, "
+          f"failure mismatches {failure_mismatches}")
+    return term_mismatches + failure_mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ARM simulation parity and timing')
+    parser.add_argument('--paths', type=int, default=10000)
+    parser.add_argument('--sample', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    mismatches = 0
+    for name, overrides in LOANS.items():
+        mismatches += compare(name, overrides, args.sample, args.seed)
+
+    for name, overrides in LOANS.items():
+        start = time.perf_counter()
+        result = simulate_arm(arm_calculator(**overrides), args.paths, seed=args.seed, **MODEL)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<36} {args.paths} paths in {elapsed:.2f}s, median total interest "
+              f"{result['total_interest']['p50'] if result['total_interest'] else None}, failed {result['failed_paths']}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# Compares cents_kernel against LoanCalculator's Decimal engine to the cent on randomized loans (fixed
+# and adjustable rate, insurance, custom payments, compared additional-principal scenarios, every
+# frequency and day-count method), then times both on long schedules.
+#
+#   python benchmarks/parity_cents_kernel.py [--loans 2000] [--seed 1] [--repeat 3]
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import CHECKPOINT_INTERVAL, LoanCalculator  # noqa: E402
+from cents_kernel import KernelFallback, amortize_in_cents, supports_cents_kernel  # noqa: E402
+from engine_state import ScheduleCheckpoints  # noqa: E402
+from schedule import ROW_FIELDS  # noqa: E402
+
+FREQUENCIES = ['Monthly', 'Bi-Weekly', 'Weekly', 'Semimonthly', 'Semimonthly 15th and EOM',
+               'Semimonthly 1st and 15th', 'Quarterly', 'Semiannually', 'Annually', 'Daily']
+TERMS = {'Daily': (30, 1500), 'Weekly': (26, 520), 'Bi-Weekly': (26, 520), 'Annually': (1, 30),
+         'Semiannually': (2, 60), 'Quarterly': (4, 120)}
+
+# Long schedules for the timing run: (label, loan)
+TIMED_LOANS = [
+    ('monthly, 480 payments', {'annual_interest_rate': 6.875, 'payment_frequency': 'Monthly', 'loan_term': 480}),
+    ('monthly insured, 480', {'annual_interest_rate': 6.875, 'payment_frequency': 'Monthly', 'loan_term': 480,
+                              'credit_insurance': True}),
+    ('weekly, 30/360, 1560', {'annual_interest_rate': 7.25, 'payment_frequency': 'Weekly', 'loan_term': 1560,
+                              'days_method': '30 Day Month', 'year_basis': 360}),
+    ('daily, 3650 payments', {'annual_interest_rate': 9.5, 'payment_frequency': 'Daily', 'loan_term': 3650}),
+    ('ARM monthly, 360', {'initial_interest_rate': 5.5, 'margin': 2.5, 'fixed_rate_period': 60,
+                          'adjustment_frequency': 12, 'max_rate_change': 2, 'payment_frequency': 'Monthly',
+                          'loan_term': 360}),
+]
+
+
+def random_loan(rng):
+    frequency = rng.choice(FREQUENCIES)
+    days_method = 'Actual' if frequency == 'Daily' else rng.choice(['Actual', '30 Day Month'])
+    loan_term = rng.randint(*TERMS.get(frequency, (6, 480)))
+    loan = {
+        'principal': round(rng.uniform(100, 750000), rng.choice([0, 2])),
+        'annual_interest_rate': round(rng.uniform(0.25, 24), rng.choice([1, 2, 3, 6])),
+        'initial_interest_rate': None,
+        'payment_amount': None,
+        'payment_frequency': frequency,
+        'first_due_date': date(2020, 1, 1) + timedelta(days=rng.randint(0, 3000)),
+        'days_method': days_method,
+        'year_basis': 360 if days_method == '30 Day Month' or rng.random() < 0.3 else 365,
+        'loan_term': loan_term,
+        'amort_term': loan_term if rng.random() < 0.8 else loan_term + rng.randint(1, 60),
+        'additional_principal': rng.choice([0.0, 0.0, 10.0, 55.55, 250.0]),
+        'credit_insurance': rng.random() < 0.3,
+    }
+    if rng.random() < 0.25:
+        first_due_date = loan['first_due_date']
+        loan.update({
+            'annual_interest_rate': None,
+            'initial_interest_rate': round(rng.uniform(2, 9), 3),
+            'margin': 2.5,
+            'fixed_rate_period': rng.randint(1, 36),
+            'adjustment_frequency': rng.choice([1, 6, 12]),
+            'max_rate_change': rng.choice([None, 1, 2]),
+            'max_interest_rate': rng.choice([None, 12]),
+            'adjust_payment': rng.random() < 0.8,
+            'rate_adjustments': [
+                {'effective_date': first_due_date + timedelta(days=90 * k), 'index_rate': round(rng.uniform(0, 9), 2)}
+                for k in range(rng.randint(0, 12))],
+        })
+    if rng.random() < 0.1:
+        # Custom payments, some of them too small to cover interest
+        loan['payment_amount'] = round(loan['principal'] / loan_term * rng.uniform(0.5, 2.0), 2)
+    return loan
+
+
+def random_scenarios(rng):
+    if rng.random() < 0.7:
+        return None
+    return sorted({0.0, *(rng.choice([5.0, 25.0, 100.0, 333.33, 1000.0]) for _ in range(rng.randint(1, 3)))})
+
+
+def engine_view(calculator, scenarios, kernel):
+    # Everything a calculation reports, or its error; None if the kernel can't take the loan
+    checkpoints = ScheduleCheckpoints()
+    try:
+        if kernel == 'cents':
+            if not supports_cents_kernel(calculator, scenarios):
+                return None
+            amortize_in_cents(calculator, False, scenarios, checkpoints, CHECKPOINT_INTERVAL)
+        else:
+            calculator.run_schedule(False, scenarios, checkpoints=checkpoints, kernel='decimal')
+    except KernelFallback:
+        return None
+    except Exception as e:
+        return {'error': str(e)}
+    return {
+        'schedule': [getattr(calculator.schedule, field) for field in ROW_FIELDS],
+        'totals': calculator.get_totals(),
+        'payment_amount': calculator.payment_amount,
+        'index_rate': calculator.current_index_rate,
+        'scenarios': {amount: scenario.get_totals() for amount, scenario in calculator.scenarios.items()},
+        'checkpoints': [(state.payment_number, state.balance, state.interest_rate, state.payment_amount,
+                         round(state.totals[0], 2), state.totals[1:]) for state in checkpoints.states],
+        'insurance_solver': (calculator.insurance_solver_iterations, calculator.insurance_simulated_periods),
+    }
+
+
+def compare(args):
+    rng = random.Random(args.seed)
+    compared = mismatches = errors = fallbacks = 0
+    for _ in range(args.loans):
+        loan = random_loan(rng)
+        scenarios = random_scenarios(rng)
+        try:
+            expected = engine_view(LoanCalculator(**loan), scenarios, 'decimal')
+        except Exception:
+            continue
+        actual = engine_view(LoanCalculator(**loan), scenarios, 'cents')
+        if actual is None:
+            fallbacks += 1
+            continue
+        compared += 1
+        errors += 'error' in expected
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print('MISMATCH', loan, scenarios)
+                for key in sorted(set(expected) | set(actual)):
+                    if expected.get(key) != actual.get(key):
+                        print(f'  {key}: expected {str(expected.get(key))[:200]} got {str(actual.get(key))[:200]}')
+
+    print(f'{compared} loans compared ({errors} expected errors, {fallbacks} left to the Decimal engine), '
+          f'{mismatches} mismatches')
+    return mismatches
+
+
+def best_time(loan, kernel, repeat):
+    best = None
+    for _ in range(repeat):
+        calculator = LoanCalculator(**loan)
+        started = time.perf_counter()
+        calculator.run_schedule(kernel=kernel)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(args):
+    for label, overrides in TIMED_LOANS:
+        loan = {'principal': 350000, 'annual_interest_rate': None, 'initial_interest_rate': None,
+                'payment_amount': None, 'first_due_date': date(2025, 1, 1), 'days_method': 'Actual',
+                'year_basis': 365, **overrides}
+        decimal_time = best_time(loan, 'decimal', args.repeat)
+        cents_time = best_time(loan, 'cents', args.repeat)
+        print(f'{label:<24} decimal {decimal_time * 1000:8.2f} ms   cents {cents_time * 1000:8.2f} ms   '
+              f'{decimal_time / cents_time:5.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cents kernel vs. Decimal engine parity and timing')
+    parser.add_argument('--loans', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per loan (best is reported)')
+    parser.add_argument('--no-benchmark', action='store_true', help='Only compare')
+    args = parser.parse_args()
+
+    mismatches = compare(args)
+    if not args.no_benchmark:
+        benchmark(args)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Compares vector_engine.amortize_fixed_rate against LoanCalculator to the cent on randomized loans,
+# and the cash-flow ledger it builds against one summed from the Decimal engine's schedules.
+#
+#   python benchmarks/parity_vector_engine.py [--loans 2000] [--seed 1]
+
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import LoanCalculator  # noqa: E402
+from loan_book import CashFlowLedger  # noqa: E402
+from vector_engine import amortize_fixed_rate  # noqa: E402
+
+FREQUENCIES = ['Monthly', 'Bi-Weekly', 'Weekly', 'Semimonthly', 'Semimonthly 15th and EOM',
+               'Semimonthly 1st and 15th', 'Quarterly', 'Semiannually', 'Annually', 'Daily']
+TERMS = {'Daily': (30, 1500), 'Weekly': (26, 520), 'Bi-Weekly': (26, 520), 'Annually': (1, 30),
+         'Semiannually': (2, 60), 'Quarterly': (4, 120)}
+
+
+def random_loan(rng):
+    frequency = rng.choice(FREQUENCIES)
+    days_method = 'Actual' if frequency == 'Daily' else rng.choice(['Actual', '30 Day Month'])
+    loan_term = rng.randint(*TERMS.get(frequency, (6, 480)))
+    loan = {
+        'principal': round(rng.uniform(100, 750000), rng.choice([0, 2])),
+        'annual_interest_rate': round(rng.uniform(0.25, 24), rng.choice([1, 2, 3])),
+        'initial_interest_rate': None,
+        'payment_amount': None,
+        'payment_frequency': frequency,
+        'first_due_date': date(2020, 1, 1) + timedelta(days=rng.randint(0, 3000)),
+        'days_method': days_method,
+        'year_basis': 360 if days_method == '30 Day Month' or rng.random() < 0.3 else 365,
+        'loan_term': loan_term,
+        'amort_term': loan_term if rng.random() < 0.8 else loan_term + rng.randint(1, 60),
+        'additional_principal': rng.choice([0.0, 0.0, 10.0, 55.55, 250.0]),
+        'credit_insurance': rng.random() < 0.3,
+    }
+    if rng.random() < 0.1:
+        # Custom payments, some of them too small to cover interest
+        loan['payment_amount'] = round(loan['principal'] / loan_term * rng.uniform(0.5, 2.0), 2)
+    return loan
+
+
+def build_calculators(loans):
+    calculators = []
+    for loan in loans:
+        try:
+            calculators.append(LoanCalculator(**loan))
+        except Exception:
+            calculators.append(None)
+    return calculators
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector engine vs. Decimal engine parity')
+    parser.add_argument('--loans', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-schedule', action='store_true', help='Compare totals only')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    loans = [random_loan(rng) for _ in range(args.loans)]
+    scalar_calculators = build_calculators(loans)
+    vector_calculators = build_calculators(loans)
+    vector_ledger = CashFlowLedger()
+    vector_results = amortize_fixed_rate([c for c in vector_calculators if c is not None],
+                                         keep_schedule=not args.no_schedule, ledger=vector_ledger)
+    vector_results = iter(vector_results)
+
+    expected_ledger = CashFlowLedger()
+    compared = mismatches = errors = 0
+    for loan, calculator in zip(loans, scalar_calculators):
+        if calculator is None:
+            continue
+        expected = vector_engine_view(calculator, not args.no_schedule, expected_ledger)
+        actual = next(vector_results)
+        compared += 1
+        errors += 'error' in expected
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print('MISMATCH', loan)
+                for key in sorted(set(expected) | set(actual)):
+                    if expected.get(key) != actual.get(key):
+                        print(f'  {key}: expected {str(expected.get(key))[:200]} got {str(actual.get(key))[:200]}')
+
+    ledger_matches = (list(vector_ledger.rows()) == list(expected_ledger.rows())
+                      and vector_ledger.loans == expected_ledger.loans)
+    print(f'{compared} loans compared ({errors} expected errors), {mismatches} mismatches, '
+          f'cash-flow ledger {"matches" if ledger_matches else "MISMATCH"}')
+    return 1 if mismatches or not ledger_matches else 0
+
+
+def vector_engine_view(calculator, keep_schedule, ledger):
+    try:
+        data = calculator.get_amortization_schedule(kernel='decimal')
+    except Exception as e:
+        return {'error': str(e)}
+    ledger.add(data['schedule'])
+    if not keep_schedule:
+        del data['schedule']
+    return data
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,374 @@
+# Single-loan amortization in integer cents, an alternative to LoanCalculator.iter_schedule.
+#
+# Balances and payments are Python ints in cents, and each period's interest is kept exact as an
+# integer quotient and remainder over a denominator fixed per rate (rate denominator * year basis,
+# or * 12 for 30/360), so the engine's ROUND_HALF_UP/ROUND_HALF_DOWN quantization and the
+# round-half-even of reported amounts are reproduced to the cent without building a Decimal per
+# operation. Per-loan constants (rate, denominator, reported rate, insurance) are computed once per
+# rate rather than per period. As in vector_engine, a period that lands exactly on a rounding tie, or
+# on an equality that Decimal's 28-digit rounding could tip either way, is run through the Decimal
+# engine for that one step, and the few loans the kernel can't represent exactly (period overrides,
+# rollups, sub-cent amounts, interest denominators too large for the tie checks to be safe) raise
+# KernelFallback so the caller uses the Decimal engine instead. Rate adjustments and payment
+# recalculation happen a few times per loan and use the LoanCalculator's own Decimal methods.
+
+import copy
+import time
+from decimal import Decimal
+from fractions import Fraction
+
+from engine_state import AmortizationScenario, EngineState
+from schedule import Schedule
+
+# Past these, the Decimal engine's rounding to 28 digits (a few parts in 1e28 of each interest amount)
+# could reach 1/denominator of a cent, and the exact quotient/remainder would no longer predict how it
+# rounds. The numerator bound is on balance (cents) * rate numerator * days in a period
+MAX_INTEREST_DENOMINATOR = 10 ** 15
+MAX_INTEREST_NUMERATOR = 10 ** 26
+MAX_PERIOD_DAYS = 366
+# How close (in half cents) total interest may come to a half cent before the kernel defers to Decimal
+TOTAL_TIE_MARGIN = Fraction(1, 10 ** 12)
+
+# Insurance is $0.15 per $100 of balance, rounded half up to cents and capped at $45.00
+INSURANCE_RATE_NUMERATOR = 15
+INSURANCE_RATE_DENOMINATOR = 10000
+MAX_INSURANCE_CENTS = 4500
+
+
+class KernelFallback(Exception):
+    pass
+
+
+def to_cents(value):
+    # Whole cents of a Decimal amount, or None if it has fractions of a cent
+    cents = Decimal(value).scaleb(2)
+    if cents != cents.to_integral_value():
+        return None
+    return int(cents)
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def supports_cents_kernel(calculator, scenarios=None):
+    # Whether amortize_in_cents() can take the loan at all; it may still raise KernelFallback part way through
+    if calculator.period_overrides or calculator.rollup_options:
+        return False
+    if calculator.days_method != 'Actual' and not (calculator.days_method == '30 Day Month' and calculator.year_basis == 360):
+        return False
+    amounts = [calculator.principal, calculator.payment_amount, calculator.additional_principal]
+    amounts.extend(Decimal(str(amount)) for amount in scenarios or [])
+    return all(to_cents(amount) is not None for amount in amounts)
+
+
+class CentsLane:
+    # The main loan or one additional-principal scenario
+
+    def __init__(self, balance, payment, additional):
+        self.balance = balance
+        self.payment = to_cents(payment)
+        self.payment_decimal = payment
+        self.additional = additional
+        # Interest at earlier rates as a Fraction of cents, plus quotient/remainder at the current one
+        self.interest_carried = Fraction(0)
+        self.interest_quotient = 0
+        self.interest_remainder = 0
+        self.insurance = 0
+        self.additional_paid = 0
+        self.total_payment = 0
+        self.payments = 0
+        self.error = None
+
+    def set_payment(self, payment):
+        cents = to_cents(payment)
+        if cents is None:
+            raise KernelFallback("Payment amount with fractions of a cent")
+        self.payment = cents
+        self.payment_decimal = payment
+
+    def is_active(self):
+        return self.balance > 0 and self.error is None
+
+    def fold_interest(self, denominator):
+        # Called before the interest denominator changes
+        if self.interest_quotient or self.interest_remainder:
+            self.interest_carried += Fraction(self.interest_quotient * denominator + self.interest_remainder, denominator)
+            self.interest_quotient = self.interest_remainder = 0
+
+    def interest_total(self, denominator):
+        return self.interest_carried + Fraction(self.interest_quotient * denominator + self.interest_remainder, denominator)
+
+    def totals(self, denominator):
+        # Decimal running totals in the form LoanCalculator keeps them; interest is the exact sum
+        # rounded to Decimal's precision
+        interest = self.interest_total(denominator)
+        return (Decimal(interest.numerator) / Decimal(interest.denominator) / 100, from_cents(self.insurance),
+                from_cents(self.additional_paid), self.payments, from_cents(self.total_payment))
+
+    def scenario(self, additional_principal, denominator):
+        scenario = AmortizationScenario(additional_principal, from_cents(self.balance), self.payment_decimal)
+        (scenario.total_interest, scenario.total_insurance, scenario.total_additional_principal,
+         scenario.total_payments, scenario.total_payment_amount) = self.totals(denominator)
+        scenario.error = self.error
+        return scenario
+
+
+class CentsKernel:
+
+    def __init__(self, calculator, summary_only=False, scenarios=None, checkpoints=None, checkpoint_interval=0):
+        self.calculator = calculator
+        self.summary_only = summary_only
+        self.checkpoints = checkpoints
+        self.checkpoint_interval = checkpoint_interval
+        self.actual_days = calculator.days_method == 'Actual'
+        self.insured = calculator.credit_insurance
+
+        self.principal = principal = to_cents(calculator.principal)
+        self.main = CentsLane(principal, calculator.payment_amount, to_cents(calculator.additional_principal))
+        self.scenarios = {}
+        for amount in scenarios or []:
+            additional_principal = Decimal(str(amount))
+            self.scenarios[amount] = (additional_principal, CentsLane(
+                principal, calculator.scenario_payment_amount(additional_principal), to_cents(additional_principal)))
+        for _, lane in self.scenarios.values():
+            if lane.payment is None:
+                raise KernelFallback("Scenario payment amount with fractions of a cent")
+        if self.main.payment is None:
+            raise KernelFallback("Payment amount with fractions of a cent")
+
+        self.rate = None
+        self.set_rate(calculator.current_interest_rate)
+
+    def set_rate(self, rate):
+        if rate < 0:
+            raise KernelFallback("Negative interest rate")
+        rate_fraction = Fraction(rate)
+        if self.actual_days:
+            denominator = rate_fraction.denominator * self.calculator.year_basis
+        else:
+            denominator = rate_fraction.denominator * 12
+        if (denominator > MAX_INTEREST_DENOMINATOR
+                or self.principal * rate_fraction.numerator * MAX_PERIOD_DAYS > MAX_INTEREST_NUMERATOR):
+            raise KernelFallback("Interest too large or too precise for exact rounding checks")
+        if self.rate is not None:
+            for lane in self.lanes():
+                lane.fold_interest(self.denominator)
+        self.rate = rate
+        self.multiplier = rate_fraction.numerator
+        self.denominator = denominator
+        self.reported_rate = float(rate * Decimal('100'))
+
+    def lanes(self):
+        yield self.main
+        for _, lane in self.scenarios.values():
+            yield lane
+
+    def step(self, lane, days, payment_number, row):
+        # Advances a lane by one payment. Returns the schedule row in cents when row is set
+        balance = lane.balance
+        quotient, remainder = divmod(balance * self.multiplier * days, self.denominator)
+        twice = remainder * 2
+        if self.insured:
+            insurance = min((balance * INSURANCE_RATE_NUMERATOR + INSURANCE_RATE_DENOMINATOR // 2) // INSURANCE_RATE_DENOMINATOR,
+                            MAX_INSURANCE_CENTS)
+        else:
+            insurance = 0
+
+        scheduled = lane.payment + lane.additional
+        owed = balance + insurance + quotient
+        covered = lane.payment - insurance
+        exact = remainder == 0
+        if twice == self.denominator or (exact and (owed == scheduled or quotient == covered)):
+            # A tie, or an equality the Decimal engine's rounding could tip either way
+            payment, additional, interest, principal, ending = self.decimal_step(lane, days, payment_number)
+        elif (owed <= scheduled) if exact else (owed < scheduled):
+            # Final payment: the balance plus interest and insurance, rounded half up
+            interest = quotient + (twice > self.denominator)
+            payment = balance + insurance + interest
+            additional = 0
+            principal = balance
+            ending = 0
+        elif quotient > covered or (quotient == covered and not exact):
+            # Negative amortization; the Decimal engine raises the error
+            self.decimal_step(lane, days, payment_number)
+            raise KernelFallback("Decimal step didn't fail as expected")
+        else:
+            interest = quotient + (twice > self.denominator)
+            payment = scheduled
+            additional = lane.additional
+            principal = covered - interest
+            ending = balance - principal - additional
+
+        lane.interest_quotient += quotient
+        lane.interest_remainder += remainder
+        if lane.interest_remainder >= self.denominator:
+            lane.interest_quotient += 1
+            lane.interest_remainder -= self.denominator
+        lane.insurance += insurance
+        lane.additional_paid += additional
+        lane.total_payment += payment + additional
+        lane.payments += 1
+        lane.balance = max(ending, 0)
+        if row:
+            return balance, payment, additional, interest, principal, insurance, ending
+        return None
+
+    def decimal_step(self, lane, days, payment_number):
+        # One period through the Decimal engine, in cents; its exceptions propagate
+        calculator = self.calculator
+        balance = from_cents(lane.balance)
+        interest_paid = calculator.calculate_interest(balance, self.rate, days)
+        if self.insured:
+            insurance_paid = calculator.calculate_insurance_premium(balance)
+        else:
+            insurance_paid = Decimal('0.00')
+        total, principal_paid, additional_paid, ending_balance = calculator.apply_payment(
+            balance, interest_paid, insurance_paid, payment_number, lane.payment_decimal, from_cents(lane.additional))
+        total = to_cents(total)
+        additional_paid = to_cents(additional_paid)
+        ending_balance = to_cents(ending_balance)
+        if total is None or additional_paid is None or ending_balance is None:
+            raise KernelFallback("Decimal step with fractions of a cent")
+        return total, additional_paid, to_cents(round(interest_paid, 2)), to_cents(round(principal_paid, 2)), ending_balance
+
+    def run(self):
+        # Same loop as LoanCalculator.iter_schedule; leaves the calculator as that would, or raises
+        # KernelFallback without changing it (other than the payments of the scenarios)
+        calculator = self.calculator
+        started = time.perf_counter()
+        schedule = Schedule()
+        states = []
+        periods_per_year = calculator.get_periods_per_year()
+        calendar = calculator.get_payment_calendar(calculator.loan_term)
+        base_interest_rate = calculator.current_interest_rate
+        index_rate = calculator.current_index_rate
+        rate_adjustment_index = 0
+        main = self.main
+        scenario_lanes = [lane for _, lane in self.scenarios.values()]
+        payment_number = 1
+
+        while main.balance > 0 or any(lane.is_active() for lane in scenario_lanes):
+            period = payment_number - 1
+            if period >= len(calendar):
+                calendar = calculator.get_payment_calendar(payment_number * 2)
+                if period >= len(calendar):
+                    calculator.get_next_payment_date(calendar.dates[period])
+            current_date = calendar.dates[period]
+
+            if (self.checkpoints is not None and self.checkpoint_interval > 0 and payment_number > 1
+                    and (payment_number - 1) % self.checkpoint_interval == 0):
+                states.append(self.engine_state(payment_number, current_date, base_interest_rate, index_rate,
+                                                rate_adjustment_index))
+
+            if calculator.is_adjustable_rate and payment_number > calculator.fixed_rate_period:
+                adjustment_period = payment_number - calculator.fixed_rate_period
+                if (adjustment_period - 1) % calculator.adjustment_frequency == 0:
+                    new_index_rate = index_rate
+                    if calculator.rate_adjustments and rate_adjustment_index < len(calculator.rate_adjustments):
+                        rate_adjustment = calculator.rate_adjustments[rate_adjustment_index]
+                        if current_date >= rate_adjustment['effective_date']:
+                            new_index_rate = Decimal(str(rate_adjustment['index_rate'])) / Decimal('100')
+                            rate_adjustment_index += 1
+                    proposed_interest_rate = new_index_rate + calculator.margin
+                    if proposed_interest_rate < calculator.minimum_interest_rate:
+                        proposed_interest_rate = calculator.minimum_interest_rate
+                    rate_change = proposed_interest_rate - self.rate
+                    if calculator.max_rate_change is not None:
+                        if rate_change > calculator.max_rate_change:
+                            rate_change = calculator.max_rate_change
+                        elif rate_change < -calculator.max_rate_change:
+                            rate_change = -calculator.max_rate_change
+                    new_interest_rate = self.rate + rate_change
+                    if calculator.max_interest_rate is not None:
+                        new_interest_rate = min(new_interest_rate, calculator.max_interest_rate)
+                    index_rate = new_index_rate
+                    self.set_rate(new_interest_rate)
+
+                    if calculator.adjust_payment:
+                        remaining_payments = calculator.loan_term - payment_number + 1
+                        if main.balance > 0:
+                            main.set_payment(calculator.recalculate_payment_amount(
+                                from_cents(main.balance), self.rate, periods_per_year, remaining_payments))
+                        for lane in scenario_lanes:
+                            if lane.is_active():
+                                lane.set_payment(calculator.recalculate_payment_amount(
+                                    from_cents(lane.balance), self.rate, periods_per_year, remaining_payments))
+
+            if self.actual_days:
+                days = calendar.days[period]
+            else:
+                # The Decimal engine reads the next due date for its (unused) 30-day count
+                calendar.dates[period + 1]
+                days = 1
+
+            for lane in scenario_lanes:
+                if lane.is_active():
+                    try:
+                        self.step(lane, days, payment_number, False)
+                    except KernelFallback:
+                        raise
+                    except Exception as e:
+                        lane.error = e
+
+            if main.balance <= 0:
+                payment_number += 1
+                continue
+
+            row = self.step(main, days, payment_number, not self.summary_only)
+            if row is not None:
+                balance, payment, additional, interest, principal, insurance, ending = row
+                schedule.append_cents(payment_number, current_date, balance, payment, additional, interest, principal,
+                                      insurance, ending, self.reported_rate)
+            payment_number += 1
+
+        for lane in scenario_lanes:
+            if lane.error is not None:
+                raise lane.error
+
+        # The Decimal engine rounds the unrounded interest sum half even; near a tie, the result would
+        # depend on its own rounding of each period
+        totals = {}
+        for key, lane in [(None, main)] + [(amount, lane) for amount, (_, lane) in self.scenarios.items()]:
+            interest = lane.interest_total(self.denominator) / 100
+            rounded = round(interest, 2)
+            if abs(abs(interest - rounded) * 200 - 1) < TOTAL_TIE_MARGIN:
+                raise KernelFallback("Total interest on a rounding tie")
+            totals[key] = Decimal(rounded.numerator) / Decimal(rounded.denominator)
+
+        calculator.schedule = schedule
+        calculator.scenarios = {}
+        for amount, (additional_principal, lane) in self.scenarios.items():
+            scenario = lane.scenario(additional_principal, self.denominator)
+            scenario.total_interest = totals[amount]
+            calculator.scenarios[amount] = scenario
+        calculator.total_interest = totals[None]
+        calculator.total_insurance = from_cents(main.insurance)
+        calculator.total_additional_principal = from_cents(main.additional_paid)
+        calculator.total_payments = main.payments
+        calculator.total_payment_amount = from_cents(main.total_payment)
+        calculator.payment_amount = main.payment_decimal
+        calculator.current_index_rate = index_rate
+        if self.checkpoints is not None:
+            self.checkpoints.states.extend(states)
+        calculator.add_phase_time('amortization', started)
+        calculator.finish_totals()
+
+    def engine_state(self, payment_number, payment_date, base_interest_rate, index_rate, rate_adjustment_index):
+        # The EngineState LoanCalculator.iter_schedule would record here, for resuming on the Decimal engine
+        calculator = self.calculator
+        scenarios = {amount: lane.scenario(additional_principal, self.denominator)
+                     for amount, (additional_principal, lane) in self.scenarios.items()}
+        return EngineState(
+            payment_number, payment_date, from_cents(self.main.balance), self.rate, base_interest_rate, index_rate,
+            self.main.payment_decimal, calculator.additional_principal, rate_adjustment_index,
+            self.main.totals(self.denominator), copy.deepcopy(scenarios),
+            (calculator.insurance_solver_iterations, calculator.insurance_simulated_periods,
+             dict(calculator.average_insurance_premiums)),
+            None)
+
+
+def amortize_in_cents(calculator, summary_only=False, scenarios=None, checkpoints=None, checkpoint_interval=0):
+    # Amortizes calculator's loan like running LoanCalculator.iter_schedule to the end, or raises
+    # KernelFallback; call only when supports_cents_kernel() is true
+    CentsKernel(calculator, summary_only, scenarios, checkpoints, checkpoint_interval).run()
@@ -0,0 +1,82 @@
+# State of LoanCalculator's amortization loop: additional-principal scenarios advanced alongside the
+# main schedule, and the snapshots (checkpoints) a calculation can resume from.
+
+from decimal import Decimal
+
+
+class AmortizationScenario:
+    # Balance and running totals of the loan with a different additional principal, advanced by
+    # LoanCalculator.iter_schedule alongside the main schedule
+    def __init__(self, additional_principal, principal, payment_amount):
+        self.additional_principal = additional_principal
+        self.payment_amount = payment_amount
+        self.balance = principal
+        self.total_interest = Decimal('0')
+        self.total_insurance = Decimal('0')
+        self.total_additional_principal = Decimal('0')
+        self.total_payments = 0
+        self.total_payment_amount = Decimal('0')
+        self.error = None
+
+    def is_active(self):
+        return self.balance > 0 and self.error is None
+
+    def get_totals(self):
+        return {
+            'additional_principal': float(self.additional_principal),
+            'total_interest': float(round(self.total_interest, 2)),
+            'total_insurance': float(round(self.total_insurance, 2)),
+            'total_additional_principal': float(round(self.total_additional_principal, 2)),
+            'total_payment': float(round(self.total_payment_amount, 2)),
+            'actual_loan_term': self.total_payments,
+        }
+
+
+class EngineState:
+    # Snapshot of the amortization loop at the start of a payment, before that payment's rate
+    # adjustment and overrides. Plain values and Decimals, so it pickles; iter_schedule(resume=...)
+    # continues from it exactly as the original run did
+    def __init__(self, payment_number, payment_date, balance, interest_rate, base_interest_rate, index_rate,
+                 payment_amount, additional_principal, rate_adjustment_index, totals, scenarios, insurance_solver, rollup):
+        self.payment_number = payment_number
+        self.payment_date = payment_date
+        self.balance = balance
+        self.interest_rate = interest_rate
+        self.base_interest_rate = base_interest_rate
+        self.index_rate = index_rate
+        self.payment_amount = payment_amount
+        self.additional_principal = additional_principal
+        self.rate_adjustment_index = rate_adjustment_index
+        # (total_interest, total_insurance, total_additional_principal, total_payments, total_payment_amount)
+        self.totals = totals
+        self.scenarios = scenarios
+        # (insurance_solver_iterations, insurance_simulated_periods, average_insurance_premiums), so a
+        # resumed calculation reports the same metadata and reuses the same premiums
+        self.insurance_solver = insurance_solver
+        self.rollup = rollup
+
+
+class ScheduleCheckpoints:
+    # Engine states every CHECKPOINT_INTERVAL payments of one calculation, plus its schedule (None in
+    # summary-only mode). A calculation that only differs from some payment on resumes from the
+    # last state before it and reuses the schedule rows up to there
+    def __init__(self, states=None, schedule=None):
+        self.states = states if states is not None else []
+        self.schedule = schedule
+
+    def before(self, payment_number):
+        # The checkpoints a calculation changed from payment_number on can resume from, or None
+        states = [state for state in self.states if state.payment_number <= payment_number]
+        if not states:
+            return None
+        schedule = None if self.schedule is None else self.schedule.head(states[-1].payment_number - 1)
+        return ScheduleCheckpoints(states, schedule)
+
+    @property
+    def latest(self):
+        return self.states[-1]
+
+    def nbytes(self):
+        # Rough in-memory size, for the result cache's byte budget
+        rows = len(self.schedule) if self.schedule is not None else 0
+        return rows * 80 + len(self.states) * 1024
@@ -0,0 +1,154 @@
+# Execution lanes for CPU-bound calculations: each lane is a process pool with a bounded number of
+# admitted jobs (running plus queued). Jobs beyond that are refused with Overloaded rather than
+# queued without limit, and every job carries a deadline after which it is cancelled, in the worker
+# as well as in the caller.
+#
+# Lanes keep long calculations (e.g. daily insured loans) from queueing in front of short ones: the
+# caller estimates a job's cost and picks the lane.
+
+import math
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Time the caller waits past a job's deadline for the worker to report that it stopped
+DEADLINE_GRACE_SECONDS = 0.5
+# Weight of the latest job in a lane's average latency, used for Retry-After
+LATENCY_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    def __init__(self, lane, retry_after):
+        super().__init__(f"The {lane} calculation lane is full; retry in {retry_after} seconds")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(BaseException):
+    # Raised by the alarm wherever the job happens to be, so like KeyboardInterrupt it isn't an
+    # Exception: handlers in the job that record a failure and carry on (a sweep point, a solve
+    # evaluation, an additional-principal scenario) must not swallow it
+    pass
+
+
+def raise_deadline_exceeded(signum, frame):
+    raise DeadlineExceeded("Calculation deadline exceeded")
+
+
+def run_with_deadline(deadline, func, *args):
+    # Runs in the worker process. An interval timer interrupts func at the deadline, so a cancelled
+    # job frees its worker instead of running to completion
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise DeadlineExceeded("Calculation deadline exceeded before it started")
+    if not hasattr(signal, "setitimer"):
+        return func(*args)
+    previous = signal.signal(signal.SIGALRM, raise_deadline_exceeded)
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class ExecutionLane:
+    # max_workers processes, at most max_workers + max_queued admitted jobs. A lane without workers
+    # runs jobs in the calling thread, subject to admission control but not to deadlines
+
+    def __init__(self, name, max_workers, max_queued):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.slots = threading.BoundedSemaphore(max(1, max_workers) + max_queued)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.latency = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def retry_after(self):
+        # Latency includes the time spent queued, so with a full lane it approximates the wait for a slot
+        return max(1, math.ceil(self.latency or 1.0))
+
+    def run(self, deadline, func, *args):
+        # deadline is a time.time() timestamp; returns func(*args) or raises Overloaded/DeadlineExceeded
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+        with self.lock:
+            self.admitted += 1
+        started = time.perf_counter()
+        if self.max_workers <= 0:
+            try:
+                return func(*args)
+            finally:
+                self.finish(started)
+
+        executor = self.get_executor()
+        try:
+            future = executor.submit(run_with_deadline, deadline, func, *args)
+        except BaseException as e:
+            self.slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self.discard_executor(executor)
+            raise
+        # The slot is held until the worker is done with the job, not until the caller gives up on it
+        future.add_done_callback(lambda _: self.finish(started))
+        try:
+            return future.result(timeout=max(0, deadline - time.time()) + DEADLINE_GRACE_SECONDS)
+        except TimeoutError:
+            future.cancel()
+            with self.lock:
+                self.timed_out += 1
+            raise DeadlineExceeded("Calculation deadline exceeded")
+        except DeadlineExceeded:
+            with self.lock:
+                self.timed_out += 1
+            raise
+        except BrokenProcessPool:
+            self.discard_executor(executor)
+            raise
+
+    def discard_executor(self, executor):
+        # A worker died (e.g. killed for memory); the next job starts a fresh pool
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False)
+
+    def finish(self, started):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += LATENCY_SMOOTHING * (elapsed - self.latency)
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "average_latency_seconds": self.latency,
+            }
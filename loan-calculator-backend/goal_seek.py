@@ -0,0 +1,95 @@
+# Goal seek over one loan field: closed-form inversions of the annuity payment formula
+#
+#   payment = principal * r * (1 + r)^n / ((1 + r)^n - 1)
+#
+# for the principal and the number of payments, and a bracketed search over a whole-unit grid
+# (cents, hundredths of a basis point, payments) for everything else. The closed forms only give
+# a starting point: the search confirms it against the engine, which rounds the payment to cents.
+
+import math
+
+# Engine evaluations a single solve may use; bisection over a grid of 2^64 units needs fewer
+SOLVE_MAX_ITERATIONS = 200
+
+
+class SolveLimitExceeded(Exception):
+    pass
+
+
+def annuity_principal(payment, rate_per_period, periods):
+    # Principal whose level payment over periods is payment
+    growth = (1 + rate_per_period) ** periods
+    return payment * (growth - 1) / (rate_per_period * growth)
+
+
+def annuity_periods(principal, payment, rate_per_period):
+    # Number of payments (fractional) that pay off principal at payment, or None if the payment
+    # doesn't cover the first period's interest
+    interest = principal * rate_per_period
+    if payment <= interest:
+        return None
+    return -math.log(1 - float(interest / payment)) / math.log(1 + float(rate_per_period))
+
+
+class BracketedSearch:
+    # Finds the boundary of a monotone predicate on integers. satisfies(value) must hold for every
+    # value on one side of the answer (below it if satisfied_below, above it otherwise) and for
+    # none on the other; the search returns the satisfying value next to the boundary, or None
+
+    def __init__(self, satisfies, lower, upper, satisfied_below):
+        self.satisfies = satisfies
+        self.lower = lower
+        self.upper = upper
+        self.satisfied_below = satisfied_below
+        self.iterations = 0
+
+    def test(self, value):
+        if self.iterations >= SOLVE_MAX_ITERATIONS:
+            raise SolveLimitExceeded(f"No solution within {SOLVE_MAX_ITERATIONS} iterations")
+        self.iterations += 1
+        return self.satisfies(value)
+
+    def run(self, start):
+        start = min(max(int(start), self.lower), self.upper)
+        # Walk from start towards the unsatisfied side in doubling steps until the predicate flips,
+        # then bisect; inward is the direction of the satisfied side. A step that would pass a bound
+        # goes halfway to it instead, so a bound the engine can't evaluate doesn't end the walk
+        inward = -1 if self.satisfied_below else 1
+        if self.test(start):
+            satisfied, step = start, 1
+            edge = self.upper if self.satisfied_below else self.lower
+            while True:
+                if satisfied == edge:
+                    return edge
+                candidate = towards(satisfied, edge, step)
+                if not self.test(candidate):
+                    unsatisfied = candidate
+                    break
+                satisfied, step = candidate, step * 2
+        else:
+            unsatisfied, step = start, 1
+            edge = self.lower if self.satisfied_below else self.upper
+            while True:
+                if unsatisfied == edge:
+                    return None
+                candidate = towards(unsatisfied, edge, step)
+                if self.test(candidate):
+                    satisfied = candidate
+                    break
+                unsatisfied, step = candidate, step * 2
+
+        while abs(unsatisfied - satisfied) > 1:
+            middle = (satisfied + unsatisfied) // 2
+            if self.test(middle):
+                satisfied = middle
+            else:
+                unsatisfied = middle
+        return satisfied
+
+
+def towards(value, edge, step):
+    # value moved step towards edge, or halfway there (at least 1) if the step would pass it
+    distance = abs(edge - value)
+    if step > distance:
+        step = max(distance // 2, 1)
+    return value + step if edge > value else value - step
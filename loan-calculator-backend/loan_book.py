@@ -0,0 +1,297 @@
+# Cash-flow projection of a whole loan book: loan rows are streamed from a CSV or Parquet file and
+# amortized in chunks on a process pool. Workers sum each loan's payments into a ledger of per-period
+# totals as it is amortized, without keeping schedules, so only the ledger (one column per month,
+# quarter or year) and the failed rows travel back. Memory depends on the chunk size, the number of
+# periods and the chunks in flight, not on the number of loans.
+#
+# Each row is a loan as the API takes it (LoanRequest fields, plus an optional loan_id reported with
+# failures). Nulls and empty text are left out. List and object fields (rate_adjustments,
+# period_overrides, compare_additional_principal, rollup) are JSON text in CSV; in Parquet they are
+# either nested columns or JSON text.
+#
+#   python loan_book.py book.csv [--output ledger.csv] [--failures failures.csv] [--period month]
+#                                [--workers N] [--chunk-size 256]
+#
+# pyarrow is imported only to read Parquet.
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+import numpy as np
+
+LOAN_BOOK_FORMATS = ("csv", "parquet")
+LEDGER_PERIODS = ("month", "quarter", "year")
+# Loan fields given as JSON in CSV cells
+JSON_FIELDS = ("rate_adjustments", "period_overrides", "compare_additional_principal", "rollup")
+# Parquet rows read per record batch
+PARQUET_BATCH_ROWS = 4096
+
+# Ledger rows: loans with a payment in the period, payments, then amounts in cents summed from these
+# schedule columns
+LEDGER_COUNTS = ("loans", "payments")
+LEDGER_AMOUNTS = ("payment_amount", "principal_paid", "additional_principal", "interest_paid", "insurance_paid")
+LEDGER_FIELDS = LEDGER_COUNTS + LEDGER_AMOUNTS
+LEDGER_HEADERS = ("Period", "Loans", "Payments", "Total Payment", "Principal Paid", "Additional Principal",
+                  "Interest Paid", "Insurance Paid")
+FAILURE_HEADERS = ("Row", "Loan ID", "Error")
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MONTHS_PER_PERIOD = {"month": 1, "quarter": 3, "year": 12}
+
+
+def iter_loan_rows(source, format="csv"):
+    # (row number, loan dict) per row of a path or binary file; rows are numbered from 1, after the header
+    if format == "parquet":
+        return iter_parquet_rows(source)
+    if format == "csv":
+        return iter_csv_rows(source)
+    raise ValueError(f"Unsupported loan book format: {format}")
+
+
+def iter_csv_rows(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline="", encoding="utf-8-sig") as file:
+            yield from read_csv_rows(file)
+    else:
+        text = io.TextIOWrapper(source, newline="", encoding="utf-8-sig")
+        try:
+            yield from read_csv_rows(text)
+        finally:
+            # Leave the binary file open for its owner
+            text.detach()
+
+
+def read_csv_rows(file):
+    for number, record in enumerate(csv.DictReader(file), start=1):
+        loan = {}
+        for field, value in record.items():
+            if field is None or value is None:
+                continue
+            value = value.strip()
+            if value:
+                loan[field.strip()] = value
+        yield number, decode_json_fields(loan)
+
+
+def iter_parquet_rows(source):
+    import pyarrow.parquet
+
+    number = 0
+    for batch in pyarrow.parquet.ParquetFile(source).iter_batches(batch_size=PARQUET_BATCH_ROWS):
+        for record in batch.to_pylist():
+            number += 1
+            yield number, decode_json_fields({field: value for field, value in record.items()
+                                              if value is not None and not (isinstance(value, str) and not value.strip())})
+
+
+def decode_json_fields(loan):
+    for field in JSON_FIELDS:
+        value = loan.get(field)
+        if isinstance(value, str):
+            try:
+                loan[field] = json.loads(value)
+            except ValueError:
+                # Left as text for validation to report
+                pass
+    return loan
+
+
+def detect_format(path):
+    return "parquet" if str(path).lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def format_period(index, period):
+    # Label of a period index (months since year 0, divided by the months per period)
+    month = index * MONTHS_PER_PERIOD[period]
+    year = month // 12
+    if period == "year":
+        return f"{year:04d}"
+    if period == "quarter":
+        return f"{year:04d}-Q{month % 12 // 3 + 1}"
+    return f"{year:04d}-{month % 12 + 1:02d}"
+
+
+def format_cents(cents):
+    return f"{cents // 100}.{cents % 100:02d}" if cents >= 0 else "-" + format_cents(-cents)
+
+
+class CashFlowLedger:
+    # Totals per period over every schedule added: one int64 column per period from self.first on,
+    # one row per LEDGER_FIELDS entry. Amounts stay in cents, so the ledger is exact and chunks can be
+    # merged in any order.
+
+    def __init__(self, period="month"):
+        if period not in LEDGER_PERIODS:
+            raise ValueError(f"Unsupported ledger period: {period}")
+        self.period = period
+        self.first = 0
+        self.totals = np.zeros((len(LEDGER_FIELDS), 0), dtype=np.int64)
+        self.loans = 0
+        self.failed = 0
+
+    def period_indexes(self, ordinals):
+        months = (ordinals - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        return (months + 1970 * 12) // MONTHS_PER_PERIOD[self.period]
+
+    def reserve(self, first, last):
+        # Widen the columns to cover periods first..last
+        width = self.totals.shape[1]
+        if width and self.first <= first and last < self.first + width:
+            return
+        new_first = min(first, self.first) if width else first
+        new_last = max(last, self.first + width - 1) if width else last
+        totals = np.zeros((len(LEDGER_FIELDS), new_last - new_first + 1), dtype=np.int64)
+        totals[:, self.first - new_first:self.first - new_first + width] = self.totals
+        self.first = new_first
+        self.totals = totals
+
+    def add(self, schedule):
+        payments = len(schedule)
+        self.loans += 1
+        if not payments:
+            return
+        # Payment dates ascend, so each period's payments are one run of the columns
+        periods = self.period_indexes(np.frombuffer(schedule.payment_date, dtype=schedule.payment_date.typecode))
+        starts = np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+        amounts = np.vstack([np.frombuffer(getattr(schedule, field), dtype=np.int64) for field in LEDGER_AMOUNTS])
+        keys = periods[starts]
+        self.reserve(int(keys[0]), int(keys[-1]))
+        columns = keys - self.first
+        self.totals[0, columns] += 1
+        self.totals[1, columns] += np.diff(np.append(starts, payments))
+        self.totals[2:, columns] += np.add.reduceat(amounts, starts, axis=1)
+
+    def add_loan_totals(self, first, loan_totals):
+        # Loans already summed by period (see vector_engine.py): loan_totals[:, loan, column] holds
+        # the payments and LEDGER_AMOUNTS of one loan in period first + column
+        self.loans += loan_totals.shape[1]
+        width = loan_totals.shape[2]
+        if not loan_totals.shape[1] or not width:
+            return
+        self.reserve(first, first + width - 1)
+        offset = first - self.first
+        self.totals[0, offset:offset + width] += (loan_totals[0] > 0).sum(axis=0)
+        self.totals[1:, offset:offset + width] += loan_totals.sum(axis=1)
+
+    def merge(self, other):
+        self.loans += other.loans
+        width = other.totals.shape[1]
+        if not width:
+            return
+        self.reserve(other.first, other.first + width - 1)
+        offset = other.first - self.first
+        self.totals[:, offset:offset + width] += other.totals
+
+    def rows(self):
+        # (period label, counts and amounts in cents) for every period with a payment
+        for column in np.flatnonzero(self.totals[1]):
+            yield (format_period(self.first + int(column), self.period), *self.totals[:, column].tolist())
+
+    def report(self):
+        return [
+            {"period": label, "loans": loans, "payments": payments,
+             **{field: cents / 100 for field, cents in zip(LEDGER_AMOUNTS, amounts)}}
+            for label, loans, payments, *amounts in self.rows()
+        ]
+
+    def totals_report(self):
+        return {field: cents / 100 for field, cents in zip(LEDGER_AMOUNTS, self.totals[2:].sum(axis=1).tolist())}
+
+    def write_csv(self, file):
+        writer = csv.writer(file)
+        writer.writerow(LEDGER_HEADERS)
+        for label, loans, payments, *amounts in self.rows():
+            writer.writerow([label, loans, payments, *(format_cents(cents) for cents in amounts)])
+
+
+def project_loan_book(rows, submit, period="month", chunk_size=256, max_pending_chunks=4, on_failures=None):
+    # Ledger of every loan in rows ((row number, loan dict) pairs). submit(chunk) starts a chunk and
+    # returns a Future of its (ledger, failures), failures being (row number, loan_id, error) tuples;
+    # on_failures is called with each chunk's failures as they arrive
+    ledger = CashFlowLedger(period)
+    pending = {}
+    rows = iter(rows)
+
+    def drain(futures):
+        for future in futures:
+            chunk = pending.pop(future)
+            try:
+                chunk_ledger, failures = future.result()
+            except Exception as e:
+                # The worker itself failed (e.g. it was killed); report every loan in its chunk
+                chunk_ledger = None
+                failures = [(number, loan.get("loan_id"), str(e) or type(e).__name__) for number, loan in chunk]
+            if chunk_ledger is not None:
+                ledger.merge(chunk_ledger)
+            ledger.failed += len(failures)
+            if failures and on_failures is not None:
+                on_failures(failures)
+
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            pending[submit(chunk)] = chunk
+            # Bound the chunks in flight so rows aren't read faster than they're amortized
+            if len(pending) >= max_pending_chunks:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                drain(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            drain(done)
+    finally:
+        for future in pending:
+            future.cancel()
+    return ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project the combined cash flows of a book of loans")
+    parser.add_argument("book", help="CSV or Parquet file of loans")
+    parser.add_argument("--format", choices=LOAN_BOOK_FORMATS, help="Default: from the file extension")
+    parser.add_argument("--period", choices=LEDGER_PERIODS, default="month")
+    parser.add_argument("--output", help="Ledger CSV (default: standard output)")
+    parser.add_argument("--failures", help="CSV of the loans that failed (default: standard error)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args()
+
+    # Imported here so that reading this module doesn't load the API
+    from app import project_loan_book_chunk
+
+    failures_file = open(args.failures, "w", newline="") if args.failures else sys.stderr
+    failures_writer = csv.writer(failures_file)
+    failures_writer.writerow(FAILURE_HEADERS)
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            ledger = project_loan_book(
+                iter_loan_rows(args.book, args.format or detect_format(args.book)),
+                lambda chunk: executor.submit(project_loan_book_chunk, chunk, args.period),
+                args.period, args.chunk_size, args.workers * 4, failures_writer.writerows)
+    finally:
+        if failures_file is not sys.stderr:
+            failures_file.close()
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            ledger.write_csv(file)
+    else:
+        ledger.write_csv(sys.stdout)
+    print(f"{ledger.loans} loans projected, {ledger.failed} failed, in {elapsed:.1f} s "
+          f"({(ledger.loans + ledger.failed) / elapsed:.0f} loans/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# Request and engine instrumentation: Prometheus-format metrics, per-request phase timings for the
+# Server-Timing header, and a sampling profiler that can be switched on for a single request.
+#
+# Metrics are per process. Work done in another process can capture its observations with
+# captured_metrics() and hand them back to be replayed; /calculate-batch workers keep their own and
+# are not exported.
+
+import contextvars
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SCHEDULE_LENGTH_BUCKETS = (12, 60, 120, 180, 240, 360, 480, 1000, 2500, 5000, 10000, 20000)
+INSURANCE_ITERATION_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+# Per-request profiling is only honoured when enabled for the process, since it costs a sampler thread
+REQUEST_PROFILING_ENABLED = os.environ.get("REQUEST_PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+PROFILE_OUTPUT_DIR = os.environ.get("PROFILE_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "loan-profiles"))
+
+
+# Observations collected by captured_metrics() instead of being recorded
+current_capture = contextvars.ContextVar("current_capture", default=None)
+
+
+def capture(metric, value, labels):
+    observations = current_capture.get()
+    if observations is None:
+        return False
+    observations.append((metric.name, value, labels))
+    return True
+
+
+def format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if capture(self, amount, labels):
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if capture(self, value, labels):
+            return
+        key = tuple(labels[name] for name in self.labelnames)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    labels = format_labels(self.labelnames + ("le",), key + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    # Read when rendered, from a callable returning {label values tuple: value}
+
+    def __init__(self, name, documentation, collect, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def get(self, name):
+        for metric in self.metrics:
+            if metric.name == name:
+                return metric
+        raise KeyError(name)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "loan_request_duration_seconds", "Time until the response body has been sent",
+    LATENCY_BUCKETS, ("endpoint", "status")))
+PHASE_DURATION = REGISTRY.register(Histogram(
+    "loan_phase_duration_seconds", "Time spent per calculation or serialization phase",
+    LATENCY_BUCKETS, ("phase",)))
+SCHEDULE_LENGTH = REGISTRY.register(Histogram(
+    "loan_schedule_payments", "Number of payments in calculated schedules", SCHEDULE_LENGTH_BUCKETS))
+INSURANCE_ITERATIONS = REGISTRY.register(Histogram(
+    "loan_insurance_solver_iterations", "Average-premium evaluations used to solve insured payments",
+    INSURANCE_ITERATION_BUCKETS))
+ERRORS = REGISTRY.register(Counter(
+    "loan_errors_total", "Failed calculations by endpoint and exception type", ("endpoint", "type")))
+
+
+class RequestTimer:
+    # Phase timings of one request, shared with the threadpool thread running its handler
+
+    def __init__(self, server_timing=False, profile=False):
+        self.server_timing = server_timing
+        self.profile = profile
+        self.phases = {}
+        self.profile_id = None
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing_header(self):
+        return ", ".join(f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in self.phases.items())
+
+
+current_timer = contextvars.ContextVar("current_timer", default=None)
+
+
+def record_phase(phase, seconds):
+    PHASE_DURATION.observe(seconds, phase=phase)
+    timer = current_timer.get()
+    if timer is not None:
+        timer.add(phase, seconds)
+
+
+@contextmanager
+def timed_phase(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def record_calculation(calculator):
+    # Engine phases, schedule length and insurance solver effort of a finished calculation
+    for phase, seconds in calculator.phase_timings.items():
+        record_phase(phase, seconds)
+    SCHEDULE_LENGTH.observe(calculator.total_payments)
+    if calculator.credit_insurance:
+        INSURANCE_ITERATIONS.observe(calculator.insurance_solver_iterations)
+
+
+@contextmanager
+def captured_metrics():
+    # Collects the observations made inside the block as a picklable list, e.g. in a worker process
+    observations = []
+    token = current_capture.set(observations)
+    try:
+        yield observations
+    finally:
+        current_capture.reset(token)
+
+
+def replay_metrics(observations):
+    # Records observations collected by captured_metrics(); phases also count towards the current request
+    timer = current_timer.get()
+    for name, value, labels in observations:
+        metric = REGISTRY.get(name)
+        if isinstance(metric, Counter):
+            metric.inc(value, **labels)
+        else:
+            metric.observe(value, **labels)
+            if metric is PHASE_DURATION and timer is not None:
+                timer.add(labels["phase"], value)
+
+
+def record_error(endpoint, error):
+    # HTTPExceptions raised while handling another exception are counted by the original type
+    cause = error.__cause__ or error.__context__
+    if type(error).__name__ == "HTTPException" and cause is not None:
+        error = cause
+    ERRORS.inc(endpoint=endpoint, type=type(error).__name__)
+
+
+class StackSampler:
+    # Samples one thread's Python stack at a fixed interval and counts collapsed stacks
+    # ("module:function;module:function ..."), the input format of flame graph tools
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = StackCounter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self.collapse(frame)] += 1
+
+    def collapse(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def write(self, profile_id):
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_OUTPUT_DIR, f"{profile_id}.folded"), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled_handler():
+    # Profiles the calling (handler) thread if the current request asked for it
+    timer = current_timer.get()
+    if timer is None or not timer.profile or timer.profile_id is not None:
+        yield
+        return
+    timer.profile_id = uuid.uuid4().hex
+    sampler = StackSampler(threading.get_ident()).start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        sampler.write(timer.profile_id)
+
+
+def instrumented(endpoint):
+    # Decorator for sync handlers: counts their errors by type and profiles them when asked to
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiled_handler():
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    record_error(endpoint, e)
+                    raise
+        return wrapper
+    return decorate
+
+
+def route_template(scope):
+    # Endpoint label of a request: the path template of the route it matched (e.g. /schedules/{schedule_id}),
+    # or "other" for unmatched paths, so label values stay bounded. Routers that don't record the
+    # matched route in the scope are matched against again
+    route = scope.get("route")
+    if route is None:
+        app = scope.get("app")
+        for candidate in getattr(app, "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "other"
+
+
+class InstrumentationMiddleware:
+    # ASGI middleware timing each request until its body is sent. It creates the request's
+    # RequestTimer: "X-Server-Timing: 1" adds a Server-Timing header with the phases finished before
+    # the response started (for streamed formats that excludes the streamed work), and "X-Profile: 1"
+    # profiles the handler when REQUEST_PROFILING_ENABLED is set, returning the profile's id in
+    # X-Profile-Id. Its samples are written to PROFILE_OUTPUT_DIR/<id>.folded.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        timer = RequestTimer(
+            server_timing=headers.get(b"x-server-timing", b"").lower() in (b"1", b"true"),
+            profile=REQUEST_PROFILING_ENABLED and headers.get(b"x-profile", b"").lower() in (b"1", b"true"),
+        )
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = []
+                if timer.server_timing:
+                    total = f"total;dur={(time.perf_counter() - started) * 1000:.3f}"
+                    extra.append((b"server-timing", ", ".join(filter(None, [timer.server_timing_header(), total])).encode()))
+                if timer.profile_id is not None:
+                    extra.append((b"x-profile-id", timer.profile_id.encode()))
+                if extra:
+                    message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timer.reset(token)
+            endpoint = route_template(scope)
+            REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, status=str(status))
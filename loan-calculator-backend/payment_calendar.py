@@ -0,0 +1,102 @@
+# Payment due dates and day counts for a (frequency, first due date), generated in one pass and shared
+# through an LRU cache by every loan on the same schedule.
+
+import os
+from array import array
+from decimal import Decimal
+from functools import lru_cache
+
+from dateutil.relativedelta import relativedelta
+
+CALENDAR_CACHE_SIZE = int(os.environ.get("CALENDAR_CACHE_SIZE", 256))
+# Calendars are generated in whole buckets of periods so loans with similar terms share one
+CALENDAR_PERIOD_BUCKET = 64
+
+PERIODS_PER_YEAR = {
+    'Monthly': Decimal('12'), 'Annually': Decimal('1'), 'Bi-Weekly': Decimal('26'),
+    'Biweekly': Decimal('26'), 'Weekly': Decimal('52'), 'Daily': Decimal('365'),
+    'Quarterly': Decimal('4'), 'Semiannually': Decimal('2'), 'Semimonthly': Decimal('24'),
+    'Semimonthly 15th and EOM': Decimal('24'), 'Semimonthly 1st and 15th': Decimal('24'),
+    # Add more frequencies as needed
+}
+
+PAYMENT_INTERVALS = {
+    'Monthly': relativedelta(months=1),
+    'Annually': relativedelta(years=1),
+    'Bi-Weekly': relativedelta(weeks=2),
+    'Biweekly': relativedelta(weeks=2),
+    'Daily': relativedelta(days=1),
+    'Quarterly': relativedelta(months=3),
+    'Semiannually': relativedelta(months=6),
+    'Semimonthly': relativedelta(days=15),
+    'Semimonthly 15th and EOM': relativedelta(days=15),
+    'Semimonthly 1st and 15th': relativedelta(days=15),
+    'Weekly': relativedelta(weeks=1),
+    # Add more frequencies as needed
+}
+
+# Frequencies that alternate between the 15th and the 1st of the next month
+FIXED_DAY_SEMIMONTHLY = {'Semimonthly 15th and EOM', 'Semimonthly 1st and 15th'}
+
+
+def get_periods_per_year(frequency):
+    if frequency not in PERIODS_PER_YEAR:
+        raise ValueError(f"Unsupported payment frequency: {frequency}")
+    return PERIODS_PER_YEAR[frequency]
+
+
+def next_payment_date(frequency, current_date):
+    if frequency not in PAYMENT_INTERVALS:
+        raise ValueError(f"Unsupported payment frequency: {frequency}")
+
+    # Special handling for "Semimonthly 15th and EOM" and "Semimonthly 1st and 15th"
+    if frequency in FIXED_DAY_SEMIMONTHLY:
+        if current_date.day < 15:
+            return current_date.replace(day=15)
+        return (current_date + relativedelta(months=1)).replace(day=1)
+
+    return current_date + PAYMENT_INTERVALS[frequency]
+
+
+class PaymentCalendar:
+    # dates[i] is the due date of payment i + 1 and days[i] the actual number of days until the next
+    # due date, for len(days) periods. If a date past the end can't be represented (e.g. beyond year
+    # 9999) generation stops there and error holds the message.
+
+    def __init__(self, frequency, first_due_date, dates, days, error):
+        self.frequency = frequency
+        self.first_due_date = first_due_date
+        self.dates = dates
+        self.days = days
+        self.error = error
+
+    def __len__(self):
+        return len(self.days)
+
+
+@lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def build_payment_calendar(frequency, first_due_date, periods):
+    if frequency not in PAYMENT_INTERVALS:
+        raise ValueError(f"Unsupported payment frequency: {frequency}")
+
+    dates = [first_due_date]
+    days = array('l')
+    error = None
+    current_date = first_due_date
+    for _ in range(periods):
+        try:
+            next_date = next_payment_date(frequency, current_date)
+        except (ValueError, OverflowError) as e:
+            error = str(e)
+            break
+        days.append((next_date - current_date).days)
+        dates.append(next_date)
+        current_date = next_date
+
+    return PaymentCalendar(frequency, first_due_date, tuple(dates), days, error)
+
+
+def get_payment_calendar(frequency, first_due_date, periods):
+    # Cached calendar covering at least the given number of periods
+    buckets = max(1, -(-periods // CALENDAR_PERIOD_BUCKET))
+    return build_payment_calendar(frequency, first_due_date, buckets * CALENDAR_PERIOD_BUCKET)
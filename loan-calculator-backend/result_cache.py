@@ -0,0 +1,135 @@
+# Bounded in-process cache of computed responses, keyed by a canonical hash of the request.
+#
+# Entries are evicted least-recently-used first once the entry count or the byte budget is exceeded,
+# and expire after a TTL. Concurrent requests for a key that is already being computed wait for that
+# computation instead of starting their own.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def canonical_request_hash(payload):
+    # payload is a plain dict (e.g. LoanRequest.dict()); keys are sorted and dates rendered as ISO strings
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    def __init__(self, max_entries=1024, ttl_seconds=300, max_bytes=64 * 1024 * 1024, size_of=len):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry.value
+
+    def peek(self, key):
+        # Like get(), for callers that use an entry without serving it; not counted as a hit
+        with self.lock:
+            entry = self._lookup(key)
+            return None if entry is None else entry.value
+
+    def get_or_compute(self, key, compute):
+        # Returns compute()'s value, computing it at most once per key at a time. Failures are not cached;
+        # callers waiting on a failed computation get the same exception
+        with self.lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.value
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def _lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        size = self.size_of(value)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = CacheEntry(value, size, time.monotonic() + self.ttl_seconds)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
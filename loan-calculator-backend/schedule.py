@@ -0,0 +1,144 @@
+# Columnar amortization schedule: one typed array per field, with amounts in cents and payment dates
+# as ordinals. Rows are only materialized as dicts when asked for, and JSON is written straight from
+# the columns.
+
+from array import array
+from datetime import date
+
+# Fields of a schedule row, in row order
+ROW_FIELDS = ("payment_number", "payment_date", "start_balance", "payment_amount", "additional_principal",
+              "interest_paid", "principal_paid", "insurance_paid", "ending_balance", "interest_rate")
+MONEY_FIELDS = ("start_balance", "payment_amount", "additional_principal", "interest_paid", "principal_paid",
+                "insurance_paid", "ending_balance")
+
+# Column order of the schedule in the API response, CSV and Excel exports
+SCHEDULE_FIELDS = ("payment_number", "payment_date", "payment_amount", "principal_paid", "interest_paid",
+                   "additional_principal", "insurance_paid", "ending_balance", "interest_rate")
+SCHEDULE_HEADERS = ("Payment Number", "Payment Date", "Payment Amount", "Principal Paid", "Interest Paid",
+                    "Additional Principal", "Insurance Paid", "Ending Balance", "Interest Rate")
+
+
+def decimal_to_cents(amount):
+    # Same rounding as the float(round(amount, 2)) the schedule used to report
+    return int(round(amount, 2).scaleb(2))
+
+
+def format_date(ordinal):
+    day = date.fromordinal(ordinal)
+    # isoformat() is much cheaper than strftime() and matches '%Y-%m-%d' for four-digit years
+    return day.isoformat() if day.year >= 1000 else day.strftime('%Y-%m-%d')
+
+
+def cents_to_float(cents):
+    # cents / 100 is correctly rounded, so it equals float() of the two-decimal amount
+    return cents / 100
+
+
+class Schedule:
+
+    def __init__(self):
+        self.payment_number = array('l')
+        self.payment_date = array('l')
+        for field in MONEY_FIELDS:
+            setattr(self, field, array('q'))
+        self.interest_rate = array('d')
+
+    def append(self, payment_number, payment_date, start_balance, payment_amount, additional_principal,
+               interest_paid, principal_paid, insurance_paid, ending_balance, interest_rate):
+        # Decimal amounts, rounded to cents; interest_rate is the annual rate in percent
+        self.append_cents(payment_number, payment_date, decimal_to_cents(start_balance), decimal_to_cents(payment_amount),
+                          decimal_to_cents(additional_principal), decimal_to_cents(interest_paid),
+                          decimal_to_cents(principal_paid), decimal_to_cents(insurance_paid),
+                          decimal_to_cents(ending_balance), interest_rate)
+
+    def append_cents(self, payment_number, payment_date, start_balance, payment_amount, additional_principal,
+                     interest_paid, principal_paid, insurance_paid, ending_balance, interest_rate):
+        self.payment_number.append(payment_number)
+        self.payment_date.append(payment_date.toordinal())
+        self.start_balance.append(start_balance)
+        self.payment_amount.append(payment_amount)
+        self.additional_principal.append(additional_principal)
+        self.interest_paid.append(interest_paid)
+        self.principal_paid.append(principal_paid)
+        self.insurance_paid.append(insurance_paid)
+        self.ending_balance.append(ending_balance)
+        self.interest_rate.append(interest_rate)
+
+    def clear(self):
+        for field in ROW_FIELDS:
+            del getattr(self, field)[:]
+
+    def extend(self, other):
+        for field in ROW_FIELDS:
+            getattr(self, field).extend(getattr(other, field))
+
+    def head(self, count):
+        # A new Schedule with the first count rows
+        head = Schedule()
+        for field in ROW_FIELDS:
+            setattr(head, field, getattr(self, field)[:count])
+        return head
+
+    def __len__(self):
+        return len(self.payment_number)
+
+    def __getitem__(self, index):
+        # Row view in the dict layout the schedule has always been reported in
+        row = {}
+        for field in ROW_FIELDS:
+            row[field] = self.value(field, getattr(self, field)[index])
+        return row
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Schedule):
+            return all(getattr(self, field) == getattr(other, field) for field in ROW_FIELDS)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Schedule({list(self)!r})"
+
+    def value(self, field, raw):
+        if field == "payment_date":
+            return format_date(raw)
+        if field in MONEY_FIELDS:
+            return cents_to_float(raw)
+        return raw
+
+    def column(self, field):
+        # Column values as reported (floats for amounts, 'YYYY-MM-DD' strings for dates)
+        raw = getattr(self, field)
+        if field == "payment_date":
+            return [format_date(ordinal) for ordinal in raw]
+        if field in MONEY_FIELDS:
+            return [cents / 100 for cents in raw]
+        return list(raw)
+
+    def rows(self, fields=SCHEDULE_FIELDS):
+        # Rows as value tuples in the given field order, e.g. for CSV or Excel writers
+        return zip(*[self.column(field) for field in fields])
+
+    def iter_json(self, fields=SCHEDULE_FIELDS):
+        # One compact JSON object per row; amounts are formatted exactly as json.dumps formats the floats
+        template = "{" + ",".join(f'"{field}":%s' for field in fields) + "}"
+        columns = []
+        for field in fields:
+            raw = getattr(self, field)
+            if field == "payment_date":
+                columns.append([f'"{format_date(ordinal)}"' for ordinal in raw])
+            elif field in MONEY_FIELDS:
+                columns.append([float.__repr__(cents / 100) for cents in raw])
+            elif field == "interest_rate":
+                columns.append([float.__repr__(rate) for rate in raw])
+            else:
+                columns.append(raw)
+        for values in zip(*columns):
+            yield template % values
+
+    def to_json(self, fields=SCHEDULE_FIELDS):
+        return "[" + ",".join(self.iter_json(fields)) + "]"
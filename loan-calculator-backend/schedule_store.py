@@ -0,0 +1,156 @@
+# Persistent store of computed schedules in SQLite, addressed by schedule ID (the request's canonical
+# hash), so summaries, row ranges and exports can be served later without recomputing the schedule.
+#
+# A schedule is stored as its columns back to back, each the raw bytes of the Schedule's typed array
+# (8 bytes per value), so a row range is read with one substr() per column rather than by loading and
+# decoding the whole schedule. The summary is stored as the JSON the API returned. Once the stored
+# bytes exceed max_bytes, the least recently read or written schedules are deleted; the stored bytes
+# are summed once when the database is opened and kept as a running total from then on. The database
+# is opened on first use, so importing the module (e.g. in a process pool worker) doesn't touch the file.
+
+import sqlite3
+import threading
+import time
+from array import array
+
+from schedule import ROW_FIELDS, Schedule
+
+# Bumped when the column layout changes; rows stored in another layout are treated as missing
+STORE_FORMAT = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id TEXT PRIMARY KEY,
+    format INTEGER NOT NULL,
+    payments INTEGER NOT NULL,
+    summary BLOB NOT NULL,
+    columns BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS schedules_accessed ON schedules (accessed);
+"""
+
+
+def column_layout():
+    # (field, typecode, itemsize) per stored column, in storage order
+    empty = Schedule()
+    return [(field, getattr(empty, field).typecode, getattr(empty, field).itemsize) for field in ROW_FIELDS]
+
+
+COLUMN_LAYOUT = column_layout()
+
+
+def encode_columns(schedule):
+    return b"".join(getattr(schedule, field).tobytes() for field in ROW_FIELDS)
+
+
+class ScheduleStore:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = None
+        self.stored_bytes = 0
+        # One connection shared by the request threads, used under the lock
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def connect(self):
+        if self.connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            (self.stored_bytes,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM schedules").fetchone()
+            self.connection = connection
+        return self.connection
+
+    def save(self, schedule_id, summary, schedule):
+        # summary is the response summary as JSON bytes
+        columns = encode_columns(schedule)
+        size = len(summary) + len(columns)
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN")
+            try:
+                replaced = connection.execute("SELECT size FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+                connection.execute(
+                    "INSERT OR REPLACE INTO schedules (id, format, payments, summary, columns, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (schedule_id, STORE_FORMAT, len(schedule), summary, columns, size, now, now))
+                stored_bytes = self.stored_bytes + size - (replaced[0] if replaced else 0)
+                stored_bytes, evicted = self._evict(connection, stored_bytes)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self.stored_bytes = stored_bytes
+            self.evictions += evicted
+
+    def _evict(self, connection, stored_bytes):
+        # Deletes least recently used schedules until stored_bytes fits; returns the new total and
+        # the number deleted
+        if stored_bytes <= self.max_bytes:
+            return stored_bytes, 0
+        evicted = []
+        for schedule_id, size in connection.execute("SELECT id, size FROM schedules ORDER BY accessed"):
+            if stored_bytes <= self.max_bytes:
+                break
+            evicted.append((schedule_id,))
+            stored_bytes -= size
+        connection.executemany("DELETE FROM schedules WHERE id = ?", evicted)
+        return stored_bytes, len(evicted)
+
+    def _touch(self, connection, schedule_id):
+        connection.execute("UPDATE schedules SET accessed = ? WHERE id = ?", (time.time(), schedule_id))
+
+    def summary(self, schedule_id):
+        # (payments, summary JSON bytes), or None if the schedule isn't stored
+        with self.lock:
+            connection = self.connect()
+            found = connection.execute("SELECT payments, summary FROM schedules WHERE id = ? AND format = ?",
+                                       (schedule_id, STORE_FORMAT)).fetchone()
+            if found is None:
+                return None
+            self._touch(connection, schedule_id)
+            return found[0], found[1]
+
+    def rows(self, schedule_id, start=0, count=None):
+        # (payments, Schedule of rows start to start + count, 0-based), or None if the schedule isn't stored
+        with self.lock:
+            connection = self.connect()
+            found = connection.execute("SELECT payments FROM schedules WHERE id = ? AND format = ?",
+                                       (schedule_id, STORE_FORMAT)).fetchone()
+            if found is None:
+                return None
+            payments = found[0]
+            start = min(max(start, 0), payments)
+            stop = payments if count is None else min(start + max(count, 0), payments)
+            # substr() positions are 1-based
+            slices, parameters, offset = [], [], 1
+            for _, _, itemsize in COLUMN_LAYOUT:
+                slices.append("substr(columns, ?, ?)")
+                parameters.extend([offset + start * itemsize, (stop - start) * itemsize])
+                offset += payments * itemsize
+            values = connection.execute(f"SELECT {', '.join(slices)} FROM schedules WHERE id = ?",
+                                        parameters + [schedule_id]).fetchone()
+            self._touch(connection, schedule_id)
+        schedule = Schedule()
+        for (field, typecode, _), data in zip(COLUMN_LAYOUT, values):
+            column = array(typecode)
+            column.frombytes(data)
+            setattr(schedule, field, column)
+        return payments, schedule
+
+    def stats(self):
+        with self.lock:
+            (entries,) = self.connect().execute("SELECT COUNT(*) FROM schedules").fetchone()
+            stored = self.stored_bytes
+        return {"entries": entries, "bytes": stored, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
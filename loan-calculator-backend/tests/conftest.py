@@ -0,0 +1,86 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+# The benchmark scripts' helpers are tested too
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# app reads its settings when it's imported: calculate in the request thread, and keep schedules in a
+# throwaway store
+STORE_DIR = tempfile.mkdtemp(prefix="schedule-store-")
+os.environ["SCHEDULE_STORE_PATH"] = os.path.join(STORE_DIR, "schedules.sqlite3")
+os.environ["LIGHT_LANE_WORKERS"] = "0"
+os.environ["HEAVY_LANE_WORKERS"] = "0"
+os.environ["BATCH_MAX_WORKERS"] = "1"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(STORE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from starlette.testclient import TestClient
+
+    import app
+
+    with TestClient(app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def worker_lane(monkeypatch):
+    # A lane with one worker process and no queue in place of both lanes, so jobs run in a worker
+    # under their deadline as they do in production
+    import app
+    from execution import ExecutionLane
+
+    lane = ExecutionLane("light", 1, 0)
+    monkeypatch.setattr(app, "light_lane", lane)
+    monkeypatch.setattr(app, "heavy_lane", lane)
+    yield lane
+    lane.shutdown()
+
+
+@pytest.fixture
+def post_when_admitted(client):
+    # A lane frees a job's slot just after the caller has the job's result, so the next request can
+    # briefly find the lane still full
+    def post(path, json, seconds=2):
+        give_up = time.time() + seconds
+        while True:
+            response = client.post(path, json=json)
+            if response.status_code != 503 or time.time() > give_up:
+                return response
+            time.sleep(0.05)
+
+    return post
+
+
+@pytest.fixture
+def loan():
+    # A 30-year fixed-rate mortgage as the API takes it
+    return {
+        "loan_amount": 100000,
+        "annual_interest_rate": 6,
+        "payment_frequency": "Monthly",
+        "first_due_date": "2025-01-01",
+        "days_method": "30 Day Month",
+        "year_basis": 360,
+        "loan_term": 360,
+    }
+
+
+@pytest.fixture
+def arm_loan(loan):
+    # 354 payments: a term that is a whole number of adjustment periods runs into a payment
+    # recalculation over zero remaining payments in the engine
+    return {**loan, "annual_interest_rate": None, "initial_interest_rate": 5, "margin": 2.5,
+            "initial_index_rate": 3, "fixed_rate_period": 60, "adjustment_frequency": 12, "loan_term": 354,
+            "rate_adjustments": [{"effective_date": "2030-06-01", "index_rate": 4.5}]}
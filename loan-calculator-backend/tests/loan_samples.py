@@ -0,0 +1,43 @@
+import random
+from datetime import date, timedelta
+
+from app import LoanRequest
+
+FREQUENCIES = ["Monthly", "Bi-Weekly", "Weekly", "Semimonthly", "Semimonthly 15th and EOM", "Semimonthly 1st and 15th",
+               "Quarterly", "Semiannually", "Annually", "Daily"]
+TERMS = {"Daily": (30, 400), "Weekly": (26, 260), "Bi-Weekly": (26, 260), "Annually": (1, 30),
+         "Semiannually": (2, 60), "Quarterly": (4, 120)}
+
+
+def random_loans(seed, count, adjustable=False):
+    # Loans across every frequency and day count, some insured or with extra principal; with
+    # adjustable, about half are ARMs
+    rng = random.Random(seed)
+    loans = []
+    for _ in range(count):
+        frequency = rng.choice(FREQUENCIES)
+        days_method = "Actual" if frequency == "Daily" else rng.choice(["Actual", "30 Day Month"])
+        loan_term = rng.randint(*TERMS.get(frequency, (6, 360)))
+        loan = {
+            "loan_amount": round(rng.uniform(100, 750000), rng.choice([0, 2])),
+            "annual_interest_rate": round(rng.uniform(0.25, 24), rng.choice([1, 2, 3])),
+            "payment_frequency": frequency,
+            "first_due_date": date(2020, 1, 1) + timedelta(days=rng.randint(0, 3000)),
+            "days_method": days_method,
+            "year_basis": 360 if days_method == "30 Day Month" or rng.random() < 0.3 else 365,
+            "loan_term": loan_term,
+            "amort_term": loan_term if rng.random() < 0.8 else loan_term + rng.randint(1, 60),
+            "additional_principal": rng.choice([0.0, 0.0, 10.0, 55.55]),
+            "credit_insurance": rng.random() < 0.3,
+        }
+        if rng.random() < 0.1:
+            # Custom payments, some of them too small to cover interest
+            loan["payment_amount"] = round(loan["loan_amount"] / loan_term * rng.uniform(0.5, 2.0), 2)
+        if adjustable and rng.random() < 0.5:
+            loan.update(annual_interest_rate=None, initial_interest_rate=round(rng.uniform(2, 9), 3), margin=2.5,
+                        initial_index_rate=round(rng.uniform(1, 5), 2), fixed_rate_period=rng.randint(1, 24),
+                        adjustment_frequency=rng.choice([1, 6, 12]), max_rate_change=rng.choice([None, 1, 2]),
+                        rate_adjustments=[{"effective_date": loan["first_due_date"] + timedelta(days=180 * step),
+                                           "index_rate": round(rng.uniform(1, 8), 2)} for step in range(1, 4)])
+        loans.append(LoanRequest(**loan))
+    return loans
@@ -0,0 +1,33 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def simulation(arm_loan):
+    return {"loan": arm_loan, "paths": 50, "seed": 7}
+
+
+def test_simulate_arm(client, simulation):
+    body = client.post("/simulate-arm", json=simulation).json()
+    assert (body["seed"], body["paths"], body["completed_paths"]) == (7, 50, 50)
+    interest = body["total_interest"]
+    assert interest["min"] <= interest["p5"] <= interest["p50"] <= interest["p95"] <= interest["max"]
+    # The same seed gives the same paths
+    assert client.post("/simulate-arm", json=simulation).json() == body
+    assert client.post("/simulate-arm", json={**simulation, "model": "mean_reverting"}).json() != body
+
+
+def test_simulate_arm_reports_a_random_seed(client, simulation):
+    del simulation["seed"]
+    assert isinstance(client.post("/simulate-arm", json=simulation).json()["seed"], int)
+
+
+def test_simulate_arm_errors(client, loan, simulation, monkeypatch):
+    response = client.post("/simulate-arm", json={**simulation, "loan": loan})
+    assert response.json() == {"detail": "Simulation requires an adjustable-rate loan (initial_interest_rate)"}
+    response = client.post("/simulate-arm", json={**simulation, "model": "jump"})
+    assert response.json() == {"detail": "Unsupported simulation model: jump"}
+    monkeypatch.setattr(app, "SIMULATION_MAX_PATHS", 10)
+    response = client.post("/simulate-arm", json=simulation)
+    assert (response.status_code, response.json()) == (400, {"detail": "At most 10 paths can be simulated"})
@@ -0,0 +1,49 @@
+import io
+from datetime import date
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+
+def test_export_schedules(client, loan):
+    loans = [{**loan, "loan_id": "first"}, {**loan, "loan_term": 12}]
+    response = client.post("/export-schedules", json=loans)
+    assert response.status_code == 200
+    table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+    # Each schedule ends with the payment of the last cents of rounding
+    assert table.num_rows == 361 + 13
+    assert set(table.column("loan_id").to_pylist()) == {"first", "2"}
+    assert table.column("payment_date")[0].as_py() == date(2025, 1, 1)
+
+    response = client.post("/export-schedules", params={"format": "arrow"}, json=loan)
+    assert response.status_code == 200
+    assert pyarrow.ipc.open_file(io.BytesIO(response.content)).read_all().num_rows == 361
+
+
+def test_exported_amounts_match_the_json_schedule(client, loan):
+    rows = client.post("/calculate-loan-amortization", json=loan).json()["amortization_schedule"]
+    table = pyarrow.parquet.read_table(io.BytesIO(client.post("/export-schedules", json=loan).content))
+    for field in ("payment_number", "payment_amount", "interest_paid", "ending_balance"):
+        assert [float(value) for value in table.column(field).to_pylist()] == [row[field] for row in rows]
+
+
+@pytest.mark.parametrize("response_format", ["arrow", "parquet"])
+def test_columnar_response_format(client, loan, response_format):
+    response = client.post("/calculate-loan-amortization", json={**loan, "response_format": response_format})
+    assert response.status_code == 200
+    if response_format == "arrow":
+        table = pyarrow.ipc.open_file(io.BytesIO(response.content)).read_all()
+    else:
+        table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 361
+
+
+def test_export_schedules_errors(client, loan):
+    response = client.post("/export-schedules", params={"format": "xml"}, json=loan)
+    assert response.status_code == 400
+    response = client.post("/export-schedules", json=[loan, {**loan, "loan_id": "bad", "payment_frequency": "Hourly"}])
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Loan bad:")
@@ -0,0 +1,41 @@
+import json
+
+import app
+from app import calculate_batch_chunk
+
+
+def batch_lines(response):
+    return {line["index"]: line for line in map(json.loads, response.text.splitlines())}
+
+
+def test_calculate_batch(client, loan):
+    response = client.post("/calculate-batch", json=[loan, {**loan, "loan_amount": "n/a"},
+                                                     {**loan, "payment_frequency": "Hourly"}])
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    lines = batch_lines(response)
+    assert sorted(lines) == [0, 1, 2]
+    single = client.post("/calculate-loan-amortization", json=loan).json()
+    assert lines[0]["result"]["total_interest"] == single["total_interest"]
+    assert lines[0]["result"]["amortization_schedule"] == single["amortization_schedule"]
+    assert lines[1]["error"][0]["loc"] == ["loan_amount"]
+    assert isinstance(lines[2]["error"], str)
+
+
+def test_batch_is_split_into_chunks(client, loan, monkeypatch):
+    monkeypatch.setattr(app, "BATCH_CHUNK_SIZE", 2)
+    monkeypatch.setattr(app, "BATCH_MAX_PENDING_CHUNKS", 1)
+    loans = [{**loan, "loan_term": 12 * number} for number in range(1, 6)]
+    lines = batch_lines(client.post("/calculate-batch", json=loans))
+    assert sorted(lines) == [0, 1, 2, 3, 4]
+    assert [lines[index]["result"]["actual_loan_term"] for index in range(5)] == [13, 25, 37, 49, 61]
+
+
+def test_empty_batch(client):
+    response = client.post("/calculate-batch", json=[])
+    assert response.status_code == 200 and response.text == ""
+
+
+def test_chunk_lines_carry_the_loan_index(loan):
+    lines = calculate_batch_chunk([(7, loan), (8, {**loan, "loan_term": 0})])
+    assert [json.loads(line)["index"] for line in lines] == [7, 8]
+    assert json.loads(lines[1])["error"][0]["loc"] == ["loan_term"]
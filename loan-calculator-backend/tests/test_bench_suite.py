@@ -0,0 +1,34 @@
+import pytest
+
+from bench_suite import build_cases, compare, prepare
+
+RESULT = {"best_seconds": 0.1, "allocation_peak_bytes": 1000, "peak_rss_bytes": 10 ** 8}
+
+
+def test_case_names_are_unique():
+    names = [case["name"] for case in build_cases()]
+    assert len(names) == len(set(names))
+
+
+@pytest.mark.parametrize("case", build_cases(), ids=lambda case: case["name"])
+def test_every_case_prepares(case):
+    run = prepare(case)
+    # Engine cases may fail (the failure is timed too); round trips raise unless they succeed
+    if case["kind"] != "engine":
+        run()
+
+
+def test_compare_reports_regressions_past_the_threshold():
+    results = {"a": {**RESULT, "best_seconds": 0.2, "peak_rss_bytes": 10 ** 8 + 1}, "new": RESULT}
+    assert compare(results, {"a": RESULT}, 0.25) == ["a: best_seconds 0.1 -> 0.2 (+100%)"]
+    assert compare(results, {"a": RESULT}, 1.5) == []
+
+
+def test_compare_ignores_small_wall_time_changes():
+    baseline = {"a": {**RESULT, "best_seconds": 0.001}}
+    assert compare({"a": {**RESULT, "best_seconds": 0.0025}}, baseline, 0.25) == []
+    assert compare({"a": {**RESULT, "best_seconds": 0.004}}, baseline, 0.25) == ["a: best_seconds 0.001 -> 0.004 (+300%)"]
+
+
+def test_compare_skips_empty_baselines():
+    assert compare({"a": RESULT}, {"a": {**RESULT, "allocation_peak_bytes": 0}}, 0.25) == []
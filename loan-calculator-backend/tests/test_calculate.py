@@ -0,0 +1,33 @@
+import pytest
+
+
+def calculate(client, loan):
+    return client.post("/calculate-loan-amortization", json=loan)
+
+
+def test_calculate_is_an_alias(client, loan):
+    assert client.post("/calculate", json=loan).json() == calculate(client, loan).json()
+
+
+def test_invalid_loan(client, loan):
+    assert calculate(client, {**loan, "loan_term": 0}).status_code == 422
+    response = calculate(client, {**loan, "payment_frequency": "Hourly"})
+    assert response.status_code == 400
+
+
+def test_summary_only_leaves_the_schedule_out(client, loan):
+    loan = {**loan, "additional_principal": 50, "credit_insurance": True}
+    full = calculate(client, loan).json()
+    summary = calculate(client, {**loan, "summary_only": True}).json()
+    assert summary["amortization_schedule"] is None
+    del full["amortization_schedule"], summary["amortization_schedule"]
+    assert summary == full
+
+
+def test_summary_only_totals_add_up(client, loan):
+    full = calculate(client, loan).json()
+    summary = calculate(client, {**loan, "summary_only": True}).json()
+    schedule = full["amortization_schedule"]
+    assert summary["actual_loan_term"] == len(schedule)
+    # Totals are summed before rounding, the rows are rounded one by one
+    assert summary["total_interest"] == pytest.approx(sum(row["interest_paid"] for row in schedule), abs=1)
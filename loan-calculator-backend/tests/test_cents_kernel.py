@@ -0,0 +1,33 @@
+import pytest
+
+from app import LoanRequest, create_calculator
+from cents_kernel import supports_cents_kernel
+from loan_samples import random_loans
+
+
+def outcome(request, kernel, scenarios=None):
+    calculator = create_calculator(request)
+    try:
+        result = calculator.get_amortization_schedule(scenarios=scenarios, kernel=kernel)
+    except Exception as e:
+        return {"error": str(e)}
+    result["scenarios"] = {amount: scenario.get_totals() for amount, scenario in calculator.scenarios.items()}
+    return result
+
+
+@pytest.mark.parametrize("request_", random_loans(1, 40, adjustable=True))
+def test_cents_kernel_matches_the_decimal_engine(request_):
+    scenarios = [0.0, 25.0] if request_.additional_principal else None
+    assert outcome(request_, "cents", scenarios) == outcome(request_, "decimal", scenarios)
+
+
+def test_cents_kernel_takes_only_whole_cents(loan):
+    assert supports_cents_kernel(create_calculator(LoanRequest(**loan)))
+    assert not supports_cents_kernel(create_calculator(LoanRequest(**{**loan, "loan_amount": 100000.005})))
+    assert not supports_cents_kernel(create_calculator(LoanRequest(**loan)), scenarios=[0.001])
+    assert not supports_cents_kernel(create_calculator(LoanRequest(**{**loan, "year_basis": 365})))
+
+
+def test_unsupported_kernel(loan):
+    with pytest.raises(ValueError, match="Unsupported scalar kernel"):
+        create_calculator(LoanRequest(**loan)).get_amortization_schedule(kernel="float")
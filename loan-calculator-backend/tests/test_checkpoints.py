@@ -0,0 +1,28 @@
+import app
+
+
+def calculate(client, loan):
+    return client.post("/calculate-loan-amortization", json=loan)
+
+
+def test_period_overrides(client, loan):
+    base = calculate(client, {**loan, "summary_only": True}).json()
+    body = calculate(client, {**loan, "summary_only": True,
+                              "period_overrides": [{"payment_number": 12, "lump_sum": 5000}]}).json()
+    assert body["total_additional_principal"] == 5000
+    assert body["actual_loan_term"] < base["actual_loan_term"]
+    schedule = calculate(client, {**loan, "period_overrides": [{"payment_number": 61, "interest_rate": 4}]}).json()[
+        "amortization_schedule"]
+    assert {row["interest_rate"] for row in schedule[:60]} == {6.0}
+    assert {row["interest_rate"] for row in schedule[60:]} == {4.0}
+
+
+def test_resumed_calculation_matches_a_full_one(client, loan):
+    loan = {**loan, "loan_amount": 250000}
+    overridden = {**loan, "period_overrides": [{"payment_number": 200, "payment_amount": 2500}]}
+    app.result_cache.clear()
+    calculate(client, loan)
+    # Resumed from a checkpoint of the cached loan without overrides
+    resumed = calculate(client, overridden).json()
+    app.result_cache.clear()
+    assert calculate(client, overridden).json() == resumed
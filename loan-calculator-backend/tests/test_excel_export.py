@@ -0,0 +1,56 @@
+import io
+import re
+import zipfile
+
+import pytest
+
+import app
+
+
+def workbook(response):
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == app.EXCEL_MEDIA_TYPE
+    return zipfile.ZipFile(io.BytesIO(response.content))
+
+
+def sheet_names(book):
+    return re.findall(r'<sheet name="([^"]+)"', book.read("xl/workbook.xml").decode())
+
+
+def sheet_rows(book, number=1):
+    return len(re.findall(r"<row ", book.read(f"xl/worksheets/sheet{number}.xml").decode()))
+
+
+def test_export_uploaded_schedule(client, loan):
+    body = client.post("/calculate-loan-amortization", json=loan).json()
+    book = workbook(client.post("/export-excel", json=body))
+    # Headers, 361 payments, then a summary heading and one row per summary field after a blank row
+    assert sheet_rows(book) == 1 + 361 + 1 + len(app.SUMMARY_LABELS)
+    assert "Payment Number" in book.read("xl/worksheets/sheet1.xml").decode()
+
+
+def test_export_loans(client, loan, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_CHUNK_ROWS", 50)
+    book = workbook(client.post("/export-loan-excel", json=loan))
+    assert sheet_names(book) == ["Loan 1"]
+    assert sheet_rows(book) == 1 + 361 + 1 + len(app.SUMMARY_LABELS)
+    book = workbook(client.post("/export-loan-excel", json=[loan, {**loan, "loan_term": 12}]))
+    assert sheet_names(book) == ["Loan 1", "Loan 2"]
+    assert sheet_rows(book, 2) == 1 + 13 + 1 + len(app.SUMMARY_LABELS)
+
+
+def test_export_computes_the_same_workbook_as_an_upload(client, loan):
+    body = client.post("/calculate-loan-amortization", json=loan).json()
+    uploaded = workbook(client.post("/export-excel", json=body)).read("xl/worksheets/sheet1.xml")
+    computed = workbook(client.post("/export-loan-excel", json=loan)).read("xl/worksheets/sheet1.xml")
+    assert computed == uploaded
+
+
+@pytest.mark.parametrize("loans, message", [
+    (lambda loan: {**loan, "payment_frequency": "Hourly"}, "Unsupported payment frequency"),
+    (lambda loan: [loan, {**loan, "payment_frequency": "Hourly"}], "Loan 2: Unsupported payment frequency"),
+])
+def test_export_errors(client, loan, loans, message):
+    response = client.post("/export-loan-excel", json=loans(loan))
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(message)
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+import app
+from execution import DEADLINE_GRACE_SECONDS, DeadlineExceeded, ExecutionLane, Overloaded, run_with_deadline
+
+
+def test_lane_without_workers_runs_in_the_calling_thread():
+    lane = ExecutionLane("light", 0, 0)
+    assert lane.run(time.time() + 5, sum, [1, 2]) == 3
+    stats = lane.stats()
+    assert (stats["admitted"], stats["rejected"]) == (1, 0)
+    assert stats["average_latency_seconds"] is not None
+
+
+def test_full_lane_rejects_jobs():
+    lane = ExecutionLane("light", 0, 0)
+    with pytest.raises(Overloaded, match="The light calculation lane is full") as raised:
+        lane.run(time.time() + 5, lambda: lane.run(time.time() + 5, sum, [1]))
+    assert raised.value.retry_after >= 1
+    assert lane.stats()["rejected"] == 1
+    # The slot is free again
+    assert lane.run(time.time() + 5, sum, [1]) == 1
+
+
+def test_failed_jobs_free_their_slot():
+    lane = ExecutionLane("light", 0, 0)
+    with pytest.raises(ZeroDivisionError):
+        lane.run(time.time() + 5, lambda: 1 / 0)
+    assert lane.run(time.time() + 5, sum, [1]) == 1
+
+
+def test_deadline_already_passed():
+    with pytest.raises(DeadlineExceeded, match="before it started"):
+        run_with_deadline(time.time() - 1, sum, [1])
+
+
+def test_deadline_interrupts_the_job():
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(time.time() + 0.05, time.sleep, 5)
+    assert time.perf_counter() - started < 2
+
+
+def test_lane_with_workers_runs_jobs_in_a_process():
+    lane = ExecutionLane("heavy", 1, 0)
+    try:
+        assert lane.run(time.time() + 30, sum, [1, 2]) == 3
+        with pytest.raises(DeadlineExceeded):
+            lane.run(time.time() + 0.2, time.sleep, 5)
+        assert lane.stats()["timed_out"] == 1
+    finally:
+        lane.shutdown()
+
+
+def test_overloaded_endpoint(client, loan, monkeypatch):
+    lane = ExecutionLane("light", 0, 0)
+    monkeypatch.setattr(app, "light_lane", lane)
+    lane.slots.acquire()
+    response = client.post("/calculate-loan-amortization", json={**loan, "loan_amount": 77777})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_deadline_header_is_capped(monkeypatch):
+    monkeypatch.setattr(app, "REQUEST_DEADLINE_SECONDS", 30)
+    assert app.request_deadline_seconds(None) == 30
+    assert app.request_deadline_seconds(0) == 30
+    assert app.request_deadline_seconds(2.5) == 2.5
+    assert app.request_deadline_seconds(600) == 30
+
+
+def test_heavy_loans_run_in_the_heavy_lane(client, loan):
+    before = client.get("/execution-stats").json()["heavy"]["admitted"]
+    client.post("/calculate-loan-amortization", json={**loan, "loan_term": 4800, "loan_amount": 88888,
+                                                      "summary_only": True})
+    assert client.get("/execution-stats").json()["heavy"]["admitted"] == before + 1
+
+
+def test_calculation_in_a_worker_process(client, loan, worker_lane):
+    loan = {**loan, "loan_amount": 66666}
+    response = client.post("/calculate-loan-amortization", json=loan)
+    assert response.status_code == 200
+    app.result_cache.clear()
+    assert client.post("/calculate-loan-amortization", json={**loan, "summary_only": True}).json()[
+        "total_interest"] == response.json()["total_interest"]
+    assert worker_lane.stats()["admitted"] == 2
+
+
+def test_calculation_deadline_in_a_worker_process(client, loan, worker_lane, post_when_admitted):
+    # Takes several seconds: the insurance solver simulates 100000 daily payments per step
+    slow = {**loan, "payment_frequency": "Daily", "days_method": "Actual", "year_basis": 365, "loan_term": 100000,
+            "credit_insurance": True, "summary_only": True}
+    started = time.perf_counter()
+    response = client.post("/calculate-loan-amortization", json=slow, headers={"X-Request-Timeout": "0.5"})
+    assert response.status_code == 504
+    assert time.perf_counter() - started < 0.5 + DEADLINE_GRACE_SECONDS + 0.5
+    # The worker stopped at the deadline, so the lane takes the next request
+    assert post_when_admitted("/calculate-loan-amortization", {**loan, "loan_amount": 55555}).status_code == 200
+    assert worker_lane.stats()["timed_out"] == 1
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import pytest
+
+import goal_seek
+from goal_seek import BracketedSearch, SolveLimitExceeded, annuity_periods, annuity_principal
+
+
+def test_annuity_principal_inverts_the_payment_formula():
+    principal = annuity_principal(Decimal("599.55"), Decimal("0.005"), 360)
+    assert abs(principal - Decimal("100000")) < 1
+
+
+def test_annuity_periods():
+    assert annuity_periods(Decimal("100000"), Decimal("599.55"), Decimal("0.005")) == pytest.approx(360, abs=0.01)
+
+
+def test_annuity_periods_when_the_payment_does_not_cover_interest():
+    assert annuity_periods(Decimal("100000"), Decimal("500"), Decimal("0.005")) is None
+
+
+@pytest.mark.parametrize("start", [0, 1, 1233, 1234, 1235, 10 ** 9, 10 ** 12])
+def test_satisfied_below(start):
+    search = BracketedSearch(lambda value: value <= 1234, 0, 10 ** 12, True)
+    assert search.run(start) == 1234
+
+
+@pytest.mark.parametrize("start", [0, 776, 777, 778, 10 ** 12])
+def test_satisfied_above(start):
+    search = BracketedSearch(lambda value: value >= 777, 0, 10 ** 12, False)
+    assert search.run(start) == 777
+
+
+def test_start_is_clamped_to_the_bounds():
+    search = BracketedSearch(lambda value: value <= 50, 10, 100, True)
+    assert search.run(-5) == 50
+    assert search.run(10 ** 6) == 50
+
+
+def test_walk_does_not_jump_to_an_unsatisfied_bound():
+    # The upper bound can't be evaluated (it fails like the engine does past its range), so a walk that
+    # overshot onto it would miss the satisfied values before it
+    search = BracketedSearch(lambda value: 600 <= value <= 900, 1, 1000, False)
+    assert search.run(1) == 600
+
+
+def test_every_value_satisfied_returns_the_bound():
+    assert BracketedSearch(lambda value: True, 0, 1000, True).run(3) == 1000
+    assert BracketedSearch(lambda value: True, 0, 1000, False).run(3) == 0
+
+
+def test_no_value_satisfied_returns_none():
+    assert BracketedSearch(lambda value: False, 0, 1000, True).run(500) is None
+
+
+def test_iterations_are_bounded(monkeypatch):
+    monkeypatch.setattr(goal_seek, "SOLVE_MAX_ITERATIONS", 5)
+    search = BracketedSearch(lambda value: value <= 10 ** 6, 0, 10 ** 12, True)
+    with pytest.raises(SolveLimitExceeded):
+        search.run(0)
+    assert search.iterations == 5
@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+import pytest
+
+import app
+from app import LoanRequest, create_calculator
+
+
+@pytest.fixture
+def insured_loan(loan):
+    return {**loan, "credit_insurance": True}
+
+
+@pytest.mark.parametrize("fields, payment_amount, total_insurance", [
+    ({"loan_amount": 294167.03, "annual_interest_rate": 7.37, "first_due_date": "2025-07-23", "days_method": "Actual",
+      "year_basis": 365, "additional_principal": 100.5}, 2074.90, 13563.55),
+    ({"loan_amount": 18724.74, "annual_interest_rate": 15.92, "first_due_date": "2024-01-01", "days_method": "Actual",
+      "year_basis": 365, "loan_term": 240}, 282.46, 5688.42),
+    ({}, 641.67, 15165.39),
+    ({"loan_amount": 25000, "annual_interest_rate": 9.5, "payment_frequency": "Bi-Weekly",
+      "first_due_date": "2025-03-01", "days_method": "Actual", "year_basis": 365, "loan_term": 130}, 263.05, 2743.71),
+    ({"loan_amount": 450000, "annual_interest_rate": 4.25, "loan_term": 480}, 1995.64, 21285.71),
+])
+def test_payments_match_the_fixed_point_loop(client, insured_loan, fields, payment_amount, total_insurance):
+    # Payments the 500-iteration fixed-point loop settled on, which stops at the first step of less
+    # than 5 cents rather than at an exact fixed point
+    body = client.post("/calculate-loan-amortization", json={**insured_loan, **fields, "summary_only": True}).json()
+    assert (body["payment_amount"], body["total_insurance"]) == (payment_amount, total_insurance)
+
+
+def test_loans_the_fixed_point_loop_could_not_solve(insured_loan):
+    # The fixed-point steps cycle; the bracketed search finds the smallest payment covering the
+    # average premium
+    request = LoanRequest(**{**insured_loan, "loan_amount": 48115.1, "annual_interest_rate": 0.6,
+                             "payment_frequency": "Daily", "first_due_date": "2024-04-30", "days_method": "Actual",
+                             "year_basis": 365, "loan_term": 1994, "additional_principal": 25})
+    calculator = create_calculator(request)
+    assert calculator.payment_amount == Decimal("61.84")
+    assert calculator.insurance_solver_iterations <= app.INSURANCE_SOLVER_MAX_ITERATIONS
+
+
+def test_bracketed_search_after_the_fixed_point_steps(insured_loan, monkeypatch):
+    monkeypatch.setattr(app, "INSURANCE_FIXED_POINT_STEPS", 2)
+    # The steps would settle only after 34 evaluations
+    loan = {**insured_loan, "loan_amount": 18724.74, "annual_interest_rate": 15.92, "days_method": "Actual",
+            "year_basis": 365, "loan_term": 240}
+    calculator = create_calculator(LoanRequest(**loan))
+    payment = calculator.payment_amount
+    payment_without_insurance = create_calculator(LoanRequest(**{**loan, "credit_insurance": False})).payment_amount
+
+    def residual(payment):
+        return payment_without_insurance + calculator.calculate_average_insurance_premium(payment) - payment
+
+    assert residual(payment) <= 0 < residual(payment - Decimal("0.01"))
+    assert calculator.insurance_solver_iterations < 34
+
+
+@pytest.mark.parametrize("loan_term", [12, 60, 180, 360, 480])
+def test_solver_iterations_are_bounded(insured_loan, loan_term):
+    calculator = create_calculator(LoanRequest(**{**insured_loan, "loan_term": loan_term}))
+    assert 0 < calculator.insurance_solver_iterations <= app.INSURANCE_SOLVER_MAX_ITERATIONS
+    assert calculator.insurance_simulated_periods <= calculator.insurance_solver_iterations * loan_term
+
+
+def test_calculation_reuses_the_solver_simulations(insured_loan):
+    calculator = create_calculator(LoanRequest(**insured_loan))
+    solved = calculator.insurance_simulated_periods
+    calculator.get_amortization_schedule()
+    # At most the payment the steps settled on is simulated again
+    assert calculator.insurance_simulated_periods <= solved + calculator.amort_term
+    periods = calculator.insurance_simulated_periods
+    calculator.calculate_average_insurance_premium(calculator.payment_amount)
+    assert calculator.insurance_simulated_periods == periods
+
+
+def test_uninsured_loans_skip_the_solver(loan):
+    calculator = create_calculator(LoanRequest(**loan))
+    assert (calculator.insurance_solver_iterations, calculator.insurance_simulated_periods) == (0, 0)
+
+
+def test_solver_metadata_in_the_response(client, insured_loan):
+    body = client.post("/calculate-loan-amortization", json={**insured_loan, "summary_only": True}).json()
+    calculator = create_calculator(LoanRequest(**insured_loan))
+    assert body["metadata"]["insurance_solver_iterations"] == calculator.insurance_solver_iterations
+    assert body["metadata"]["insurance_simulated_periods"] >= calculator.insurance_simulated_periods
+    assert body["payment_amount"] > body["payment_amount_no_insurance"]
@@ -0,0 +1,30 @@
+def summary(client, loan):
+    return client.post("/calculate-loan-amortization", json={**loan, "summary_only": True}).json()
+
+
+def test_interest_savings_match_a_loan_without_additional_principal(client, loan):
+    without = summary(client, loan)
+    assert without["interest_savings"] == 0.0
+    body = summary(client, {**loan, "additional_principal": 100})
+    assert body["interest_savings"] == round(without["total_interest"] - body["total_interest"], 2)
+    assert body["interest_savings"] > 0
+
+
+def test_compare_additional_principal(client, loan):
+    without = summary(client, loan)
+    body = summary(client, {**loan, "additional_principal": 100, "compare_additional_principal": [50, 0, 250]})
+    comparison = body["additional_principal_comparison"]
+    assert len(comparison) == 3
+    for amount, totals in zip([50, 0, 250], comparison):
+        single = summary(client, {**loan, "additional_principal": amount})
+        for field in ("total_interest", "total_additional_principal", "total_payment", "actual_loan_term"):
+            assert totals[field] == single[field]
+        assert totals["interest_savings"] == round(without["total_interest"] - single["total_interest"], 2)
+    assert summary(client, loan)["additional_principal_comparison"] is None
+
+
+def test_insured_interest_savings(client, loan):
+    loan = {**loan, "credit_insurance": True}
+    without = summary(client, loan)
+    body = summary(client, {**loan, "additional_principal": 75})
+    assert body["interest_savings"] == round(without["total_interest"] - body["total_interest"], 2)
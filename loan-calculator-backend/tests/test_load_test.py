@@ -0,0 +1,75 @@
+import asyncio
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import load_test
+from load_test import (MIX, AsgiApp, LevelBudget, RequestSource, generate_request, latency_report, level_report,
+                       parse_env, percentile)
+
+
+def test_percentile_is_the_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 0) == 1
+    assert percentile([5], 95) == 5
+    assert percentile([], 50) is None
+
+
+def test_latency_report():
+    assert latency_report([0.003, 0.001, 0.002]) == {"p50_ms": 2.0, "p95_ms": 3.0, "p99_ms": 3.0, "mean_ms": 2.0,
+                                                    "max_ms": 3.0}
+    assert set(latency_report([]).values()) == {None}
+
+
+def test_level_report():
+    samples = [("short_monthly", 200, 0.01), ("arm", 400, 0.02), ("arm", "ConnectionError", 0.03)]
+    report = level_report(4, samples, 0.5, [])
+    assert (report["requests"], report["throughput_rps"], report["error_rate"]) == (3, 6.0, 0.6667)
+    assert report["statuses"] == {"200": 1, "400": 1, "ConnectionError": 1}
+    assert report["latency_by_kind"]["arm"]["requests"] == 2
+
+
+@pytest.mark.parametrize("kind", [kind for kind, _ in MIX])
+def test_generated_requests_calculate(client, kind):
+    response = client.post(load_test.PATH, json=generate_request(kind, random.Random(3)))
+    assert response.status_code == 200
+
+
+def test_unknown_request_kind():
+    with pytest.raises(ValueError, match="Unknown request kind"):
+        generate_request("balloon", random.Random(1))
+
+
+def test_request_source_repeats_sent_requests():
+    source = RequestSource(seed=1, repeat_fraction=1.0)
+    first = source.next()
+    assert json.loads(first[1]) and all(source.next() == first for _ in range(5))
+
+
+def test_level_budget_counts_requests():
+    budget = LevelBudget(duration=None, requests=2)
+    assert [budget.take() for _ in range(3)] == [True, True, False]
+
+
+def test_parse_env():
+    assert parse_env(["A=1", "B=x=y"]) == {"A": "1", "B": "x=y"}
+    with pytest.raises(SystemExit):
+        parse_env(["A"])
+
+
+def test_asgi_transport(client, loan):
+    # Reuses the app the client already imported. asyncio.run() runs in another thread, as it leaves
+    # the calling thread without the event loop the test client uses
+    asgi = AsgiApp({})
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(asyncio.run, asgi.call(json.dumps(loan).encode())).result() == 200
+            samples = executor.submit(asgi.run_level, 2, RequestSource(seed=2, repeat_fraction=0.5),
+                                      LevelBudget(None, 6)).result()
+        assert len(samples) == 6 and {status for _, status, _ in samples} == {200}
+    finally:
+        asgi.store_dir.cleanup()
@@ -0,0 +1,267 @@
+import csv
+import io
+import json
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from app import LoanRequest, create_calculator, project_loan_book_chunk
+from loan_book import (CashFlowLedger, detect_format, format_cents, format_period, iter_loan_rows,
+                       project_loan_book)
+from loan_samples import random_loans
+from vector_engine import amortize_fixed_rate
+
+BOOK = (
+    "\ufeffloan_id,loan_amount,annual_interest_rate,payment_frequency,first_due_date,days_method,year_basis,"
+    "loan_term,additional_principal,rate_adjustments\n"
+    "A,100000,6,Monthly,2025-01-15,30 Day Month,360,360,,\n"
+    "B,25000,9.5,Bi-Weekly,2025-03-01,Actual,365,130,25,\n"
+    "C,n/a,6,Monthly,2025-01-15,30 Day Month,360,360,,\n"
+    "D,50000,6,Monthly,2025-01-15,30 Day Month,360,60,,\"[{\"\"effective_date\"\": \"\"2026-01-01\"\", "
+    "\"\"index_rate\"\": 3}]\"\n"
+)
+
+
+def decimal_ledger(loans, period="month"):
+    ledger = CashFlowLedger(period)
+    for loan in loans:
+        ledger.add(create_calculator(LoanRequest.parse_obj(loan)).get_amortization_schedule(kernel="decimal")["schedule"])
+    return ledger
+
+
+def completed(value=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+    return future
+
+
+def test_csv_rows():
+    rows = list(iter_loan_rows(io.BytesIO(BOOK.encode())))
+    assert [number for number, _ in rows] == [1, 2, 3, 4]
+    number, loan = rows[0]
+    # Empty cells are left out and the byte order mark is dropped
+    assert loan == {"loan_id": "A", "loan_amount": "100000", "annual_interest_rate": "6", "payment_frequency": "Monthly",
+                    "first_due_date": "2025-01-15", "days_method": "30 Day Month", "year_basis": "360",
+                    "loan_term": "360"}
+    assert rows[3][1]["rate_adjustments"] == [{"effective_date": "2026-01-01", "index_rate": 3}]
+
+
+def test_csv_rows_from_a_path(tmp_path):
+    path = tmp_path / "book.csv"
+    path.write_text(BOOK, encoding="utf-8")
+    assert len(list(iter_loan_rows(str(path)))) == 4
+
+
+def test_invalid_json_is_left_for_validation():
+    book = "loan_amount,rate_adjustments\n1000,[{oops\n"
+    assert list(iter_loan_rows(io.BytesIO(book.encode()))) == [(1, {"loan_amount": "1000", "rate_adjustments": "[{oops"})]
+
+
+def test_parquet_rows(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    path = tmp_path / "book.parquet"
+    pyarrow.parquet.write_table(pa.table({
+        "loan_id": ["A", "B"],
+        "loan_amount": [1000.0, None],
+        "payment_frequency": ["Monthly", " "],
+        "rate_adjustments": ['[{"effective_date": "2026-01-01", "index_rate": 3}]', None],
+    }), path)
+    assert list(iter_loan_rows(str(path), "parquet")) == [
+        (1, {"loan_id": "A", "loan_amount": 1000.0, "payment_frequency": "Monthly",
+             "rate_adjustments": [{"effective_date": "2026-01-01", "index_rate": 3}]}),
+        (2, {"loan_id": "B"}),
+    ]
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError, match="Unsupported loan book format"):
+        iter_loan_rows(io.BytesIO(), "xlsx")
+
+
+def test_detect_format():
+    assert detect_format("book.PARQUET") == "parquet"
+    assert detect_format("book.pq") == "parquet"
+    assert detect_format("book.csv") == "csv"
+
+
+def test_format_period():
+    index = 2025 * 12 + 4
+    assert format_period(index, "month") == "2025-05"
+    assert format_period(index // 3, "quarter") == "2025-Q2"
+    assert format_period(2025, "year") == "2025"
+
+
+def test_format_cents():
+    assert format_cents(123456) == "1234.56"
+    assert format_cents(5) == "0.05"
+    assert format_cents(-5) == "-0.05"
+
+
+def test_unsupported_period():
+    with pytest.raises(ValueError, match="Unsupported ledger period"):
+        CashFlowLedger("week")
+
+
+@pytest.mark.parametrize("period", ["month", "quarter", "year"])
+def test_ledger_periods(loan, period):
+    ledger = decimal_ledger([loan], period)
+    rows = list(ledger.rows())
+    schedule = create_calculator(LoanRequest.parse_obj(loan)).get_amortization_schedule()["schedule"]
+    assert sum(row[2] for row in rows) == len(schedule)
+    assert sum(row[3] for row in rows) == sum(schedule.payment_amount)
+    assert {row[1] for row in rows} == {1}
+    assert rows[0][0] == {"month": "2025-01", "quarter": "2025-Q1", "year": "2025"}[period]
+
+
+def test_merged_ledgers_do_not_depend_on_order(loan):
+    loans = [loan, {**loan, "first_due_date": "2020-06-01", "loan_term": 24}, {**loan, "first_due_date": "2031-01-01"}]
+    whole = decimal_ledger(loans)
+    forward, backward = CashFlowLedger(), CashFlowLedger()
+    for part in loans:
+        forward.merge(decimal_ledger([part]))
+    for part in reversed(loans):
+        backward.merge(decimal_ledger([part]))
+    assert list(forward.rows()) == list(backward.rows()) == list(whole.rows())
+    assert forward.loans == backward.loans == 3
+    # The 2031 loan overlaps the 2025 one; the 2020 loan is paid off before either starts
+    assert max(row[1] for row in whole.rows()) == 2
+
+
+def test_loan_totals_match_schedules(loan):
+    # Two loans summed by period beforehand, as the vector engine does
+    expected = decimal_ledger([loan, loan])
+    ledger = CashFlowLedger()
+    columns = expected.totals.shape[1]
+    loan_totals = np.repeat(expected.totals[1:, np.newaxis, :] // 2, 2, axis=1)
+    ledger.add_loan_totals(expected.first, loan_totals)
+    assert list(ledger.rows()) == list(expected.rows())
+    assert ledger.loans == 2 and ledger.totals.shape[1] == columns
+
+
+def test_ledger_report(loan):
+    ledger = decimal_ledger([loan])
+    report = ledger.report()
+    assert report[0] == {"period": "2025-01", "loans": 1, "payments": 1, "payment_amount": 599.55,
+                         "principal_paid": 99.55, "additional_principal": 0.0, "interest_paid": 500.0,
+                         "insurance_paid": 0.0}
+    # Amounts are summed from the schedule's rows, as rounded to cents
+    schedule = create_calculator(LoanRequest.parse_obj(loan)).get_amortization_schedule()["schedule"]
+    assert ledger.totals_report()["interest_paid"] == sum(schedule.interest_paid) / 100
+    output = io.StringIO()
+    ledger.write_csv(output)
+    lines = list(csv.reader(io.StringIO(output.getvalue())))
+    assert lines[0][:3] == ["Period", "Loans", "Payments"]
+    assert lines[1] == ["2025-01", "1", "1", "599.55", "99.55", "0.00", "500.00", "0.00"]
+    assert len(lines) == 362
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_vector_engine_ledger_matches_the_decimal_engine(seed):
+    requests = random_loans(seed, 60)
+    expected = CashFlowLedger()
+    for request in requests:
+        try:
+            expected.add(create_calculator(request).get_amortization_schedule(kernel="decimal")["schedule"])
+        except Exception:
+            pass
+    ledger = CashFlowLedger()
+    amortize_fixed_rate([create_calculator(request) for request in requests], ledger=ledger)
+    assert list(ledger.rows()) == list(expected.rows())
+    assert ledger.loans == expected.loans
+
+
+def test_vector_engine_ledger_leaves_failed_loans_out(loan):
+    ledger = CashFlowLedger()
+    amortize_fixed_rate([create_calculator(LoanRequest(**{**loan, "payment_amount": 100})),
+                         create_calculator(LoanRequest(**loan))], ledger=ledger)
+    assert ledger.loans == 1 and ledger.totals[1].sum() == 361
+
+
+def test_chunk_failures(loan):
+    chunk = [(1, {**loan, "loan_id": "A"}), (2, {**loan, "loan_amount": "n/a", "loan_id": "B"}),
+             (3, {**loan, "payment_amount": 100, "loan_id": "C"}), (4, {**loan, "payment_frequency": "Hourly"})]
+    ledger, failures = project_loan_book_chunk(chunk, "month")
+    assert [(number, loan_id) for number, loan_id, _ in failures] == [(2, "B"), (4, None), (3, "C")]
+    assert failures[0][2] == "loan_amount: value is not a valid float"
+    assert list(ledger.rows()) == list(decimal_ledger([loan]).rows())
+
+
+def test_chunk_groups_loans_by_frequency_and_term(loan):
+    loans = [loan, {**loan, "payment_frequency": "Daily", "days_method": "Actual", "loan_term": 3650},
+             {**loan, "loan_term": 12}, {**loan, "payment_frequency": "Weekly", "loan_term": 520}]
+    ledger, failures = project_loan_book_chunk(list(enumerate(loans, start=1)), "quarter")
+    assert failures == []
+    assert list(ledger.rows()) == list(decimal_ledger(loans, "quarter").rows())
+
+
+def test_projection(loan):
+    rows = [(number, {**loan, "loan_term": 12 * number}) for number in range(1, 8)]
+    reported = []
+    ledger = project_loan_book(rows, lambda chunk: completed(project_loan_book_chunk(chunk, "month")),
+                               chunk_size=2, max_pending_chunks=2, on_failures=reported.extend)
+    assert list(ledger.rows()) == list(decimal_ledger([loan for _, loan in rows]).rows())
+    assert (ledger.loans, ledger.failed, reported) == (7, 0, [])
+
+
+def test_failed_chunks_report_every_loan(loan):
+    rows = [(1, {**loan, "loan_id": "A"}), (2, loan), (3, {**loan, "loan_id": "C"})]
+    reported = []
+
+    def submit(chunk):
+        if chunk[0][0] == 1:
+            return completed(error=RuntimeError("worker died"))
+        return completed(project_loan_book_chunk(chunk, "month"))
+
+    ledger = project_loan_book(rows, submit, chunk_size=2, on_failures=reported.extend)
+    assert reported == [(1, "A", "worker died"), (2, None, "worker died")]
+    assert (ledger.loans, ledger.failed) == (1, 2)
+
+
+def test_project_loan_book_endpoint(client):
+    response = client.post("/project-loan-book", data=BOOK.encode(), params={"period": "year"})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["period"], body["loans"], body["failed"], body["failures_truncated"]) == ("year", 3, 1, False)
+    assert body["failures"] == [{"row": 3, "loan_id": "C", "error": "loan_amount: value is not a valid float"}]
+    assert body["ledger"][0]["period"] == "2025"
+    rows = [loan for _, loan in iter_loan_rows(io.BytesIO(BOOK.encode())) if loan["loan_id"] != "C"]
+    expected = decimal_ledger(rows, "year")
+    assert body["totals"] == expected.totals_report()
+    assert body["ledger"] == expected.report()
+
+
+def test_project_loan_book_endpoint_parquet(client, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    path = tmp_path / "book.parquet"
+    pyarrow.parquet.write_table(pa.table({"loan_amount": [1000.0], "annual_interest_rate": [5.0],
+                                          "payment_frequency": ["Monthly"], "first_due_date": ["2025-01-01"],
+                                          "days_method": ["Actual"], "year_basis": [365], "loan_term": [12]}), path)
+    body = client.post("/project-loan-book", data=path.read_bytes(), params={"format": "parquet"}).json()
+    assert (body["loans"], body["failed"], len(body["ledger"])) == (1, 0, 12)
+
+
+@pytest.mark.parametrize("params, message", [
+    ({"format": "xlsx"}, "Unsupported format: xlsx"),
+    ({"period": "week"}, "Unsupported period: week"),
+])
+def test_project_loan_book_endpoint_rejects_options(client, params, message):
+    response = client.post("/project-loan-book", data=BOOK.encode(), params=params)
+    assert response.status_code == 400
+    assert response.json() == {"detail": message}
+
+
+def test_project_loan_book_endpoint_rejects_unreadable_books(client):
+    response = client.post("/project-loan-book", data=BOOK.encode(), params={"format": "parquet"})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Could not read the loan book")
+    response = client.post("/project-loan-book", data=b"loan_amount\n\xff\xfe\n")
+    assert response.status_code == 400
+    assert json.loads(response.content)["detail"].startswith("Could not read the loan book")
@@ -0,0 +1,51 @@
+import app
+from metrics import route_template
+
+
+def scope(method, path):
+    return {"type": "http", "method": method, "path": path, "root_path": "", "app": app.app}
+
+
+def test_route_template():
+    assert route_template(scope("GET", "/schedules/abc123")) == "/schedules/{schedule_id}"
+    assert route_template(scope("GET", "/schedules/abc123/rows")) == "/schedules/{schedule_id}/rows"
+    assert route_template(scope("POST", "/sweep")) == "/sweep"
+
+
+def test_unmatched_paths_share_one_label():
+    assert route_template(scope("GET", "/no-such-endpoint/42")) == "other"
+    # The path matches, the method doesn't
+    assert route_template(scope("GET", "/sweep")) == "other"
+    assert route_template({"type": "http", "method": "GET", "path": "/sweep"}) == "other"
+
+
+def duration_count(client, endpoint, status):
+    prefix = f'loan_request_duration_seconds_count{{endpoint="{endpoint}",status="{status}"}} '
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(prefix):
+            return int(float(line[len(prefix):]))
+    return 0
+
+
+def test_requests_are_labelled_by_route(client):
+    before = duration_count(client, "/schedules/{schedule_id}", 404)
+    client.get("/schedules/first-unknown")
+    client.get("/schedules/second-unknown")
+    assert duration_count(client, "/schedules/{schedule_id}", 404) == before + 2
+    before = duration_count(client, "other", 404)
+    client.get("/no-such-endpoint")
+    assert duration_count(client, "other", 404) == before + 1
+    assert "/no-such-endpoint" not in client.get("/metrics").text
+
+
+def test_errors_are_counted_by_endpoint(client, loan):
+    client.post("/solve", json={"loan": loan, "solve_for": "margin", "target": "payment_amount", "value": 1})
+    assert 'loan_errors_total{endpoint="/solve",type="ValueError"}' in client.get("/metrics").text
+
+
+def test_server_timing(client, loan):
+    response = client.post("/calculate-loan-amortization", json={**loan, "loan_amount": 99999},
+                           headers={"X-Server-Timing": "1"})
+    phases = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert "amortization" in phases and phases[-1] == "total"
+    assert "Server-Timing" not in client.post("/calculate-loan-amortization", json=loan).headers
@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+
+from payment_calendar import get_payment_calendar, get_periods_per_year, next_payment_date
+
+
+def test_payment_calendars_are_shared():
+    calendar = get_payment_calendar("Monthly", date(2025, 1, 15), 12)
+    assert len(calendar) >= 12
+    assert calendar.dates[:3] == (date(2025, 1, 15), date(2025, 2, 15), date(2025, 3, 15))
+    assert list(calendar.days[:2]) == [31, 28]
+    assert get_payment_calendar("Monthly", date(2025, 1, 15), 20) is calendar
+
+
+def test_calendar_days_lead_to_the_next_date():
+    calendar = get_payment_calendar("Bi-Weekly", date(2025, 1, 1), 30)
+    assert set(calendar.days) == {14}
+    assert all((later - earlier).days == days
+               for earlier, later, days in zip(calendar.dates, calendar.dates[1:], calendar.days))
+
+
+@pytest.mark.parametrize("frequency, expected", [
+    ("Semimonthly 1st and 15th", [date(2025, 1, 15), date(2025, 2, 1), date(2025, 2, 15)]),
+    ("Semimonthly 15th and EOM", [date(2025, 1, 15), date(2025, 2, 1), date(2025, 2, 15)]),
+])
+def test_fixed_day_semimonthly_dates(frequency, expected):
+    assert list(get_payment_calendar(frequency, date(2025, 1, 1), 3).dates[1:4]) == expected
+
+
+def test_payment_calendar_stops_at_the_last_representable_date():
+    calendar = get_payment_calendar("Annually", date(9990, 1, 1), 20)
+    assert calendar.dates[-1] == date(9999, 1, 1)
+    assert calendar.error is not None
+
+
+def test_unsupported_frequency():
+    with pytest.raises(ValueError, match="Unsupported payment frequency"):
+        get_payment_calendar("Hourly", date(2025, 1, 1), 12)
+    with pytest.raises(ValueError, match="Unsupported payment frequency"):
+        next_payment_date("Hourly", date(2025, 1, 1))
+    with pytest.raises(ValueError, match="Unsupported payment frequency"):
+        get_periods_per_year("Hourly")
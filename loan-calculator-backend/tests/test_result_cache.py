@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from result_cache import ResultCache, canonical_request_hash
+
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_request_hash({"a": 1, "b": [1, 2]}) == canonical_request_hash({"b": [1, 2], "a": 1})
+    assert canonical_request_hash({"a": 1}) != canonical_request_hash({"a": 2})
+
+
+def test_hits_and_misses():
+    cache = ResultCache()
+    calls = []
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "value") == "value"
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "other") == "value"
+    assert cache.get("k") == "value"
+    assert cache.peek("k") == "value"
+    assert cache.get("missing") is None
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (2, 1, 1, 5)
+
+
+def test_least_recently_used_entry_is_evicted_by_count():
+    cache = ResultCache(max_entries=2)
+    for key in "abc":
+        cache.get_or_compute(key, lambda: key)
+        cache.get("a")
+    assert cache.peek("b") is None
+    assert cache.peek("a") == "a" and cache.peek("c") == "c"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_by_bytes():
+    cache = ResultCache(max_bytes=10)
+    cache.get_or_compute("a", lambda: "x" * 6)
+    cache.get_or_compute("b", lambda: "y" * 6)
+    assert cache.peek("a") is None and cache.stats()["bytes"] == 6
+    # Values larger than the budget aren't stored at all
+    cache.get_or_compute("c", lambda: "z" * 11)
+    assert cache.peek("c") is None and cache.peek("b") == "y" * 6
+
+
+def test_entries_expire():
+    cache = ResultCache(ttl_seconds=0)
+    cache.get_or_compute("a", lambda: "value")
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_failures_are_not_cached():
+    cache = ResultCache()
+
+    def fail():
+        raise ValueError("bad loan")
+
+    with pytest.raises(ValueError, match="bad loan"):
+        cache.get_or_compute("k", fail)
+    assert cache.get_or_compute("k", lambda: "value") == "value"
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+    waiter.start()
+    while cache.stats()["coalesced"] == 0:
+        pass
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == ["value", "value"]
+    assert len(calls) == 1
+
+
+def test_clear():
+    cache = ResultCache()
+    cache.get_or_compute("a", lambda: "value")
+    cache.clear()
+    assert cache.peek("a") is None and cache.stats()["bytes"] == 0
+
+
+def test_repeated_requests_are_cache_hits(client, loan):
+    loan = {**loan, "loan_amount": 54321}
+    first = client.post("/calculate-loan-amortization", json=loan)
+    hits = client.get("/cache-stats").json()["hits"]
+    # Key order doesn't change the request
+    second = client.post("/calculate-loan-amortization", json=dict(reversed(list(loan.items()))))
+    assert second.content == first.content
+    assert client.get("/cache-stats").json()["hits"] == hits + 1
+
+
+def test_etag_revalidation(client, loan):
+    etag = client.post("/calculate-loan-amortization", json=loan).headers["ETag"]
+    response = client.post("/calculate-loan-amortization", json=loan, headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+    assert client.post("/calculate-loan-amortization", json=loan, headers={"If-None-Match": "*"}).status_code == 304
+    response = client.post("/calculate-loan-amortization", json={**loan, "loan_term": 120},
+                           headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
@@ -0,0 +1,31 @@
+import pytest
+
+
+def calculate(client, loan):
+    return client.post("/calculate-loan-amortization", json=loan)
+
+
+@pytest.mark.parametrize("rollup, buckets", [
+    ({"by": "calendar_year"}, 31),
+    ({"by": "fiscal_year", "fiscal_year_start_month": 7}, 31),
+    ({"by": "periods", "periods": 60}, 7),
+])
+def test_rollups(client, loan, rollup, buckets):
+    body = calculate(client, {**loan, "summary_only": True, "rollup": rollup}).json()
+    rollups = body["rollups"]
+    assert len(rollups) == buckets
+    assert sum(bucket["payments"] for bucket in rollups) == body["actual_loan_term"]
+    assert round(sum(bucket["interest_paid"] for bucket in rollups), 2) == pytest.approx(body["total_interest"], abs=0.05)
+    assert body["amortization_schedule"] is None
+
+
+def test_fiscal_years_are_named_for_the_year_they_end_in(client, loan):
+    rollups = calculate(client, {**loan, "summary_only": True,
+                                 "rollup": {"by": "fiscal_year", "fiscal_year_start_month": 7}}).json()["rollups"]
+    assert (rollups[0]["bucket"], rollups[0]["payments"]) == ("FY2025", 6)
+
+
+def test_periods_rollup_needs_periods(client, loan):
+    response = calculate(client, {**loan, "rollup": {"by": "periods"}})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "periods is required for a 'periods' rollup"}
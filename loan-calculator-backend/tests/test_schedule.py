@@ -0,0 +1,52 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from schedule import SCHEDULE_FIELDS, Schedule, decimal_to_cents
+
+
+def make_schedule():
+    schedule = Schedule()
+    schedule.append(1, date(2025, 1, 1), Decimal("1000"), Decimal("505.005"), Decimal("0"), Decimal("5.004"),
+                    Decimal("500.001"), Decimal("0"), Decimal("499.999"), 6.0)
+    schedule.append_cents(2, date(2025, 2, 1), 50000, 50250, 0, 250, 50000, 0, 0, 6.125)
+    return schedule
+
+
+def test_decimal_to_cents_rounds_like_the_reported_amounts():
+    for amount in ("0.005", "0.015", "1.235", "-2.675", "123456.789"):
+        assert decimal_to_cents(Decimal(amount)) / 100 == float(round(Decimal(amount), 2))
+
+
+def test_rows():
+    schedule = make_schedule()
+    assert len(schedule) == 2
+    assert schedule[0] == {"payment_number": 1, "payment_date": "2025-01-01", "start_balance": 1000.0,
+                           "payment_amount": 505.0, "additional_principal": 0.0, "interest_paid": 5.0,
+                           "principal_paid": 500.0, "insurance_paid": 0.0, "ending_balance": 500.0,
+                           "interest_rate": 6.0}
+    assert schedule.column("payment_amount") == [505.0, 502.5]
+    assert list(schedule.rows(("payment_number", "payment_date"))) == [(1, "2025-01-01"), (2, "2025-02-01")]
+
+
+def test_json_matches_the_rows():
+    schedule = make_schedule()
+    rows = [{field: row[field] for field in SCHEDULE_FIELDS} for row in schedule]
+    assert json.loads(schedule.to_json()) == rows
+    assert list(schedule.iter_json()) == [json.dumps(row, separators=(",", ":")) for row in rows]
+
+
+def test_head_extend_and_clear():
+    schedule = make_schedule()
+    head = schedule.head(1)
+    assert list(head) == [schedule[0]]
+    head.extend(schedule)
+    assert [row["payment_number"] for row in head] == [1, 1, 2]
+    head.clear()
+    assert len(head) == 0 and len(schedule) == 2
+
+
+def test_equality():
+    assert make_schedule() == make_schedule()
+    assert make_schedule() == list(make_schedule())
+    assert make_schedule() != make_schedule().head(1)
@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import app
+from schedule import Schedule
+from schedule_store import ScheduleStore
+
+
+def make_schedule(payments):
+    schedule = Schedule()
+    for number in range(1, payments + 1):
+        schedule.append_cents(number, date(2025, 1, 1) + timedelta(days=30 * number), 100000, 1000, 0, 500, 500, 0,
+                              99500, 6.0)
+    return schedule
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScheduleStore(str(tmp_path / "schedules.sqlite3"))
+    yield store
+    store.close()
+
+
+def stored_bytes(store):
+    (total,) = store.connect().execute("SELECT COALESCE(SUM(size), 0) FROM schedules").fetchone()
+    return total
+
+
+def test_summary_and_rows(store):
+    schedule = make_schedule(10)
+    store.save("a", b'{"total_interest":5.0}', schedule)
+    assert store.summary("a") == (10, b'{"total_interest":5.0}')
+    payments, rows = store.rows("a")
+    assert payments == 10 and rows == schedule
+    payments, rows = store.rows("a", 3, 4)
+    assert payments == 10 and list(rows.payment_number) == [4, 5, 6, 7]
+
+
+def test_row_ranges_are_clamped(store):
+    store.save("a", b"{}", make_schedule(5))
+    assert list(store.rows("a", 3, 100)[1].payment_number) == [4, 5]
+    assert len(store.rows("a", 10)[1]) == 0
+    assert len(store.rows("a", 0, 0)[1]) == 0
+
+
+def test_unknown_schedule(store):
+    assert store.summary("missing") is None
+    assert store.rows("missing") is None
+
+
+def test_running_total_matches_the_stored_sizes(store, tmp_path):
+    store.save("a", b"{}", make_schedule(10))
+    store.save("b", b"{}", make_schedule(20))
+    # Replacing a schedule counts only its new size
+    store.save("a", b"{}", make_schedule(5))
+    assert store.stats()["bytes"] == stored_bytes(store)
+    assert store.stats()["entries"] == 2
+    store.close()
+    reopened = ScheduleStore(str(tmp_path / "schedules.sqlite3"))
+    try:
+        assert reopened.stats()["bytes"] == stored_bytes(store)
+    finally:
+        reopened.close()
+
+
+def test_least_recently_used_schedules_are_evicted(tmp_path):
+    size = len(b"{}") + 10 * 8 * 10
+    store = ScheduleStore(str(tmp_path / "schedules.sqlite3"), max_bytes=2 * size)
+    try:
+        store.save("a", b"{}", make_schedule(10))
+        store.save("b", b"{}", make_schedule(10))
+        store.summary("a")
+        store.save("c", b"{}", make_schedule(10))
+        assert store.summary("b") is None
+        assert store.summary("a") is not None and store.summary("c") is not None
+        assert store.stats() == {"entries": 2, "bytes": 2 * size, "max_bytes": 2 * size, "evictions": 1}
+        assert stored_bytes(store) == 2 * size
+    finally:
+        store.close()
+
+
+def test_stored_and_read_by_id(client, loan):
+    response = client.post("/schedules", json={**loan, "summary_only": True})
+    assert response.status_code == 200
+    body = response.json()
+    schedule_id = body["schedule_id"]
+    assert body["payments"] == 361
+    # The same ID as the JSON response's
+    assert client.post("/calculate-loan-amortization", json=loan).headers["X-Schedule-Id"] == schedule_id
+
+    assert client.get(f"/schedules/{schedule_id}").json() == body
+    rows = client.get(f"/schedules/{schedule_id}/rows", params={"start": 360, "count": 5}).json()
+    assert rows["start"] == 360 and rows["payments"] == 361
+    assert [row["payment_number"] for row in rows["rows"]] == [360, 361]
+    full = client.post("/calculate-loan-amortization", json=loan).json()["amortization_schedule"]
+    assert client.get(f"/schedules/{schedule_id}/rows").json()["rows"] == full
+
+
+def test_stored_schedule_exports(client, loan):
+    schedule_id = client.post("/schedules", json=loan).json()["schedule_id"]
+    response = client.get(f"/schedules/{schedule_id}/export", params={"format": "csv"})
+    assert response.status_code == 200
+    lines = list(csv.reader(io.StringIO(response.text)))
+    assert lines[0][0] == "Payment Number" and lines[361][0] == "361"
+    assert lines[363] == ["Summary"]
+    response = client.get(f"/schedules/{schedule_id}/export")
+    assert response.status_code == 200
+    assert response.content[:2] == b"PK"
+    assert client.get(f"/schedules/{schedule_id}/export", params={"format": "pdf"}).status_code == 400
+
+
+def test_evicted_schedule_is_stored_again_from_the_result_cache(client, loan):
+    loan = {**loan, "loan_amount": 123456}
+    schedule_id = client.post("/calculate-loan-amortization", json=loan).headers["X-Schedule-Id"]
+    connection = app.schedule_store.connect()
+    with app.schedule_store.lock:
+        connection.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+    assert client.get(f"/schedules/{schedule_id}").json()["payments"] == 361
+
+
+def test_unknown_schedule_id(client):
+    response = client.get("/schedules/missing")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Unknown schedule: missing"}
+    assert client.get("/schedules/missing/rows").status_code == 404
+
+
+@pytest.mark.parametrize("params", [{"start": 0}, {"count": -1}])
+def test_invalid_row_range(client, params):
+    assert client.get("/schedules/missing/rows", params=params).status_code == 400
+
+
+def test_store_stats(client):
+    stats = client.get("/schedule-store-stats").json()
+    assert set(stats) == {"entries", "bytes", "max_bytes", "evictions"}
+
+
+def test_disabled_store(client, loan, monkeypatch):
+    monkeypatch.setattr(app, "schedule_store", None)
+    assert "X-Schedule-Id" not in client.post("/calculate-loan-amortization", json=loan).headers
+    for response in (client.post("/schedules", json=loan), client.get("/schedules/any"),
+                     client.get("/schedules/any/rows"), client.get("/schedule-store-stats")):
+        assert response.status_code == 501
+        assert json.loads(response.content) == {"detail": "The schedule store is disabled"}
@@ -0,0 +1,97 @@
+import pytest
+
+
+def solve(client, loan, solve_for, target, **fields):
+    return client.post("/solve", json={"loan": loan, "solve_for": solve_for, "target": target, **fields})
+
+
+def summary(client, loan):
+    return client.post("/calculate-loan-amortization", json={**loan, "summary_only": True}).json()
+
+
+def test_loan_amount_for_a_payment(client, loan):
+    response = solve(client, loan, "loan_amount", "payment_amount", value=500)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["method"] == "closed_form"
+    assert body["result"]["payment_amount"] <= 500
+    # The largest amount: a cent more needs a larger payment
+    assert summary(client, {**loan, "loan_amount": body["loan_amount"] + 0.01})["payment_amount"] > 500
+
+
+@pytest.mark.parametrize("loan_amount", [100, 100000, 50_000_000])
+def test_loan_amount_from_any_starting_amount(client, loan, loan_amount):
+    # Insured payments have no closed form, so this searches from the loan's own amount
+    loan = {**loan, "loan_amount": loan_amount, "credit_insurance": True}
+    body = solve(client, loan, "loan_amount", "payment_amount", value=750).json()
+    assert body["method"] == "bracketed_search"
+    assert body["result"]["payment_amount"] <= 750
+    assert summary(client, {**loan, "loan_amount": body["loan_amount"] + 0.01})["payment_amount"] > 750
+
+
+def test_additional_principal_for_a_payoff_term(client, loan):
+    body = solve(client, loan, "additional_principal", "actual_loan_term", value=240).json()
+    assert body["result"]["actual_loan_term"] <= 240
+    # The smallest amount: a cent less pays off later
+    shorter = summary(client, {**loan, "additional_principal": round(body["additional_principal"] - 0.01, 2)})
+    assert shorter["actual_loan_term"] > 240
+
+
+def test_loan_term_for_a_payoff_date(client, loan):
+    body = solve(client, loan, "loan_term", "payoff_date", payoff_date="2044-12-31").json()
+    assert body["result"]["payoff_date"] <= "2044-12-31"
+
+
+def test_interest_rate_for_total_interest(client, loan):
+    body = solve(client, loan, "annual_interest_rate", "total_interest", value=50000).json()
+    assert body["result"]["total_interest"] <= 50000
+    assert summary(client, {**loan, "annual_interest_rate": body["annual_interest_rate"] + 0.0001})[
+        "total_interest"] > 50000
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"solve_for": "margin", "target": "payment_amount", "value": 1}, "Unsupported solve_for: margin"),
+    ({"solve_for": "loan_amount", "target": "apr", "value": 1}, "Unsupported target: apr"),
+    ({"solve_for": "loan_amount", "target": "total_interest"}, "value is required for target 'total_interest'"),
+    ({"solve_for": "loan_amount", "target": "payoff_date"}, "payoff_date is required"),
+    ({"solve_for": "additional_principal", "target": "payment_amount", "value": 1},
+     "additional_principal doesn't determine the payment amount"),
+    ({"solve_for": "loan_amount", "target": "payoff_date", "payoff_date": "2024-01-01"},
+     "payoff_date is before the first due date"),
+])
+def test_invalid_solves(client, loan, fields, message):
+    response = client.post("/solve", json={"loan": loan, **fields})
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
+
+def test_fixed_payment_can_not_be_a_target(client, loan):
+    response = solve(client, {**loan, "payment_amount": 700}, "loan_amount", "payment_amount", value=500)
+    assert response.status_code == 400
+    assert "payment_amount is fixed" in response.json()["detail"]
+
+
+def test_interest_rate_of_an_adjustable_rate_loan(client, arm_loan):
+    response = solve(client, arm_loan, "annual_interest_rate", "total_interest", value=1000)
+    assert response.status_code == 400
+    assert "adjustable-rate" in response.json()["detail"]
+
+
+def test_unreachable_target(client, loan):
+    response = solve(client, loan, "loan_amount", "payment_amount", value=0.1)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("No loan_amount between 100 and")
+
+
+def test_solve_stops_at_the_deadline(client, loan, worker_lane, post_when_admitted):
+    # Each evaluation of an insured daily loan takes about 0.1 seconds; the deadline stops the search
+    # rather than failing one evaluation
+    insured = {**loan, "payment_frequency": "Daily", "days_method": "Actual", "year_basis": 365, "loan_term": 7300,
+               "credit_insurance": True}
+    response = client.post("/solve", json={"loan": insured, "solve_for": "loan_amount", "target": "total_interest",
+                                           "value": 20000}, headers={"X-Request-Timeout": "0.5"})
+    assert response.status_code == 504
+    response = post_when_admitted("/solve", {"loan": loan, "solve_for": "loan_amount", "target": "payment_amount",
+                                             "value": 500})
+    assert response.status_code == 200
+    assert worker_lane.stats()["timed_out"] == 1
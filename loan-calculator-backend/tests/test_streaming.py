@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+import pytest
+
+import app
+
+
+def calculate(client, loan):
+    return client.post("/calculate-loan-amortization", json=loan)
+
+
+@pytest.mark.parametrize("response_format", ["ndjson", "csv"])
+def test_streamed_schedules(client, loan, response_format):
+    body = calculate(client, loan).json()
+    rows = body["amortization_schedule"]
+    response = calculate(client, {**loan, "response_format": response_format})
+    assert response.status_code == 200
+    if response_format == "ndjson":
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[:-1] == rows
+        assert lines[-1]["summary"]["total_interest"] == body["total_interest"]
+    else:
+        lines = list(csv.reader(io.StringIO(response.text)))
+        assert lines[0][0] == "Payment Number"
+        assert [int(line[0]) for line in lines[1:len(rows) + 1]] == [row["payment_number"] for row in rows]
+        assert lines[len(rows) + 2] == ["Summary"]
+        assert ["Total Interest", str(body["total_interest"])] in lines
+
+
+def test_rows_are_streamed_in_chunks(client, loan, monkeypatch):
+    rows = calculate(client, loan).json()["amortization_schedule"]
+    monkeypatch.setattr(app, "STREAM_CHUNK_ROWS", 7)
+    lines = calculate(client, {**loan, "response_format": "ndjson"}).text.splitlines()
+    assert [json.loads(line) for line in lines[:-1]] == rows
+
+
+def test_summary_only_stream(client, loan):
+    lines = calculate(client, {**loan, "response_format": "ndjson", "summary_only": True}).text.splitlines()
+    assert len(lines) == 1 and "summary" in json.loads(lines[0])
+
+
+def test_errors_are_reported_in_the_stream(client, loan):
+    # The payment doesn't cover the interest, which the engine only finds at the first payment
+    response = calculate(client, {**loan, "payment_amount": 100, "response_format": "ndjson"})
+    assert response.status_code == 200
+    assert "Negative amortization" in json.loads(response.text.splitlines()[-1])["error"]
+    lines = list(csv.reader(io.StringIO(calculate(client, {**loan, "payment_amount": 100,
+                                                            "response_format": "csv"}).text)))
+    assert lines[-1][0] == "Error"
+
+
+def test_unsupported_response_format(client, loan):
+    response = calculate(client, {**loan, "response_format": "xml"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unsupported response format: xml"}
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import app
+from app import SweepRange, SweepRequest, sweep_axes
+
+
+def axes_of(loan, **fields):
+    return sweep_axes(SweepRequest(base=loan, **fields))
+
+
+def test_ranges_are_expanded_and_values_deduplicated(loan):
+    axes = axes_of(loan, annual_interest_rate={"start": 5, "stop": 6, "step": 0.25}, loan_term=[360, 180, 360])
+    assert axes == {"annual_interest_rate": [5.0, 5.25, 5.5, 5.75, 6.0], "loan_term": [360, 180]}
+
+
+def test_range_stop_is_left_out_between_steps(loan):
+    assert axes_of(loan, additional_principal={"start": 0, "stop": 250, "step": 100}) == {
+        "additional_principal": [0.0, 100.0, 200.0]}
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({}, "Provide at least one field to sweep"),
+    ({"loan_term": {"start": 12, "stop": 13, "step": 0.5}}, "loan_term values must be whole numbers of at least 1"),
+    ({"amort_term": {"start": 0, "stop": 10, "step": 5}}, "amort_term values must be whole numbers of at least 1"),
+    ({"payment_amount": {"start": -100, "stop": 100, "step": 100}}, "payment_amount values must not be negative"),
+    ({"additional_principal": {"start": 10, "stop": 0, "step": 1}}, "additional_principal has no values to sweep"),
+])
+def test_invalid_sweeps(loan, fields, message):
+    with pytest.raises(ValueError, match=message):
+        axes_of(loan, **fields)
+
+
+def test_non_finite_range(loan):
+    request = SweepRequest(base=loan, payment_amount=SweepRange(start=0, stop=float("inf"), step=1))
+    with pytest.raises(ValueError, match="payment_amount range must have finite start, stop and step"):
+        sweep_axes(request)
+
+
+def test_interest_rate_of_an_adjustable_rate_loan(arm_loan):
+    with pytest.raises(ValueError, match="can't be swept for adjustable-rate loans"):
+        axes_of(arm_loan, annual_interest_rate=[5, 6])
+
+
+def test_grid_size_limit_across_axes(loan):
+    limit = app.SWEEP_MAX_POINTS
+    with pytest.raises(ValueError, match=f"The sweep has {limit + 1} points; the limit is {limit}"):
+        axes_of(loan, loan_term=list(range(1, limit + 2)))
+    with pytest.raises(ValueError, match=f"the limit is {limit}"):
+        axes_of(loan, loan_term=list(range(1, 101)), additional_principal=list(range(100)))
+
+
+def test_oversized_range_is_rejected_before_it_is_expanded(loan):
+    started = time.perf_counter()
+    with pytest.raises(ValueError, match="The sweep has 1000000000001 points"):
+        axes_of(loan, payment_amount={"start": 0, "stop": 1e12, "step": 1})
+    assert time.perf_counter() - started < 1
+
+
+def test_sweep_endpoint(client, loan):
+    response = client.post("/sweep", json={"base": loan, "annual_interest_rate": [5, 6],
+                                           "additional_principal": [0, 100]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["axes"] == {"annual_interest_rate": [5.0, 6.0], "additional_principal": [0.0, 100.0]}
+    assert [point["parameters"] for point in body["points"]] == [
+        {"annual_interest_rate": 5.0, "additional_principal": 0.0},
+        {"annual_interest_rate": 5.0, "additional_principal": 100.0},
+        {"annual_interest_rate": 6.0, "additional_principal": 0.0},
+        {"annual_interest_rate": 6.0, "additional_principal": 100.0},
+    ]
+    # Every point matches the loan calculated on its own
+    for point in body["points"]:
+        single = client.post("/calculate-loan-amortization",
+                             json={**loan, **point["parameters"], "summary_only": True}).json()
+        for field in ("payment_amount", "total_interest", "total_payment", "actual_loan_term", "interest_savings"):
+            assert point[field] == single[field]
+
+
+def test_sweep_endpoint_rejects_invalid_sweeps(client, loan):
+    response = client.post("/sweep", json={"base": loan, "loan_term": {"start": 12, "stop": 13, "step": 0.5}})
+    assert response.status_code == 400
+    assert "whole numbers" in response.json()["detail"]
+
+
+def test_sweep_stops_at_the_deadline(client, loan, worker_lane, post_when_admitted):
+    # 60 insured daily loans take several seconds; the deadline stops the sweep, not just the point
+    # it interrupts
+    base = {**loan, "payment_frequency": "Daily", "days_method": "Actual", "year_basis": 365, "credit_insurance": True}
+    response = client.post("/sweep", json={"base": base, "loan_term": list(range(3600, 3660))},
+                           headers={"X-Request-Timeout": "0.5"})
+    assert response.status_code == 504
+    assert post_when_admitted("/sweep", {"base": loan, "loan_term": [120]}).status_code == 200
+    assert worker_lane.stats()["timed_out"] == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from app import LoanRequest, create_calculator
+from loan_samples import random_loans
+from vector_engine import amortize_fixed_rate
+
+
+def decimal_results(requests):
+    results = []
+    for request in requests:
+        try:
+            results.append(create_calculator(request).get_amortization_schedule(kernel="decimal"))
+        except Exception as e:
+            results.append({"error": str(e)})
+    return results
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_vector_engine_matches_the_decimal_engine(seed):
+    requests = random_loans(seed, 60)
+    actual = amortize_fixed_rate([create_calculator(request) for request in requests], keep_schedule=True)
+    assert actual == decimal_results(requests)
+
+
+def test_vector_engine_leaves_schedules_out_unless_asked(loan):
+    (result,) = amortize_fixed_rate([create_calculator(LoanRequest(**loan))])
+    assert "schedule" not in result
+    assert result["actual_loan_term"] == 361
+
+
+def test_vector_engine_reports_failed_loans(loan):
+    # The payment doesn't cover the interest
+    failing = LoanRequest(**{**loan, "payment_amount": 100})
+    results = amortize_fixed_rate([create_calculator(failing), create_calculator(LoanRequest(**loan))])
+    assert results[0] == decimal_results([failing])[0]
+    assert "error" in results[0] and "error" not in results[1]
+
+
+def test_no_loans():
+    assert amortize_fixed_rate([]) == []
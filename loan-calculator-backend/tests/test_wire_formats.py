@@ -0,0 +1,122 @@
+import gzip
+import json
+from datetime import date
+
+import pytest
+
+import wire_formats
+from schedule import Schedule
+from wire_formats import (COLUMNS_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, compress, encode_result,
+                          negotiate_encoding, negotiate_media_type, representation_etag)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON_MEDIA_TYPE),
+    ("*/*", JSON_MEDIA_TYPE),
+    ("application/*", JSON_MEDIA_TYPE),
+    ("text/html, application/vnd.pmovescalc.columns+json", COLUMNS_MEDIA_TYPE),
+    ("application/json;q=0.5, application/vnd.pmovescalc.columns+json", COLUMNS_MEDIA_TYPE),
+    ("application/vnd.pmovescalc.columns+json;q=0, application/json;q=0.1", JSON_MEDIA_TYPE),
+    ("text/html", None),
+    ("application/json;q=0", None),
+])
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+def test_msgpack_aliases():
+    pytest.importorskip("msgpack")
+    assert negotiate_media_type("application/x-msgpack") == MSGPACK_MEDIA_TYPE
+    assert negotiate_media_type("application/vnd.msgpack, */*;q=0.1") == MSGPACK_MEDIA_TYPE
+
+
+def test_msgpack_is_not_offered_without_msgpack(monkeypatch):
+    monkeypatch.setattr(wire_formats, "msgpack", None)
+    assert negotiate_media_type("application/msgpack") is None
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("gzip", "gzip"),
+    ("identity", None),
+    ("deflate", None),
+    ("gzip;q=0, identity", None),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_brotli_is_preferred_when_available(monkeypatch):
+    assert negotiate_encoding("*") == ("br" if wire_formats.brotli is not None else "gzip")
+    monkeypatch.setattr(wire_formats, "brotli", None)
+    assert negotiate_encoding("br, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("*") == "gzip"
+
+
+def test_compress():
+    assert gzip.decompress(compress(b"body" * 100, "gzip")) == b"body" * 100
+    with pytest.raises(ValueError, match="Unsupported content coding"):
+        compress(b"body", "deflate")
+
+
+def test_representation_etag():
+    assert representation_etag('"abc"', JSON_MEDIA_TYPE, None) == '"abc"'
+    assert representation_etag('"abc"', COLUMNS_MEDIA_TYPE, "gzip") == '"abc-columns-gzip"'
+    assert representation_etag('"abc"', MSGPACK_MEDIA_TYPE, "br") == '"abc-msgpack-br"'
+
+
+def make_schedule():
+    schedule = Schedule()
+    schedule.append_cents(1, date(2025, 1, 1), 10000, 5050, 0, 50, 5000, 0, 5000, 6.0)
+    schedule.append_cents(2, date(2025, 2, 1), 5000, 5025, 0, 25, 5000, 0, 0, 6.0)
+    return schedule
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_columns_layout(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(wire_formats, "orjson", None)
+    body = json.loads(encode_result({"total_interest": 0.75}, make_schedule(), COLUMNS_MEDIA_TYPE))
+    assert body["total_interest"] == 0.75
+    columns = body["amortization_schedule"]
+    assert columns["payment_number"] == [1, 2]
+    assert columns["payment_date"] == ["2025-01-01", "2025-02-01"]
+    assert columns["payment_amount"] == [50.5, 50.25]
+    assert columns["ending_balance"] == [50.0, 0.0]
+
+
+def test_msgpack_layout():
+    msgpack = pytest.importorskip("msgpack")
+    body = msgpack.unpackb(encode_result({"total_interest": 0.75}, None, MSGPACK_MEDIA_TYPE))
+    assert body == {"total_interest": 0.75, "amortization_schedule": None}
+
+
+def test_unsupported_media_type():
+    with pytest.raises(ValueError, match="Unsupported media type"):
+        encode_result({}, None, "text/html")
+
+
+def test_negotiated_responses(client, loan):
+    rows = client.post("/calculate-loan-amortization", json=loan).json()["amortization_schedule"]
+    response = client.post("/calculate-loan-amortization", json=loan, headers={"Accept": COLUMNS_MEDIA_TYPE})
+    assert response.headers["Content-Type"] == COLUMNS_MEDIA_TYPE
+    columns = response.json()["amortization_schedule"]
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == rows
+
+    response = client.post("/calculate-loan-amortization", json=loan, headers={"Accept": "text/html"})
+    assert response.status_code == 406
+
+
+def test_compressed_responses_and_etags(client, loan):
+    response = client.post("/calculate-loan-amortization", json=loan, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    etag = response.headers["ETag"]
+    assert etag.endswith('-gzip"')
+    assert client.post("/calculate-loan-amortization", json=loan,
+                       headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+    # Another representation doesn't match
+    response = client.post("/calculate-loan-amortization", json=loan,
+                           headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200 and "Content-Encoding" not in response.headers
@@ -0,0 +1,385 @@
+# Vectorized amortization of many fixed-rate loans at once.
+#
+# Each loan is a lane in a set of NumPy int64 arrays holding balances in cents. Interest is
+# kept exact as an integer quotient/remainder over a per-loan denominator, so the
+# ROUND_HALF_UP/ROUND_HALF_DOWN quantization of LoanCalculator.calculate can be reproduced to the
+# cent. The rare periods that land exactly on a rounding tie are handed to the Decimal engine for
+# that single step, and loans the integer kernel can't represent (ARMs, sub-cent amounts, values
+# that could overflow int64) fall back to the Decimal engine entirely.
+#
+# With a ledger (loan_book.CashFlowLedger) each loan's payments are summed per ledger period as they
+# are amortized and added to the ledger, instead of keeping schedule columns for every period.
+
+from decimal import Decimal
+from fractions import Fraction
+
+import numpy as np
+
+from payment_calendar import get_payment_calendar
+from schedule import Schedule
+
+# Interest numerators are balance_cents * rate_numerator * days and must stay inside int64
+INT64_LIMIT = 2 ** 62
+MAX_DAYS_IN_PERIOD = 366
+
+# Insurance is $0.15 per $100 of balance, capped at $45.00
+INSURANCE_RATE_NUMERATOR = 15
+INSURANCE_RATE_DENOMINATOR = 10000
+MAX_INSURANCE_CENTS = 4500
+
+# Per-loan period totals kept for a ledger: payments, then the amounts in the ledger's order
+# (payment_amount, principal_paid, additional_principal, interest_paid, insurance_paid)
+PERIOD_TOTAL_ROWS = 6
+
+
+def to_cents(value):
+    cents = Decimal(value) * 100
+    if cents != cents.to_integral_value():
+        return None
+    return int(cents)
+
+
+def cents_to_float(cents):
+    return float(Decimal(int(cents)).scaleb(-2))
+
+
+class BatchCalendar:
+    # A shared payment calendar and its row in the batch's day-count table; 30 Day Month lanes only
+    # read the dates
+
+    def __init__(self, frequency, first_due_date, periods):
+        self.frequency = frequency
+        self.first_due_date = first_due_date
+        self.calendar = get_payment_calendar(frequency, first_due_date, periods)
+        self.index = None
+
+    @property
+    def dates(self):
+        return self.calendar.dates
+
+    @property
+    def days(self):
+        return self.calendar.days
+
+    @property
+    def error(self):
+        # Set when the calendar stops at a date that can't be generated; lanes reaching it report it
+        return self.calendar.error
+
+    def extend(self, periods):
+        if len(self.calendar) < periods and self.calendar.error is None:
+            self.calendar = get_payment_calendar(self.frequency, self.first_due_date, periods)
+
+
+class FixedRateBatch:
+
+    def __init__(self, calculators, keep_schedule=False, ledger=None):
+        self.calculators = calculators
+        self.keep_schedule = keep_schedule
+        self.ledger = ledger
+        self.results = [None] * len(calculators)
+        self.lanes = []
+        self.calendars = {}
+
+        balances, payments, additional, multipliers, denominators, insured = [], [], [], [], [], []
+        for index, calculator in enumerate(calculators):
+            lane = self.prepare_lane(calculator)
+            if lane is None:
+                self.results[index] = self.calculate_scalar(calculator)
+                continue
+            self.lanes.append(index)
+            balances.append(lane[0])
+            payments.append(lane[1])
+            additional.append(lane[2])
+            multipliers.append(lane[3])
+            denominators.append(lane[4])
+            insured.append(calculator.credit_insurance)
+
+        self.balance = np.array(balances, dtype=np.int64)
+        self.payment = np.array(payments, dtype=np.int64)
+        self.additional = np.array(additional, dtype=np.int64)
+        self.multiplier = np.array(multipliers, dtype=np.int64)
+        self.denominator = np.array(denominators, dtype=np.int64)
+        self.insured = np.array(insured, dtype=bool)
+        self.uses_days = np.array([calculators[i].days_method == 'Actual' for i in self.lanes], dtype=bool)
+
+    def prepare_lane(self, calculator):
+        # Returns the integer parameters of a loan, or None when it must run on the Decimal engine
+        if calculator.is_adjustable_rate or calculator.period_overrides or calculator.rollup_options:
+            return None
+
+        principal = to_cents(calculator.principal)
+        payment = to_cents(calculator.payment_amount)
+        additional = to_cents(calculator.additional_principal)
+        if principal is None or payment is None or additional is None:
+            return None
+
+        rate = Fraction(calculator.current_interest_rate)
+        if calculator.days_method == 'Actual':
+            denominator = rate.denominator * calculator.year_basis
+            max_days = MAX_DAYS_IN_PERIOD
+        elif calculator.days_method == '30 Day Month' and calculator.year_basis == 360:
+            denominator = rate.denominator * 12
+            max_days = 1
+        else:
+            # Unsupported days methods raise on the first period; let the Decimal engine report it
+            return None
+
+        if principal * rate.numerator * max_days >= INT64_LIMIT or denominator >= INT64_LIMIT:
+            return None
+
+        return principal, payment, additional, rate.numerator, denominator
+
+    def calculate_scalar(self, calculator):
+        try:
+            data = calculator.get_amortization_schedule()
+        except Exception as e:
+            return {'error': str(e)}
+        if self.ledger is not None:
+            self.ledger.add(data['schedule'])
+        if not self.keep_schedule:
+            del data['schedule']
+        return data
+
+    def calendar_for(self, calculator):
+        key = (calculator.payment_frequency, calculator.first_due_date)
+        calendar = self.calendars.get(key)
+        if calendar is None:
+            # Sized for this loan up front; building a short calendar first would cost a second pass
+            calendar = self.calendars[key] = BatchCalendar(*key, calculator.amort_term + 1)
+        return calendar
+
+    def run(self):
+        if not self.lanes:
+            return self.results
+
+        count = len(self.lanes)
+        calendars = []
+        calendar_index = np.zeros(count, dtype=np.int64)
+        for lane, index in enumerate(self.lanes):
+            calendar = self.calendar_for(self.calculators[index])
+            if calendar.index is None:
+                calendar.index = len(calendars)
+                calendars.append(calendar)
+            calendar_index[lane] = calendar.index
+
+        for lane, index in enumerate(self.lanes):
+            calendars[calendar_index[lane]].extend(self.calculators[index].amort_term + 1)
+
+        balance = self.balance.copy()
+        active = balance > 0
+        error = [None] * count
+        fallback = np.zeros(count, dtype=bool)
+
+        interest_quotient = np.zeros(count, dtype=np.int64)
+        interest_remainder = np.zeros(count, dtype=np.int64)
+        total_insurance = np.zeros(count, dtype=np.int64)
+        total_additional = np.zeros(count, dtype=np.int64)
+        total_payment = np.zeros(count, dtype=np.int64)
+        payments = np.zeros(count, dtype=np.int64)
+        columns = []
+
+        days_table, limits = self.day_count_table(calendars, 0)
+        if self.ledger is not None:
+            period_table, first_period, period_totals = self.period_totals_table(calendars, limits, days_table.shape[1])
+        period = 0
+        while active.any():
+            period += 1
+            exhausted = active & (limits[calendar_index] < period)
+            if exhausted.any():
+                # A loan outlived its calendar (e.g. a payment that doesn't quite amortize in term)
+                for calendar_number in np.unique(calendar_index[exhausted]):
+                    calendars[calendar_number].extend(period * 2)
+                days_table, limits = self.day_count_table(calendars, period)
+                if self.ledger is not None:
+                    period_table, first_period, period_totals = self.period_totals_table(
+                        calendars, limits, days_table.shape[1], first_period, period_totals)
+                exhausted = active & (limits[calendar_index] < period)
+            for lane in np.nonzero(exhausted)[0]:
+                error[lane] = calendars[calendar_index[lane]].error
+                active[lane] = False
+
+            days = np.where(self.uses_days, days_table[calendar_index, period - 1], 1)
+
+            # Exact interest in cents: quotient + remainder / denominator
+            numerator = balance * self.multiplier * days
+            quotient, remainder = np.divmod(numerator, self.denominator)
+            twice = remainder * 2
+            interest_rounded = quotient + (twice > self.denominator)
+
+            insurance = np.where(
+                self.insured,
+                np.minimum((balance * INSURANCE_RATE_NUMERATOR + INSURANCE_RATE_DENOMINATOR // 2) // INSURANCE_RATE_DENOMINATOR, MAX_INSURANCE_CENTS),
+                0,
+            )
+
+            scheduled = self.payment + self.additional
+            owed = balance + insurance + quotient
+            exact = remainder == 0
+            final = np.where(exact, owed <= scheduled, owed < scheduled)
+            short = ~final & ((quotient > self.payment - insurance) | ((quotient == self.payment - insurance) & ~exact))
+
+            # Ties, and exact equalities against a Decimal rate that may not terminate, go through Decimal
+            ambiguous = active & ((twice == self.denominator) | (exact & ((owed == scheduled) | (quotient == self.payment - insurance))))
+
+            payment_row = np.where(final, owed - quotient + interest_rounded, scheduled)
+            additional_row = np.where(final, 0, self.additional)
+            principal_row = np.where(final, balance, self.payment - insurance - interest_rounded)
+            ending = np.where(final, 0, balance - self.payment + insurance - self.additional + interest_rounded)
+
+            for lane in np.nonzero(ambiguous)[0]:
+                step = self.decimal_step(lane, balance[lane], days[lane], period)
+                if isinstance(step, str):
+                    error[lane] = step
+                    active[lane] = False
+                elif step is None:
+                    fallback[lane] = True
+                    active[lane] = False
+                else:
+                    payment_row[lane], additional_row[lane], principal_row[lane], interest_rounded[lane], ending[lane] = step
+                    short[lane] = False
+
+            for lane in np.nonzero(active & short & ~ambiguous)[0]:
+                error[lane] = (f"Payment amount is insufficient to cover interest and fees on payment number {period}. "
+                               f"Negative amortization is not allowed.")
+                active[lane] = False
+
+            interest_quotient += np.where(active, quotient, 0)
+            interest_remainder += np.where(active, remainder, 0)
+            carry = interest_remainder >= self.denominator
+            interest_quotient += carry
+            interest_remainder -= np.where(carry, self.denominator, 0)
+            total_insurance += np.where(active, insurance, 0)
+            total_additional += np.where(active, additional_row, 0)
+            total_payment += np.where(active, payment_row + additional_row, 0)
+            payments += active
+
+            if self.ledger is not None:
+                paying = np.nonzero(active)[0]
+                period_columns = period_table[calendar_index[paying], period - 1] - first_period
+                period_totals[:, paying, period_columns] += np.stack(
+                    (active, payment_row, principal_row, additional_row, interest_rounded, insurance))[:, paying]
+
+            if self.keep_schedule:
+                columns.append((active.copy(), balance.copy(), payment_row, additional_row, interest_rounded,
+                                principal_row, insurance, ending))
+
+            balance = np.where(active, np.maximum(ending, 0), balance)
+            active &= balance > 0
+
+        # The final total interest is rounded half-even from the unrounded sum; an exact tie would
+        # depend on Decimal's own rounding of each period, so leave those loans to the Decimal engine
+        total_tie = interest_remainder * 2 == self.denominator
+        total_interest = interest_quotient + (interest_remainder * 2 > self.denominator)
+
+        amortized = []
+        for lane, index in enumerate(self.lanes):
+            calculator = self.calculators[index]
+            if fallback[lane] or total_tie[lane] and error[lane] is None:
+                self.results[index] = self.calculate_scalar(calculator)
+                continue
+            if error[lane] is not None:
+                self.results[index] = {'error': error[lane]}
+                continue
+            data = self.summarize(lane, calculator, total_interest[lane], total_insurance[lane],
+                                  total_additional[lane], total_payment[lane], int(payments[lane]))
+            if isinstance(data, str):
+                self.results[index] = {'error': data}
+                continue
+            if self.keep_schedule:
+                data['schedule'] = self.build_schedule(lane, calculator, calendars[calendar_index[lane]], columns)
+            self.results[index] = data
+            amortized.append(lane)
+
+        if self.ledger is not None:
+            self.ledger.add_loan_totals(first_period, period_totals[:, amortized])
+        return self.results
+
+    def day_count_table(self, calendars, periods):
+        # Day counts per calendar, padded with zeros
+        limits = np.array([len(calendar.days) for calendar in calendars], dtype=np.int64)
+        table = np.zeros((len(calendars), max(limits.max(), periods)), dtype=np.int64)
+        for calendar in calendars:
+            table[calendar.index, :len(calendar.days)] = calendar.days
+        return table, limits
+
+    def period_totals_table(self, calendars, limits, width, first_period=None, period_totals=None):
+        # Ledger period of each calendar's payments, padded with zeros, and the per-loan totals by
+        # period from first_period on, widened to cover every period in the calendars
+        table = np.zeros((len(calendars), width), dtype=np.int64)
+        for calendar in calendars:
+            days = np.frombuffer(calendar.days, dtype=calendar.days.typecode)
+            ordinals = calendar.first_due_date.toordinal() + np.concatenate(([0], np.cumsum(days)[:-1]))
+            table[calendar.index, :len(days)] = self.ledger.period_indexes(ordinals)
+        paid = limits > 0
+        if not paid.any():
+            return table, 0 if first_period is None else first_period, np.zeros((PERIOD_TOTAL_ROWS, len(self.lanes), 0), dtype=np.int64)
+        last = int(table[paid, limits[paid] - 1].max())
+        if period_totals is None:
+            # Payment dates ascend, so no payment falls before the earliest first payment
+            first_period = int(table[paid, 0].min())
+            period_totals = np.zeros((PERIOD_TOTAL_ROWS, len(self.lanes), 0), dtype=np.int64)
+        if last - first_period + 1 > period_totals.shape[2]:
+            period_totals = np.pad(period_totals, ((0, 0), (0, 0), (0, last - first_period + 1 - period_totals.shape[2])))
+        return table, first_period, period_totals
+
+    def decimal_step(self, lane, balance_cents, days, period):
+        # Runs a single period through the Decimal engine. Returns the row in cents, an error
+        # message, or None when the result can't be expressed in whole cents
+        calculator = self.calculators[self.lanes[lane]]
+        balance = Decimal(int(balance_cents)).scaleb(-2)
+        try:
+            interest_paid = calculator.calculate_interest(balance, calculator.current_interest_rate, int(days))
+            if calculator.credit_insurance:
+                insurance_paid = calculator.calculate_insurance_premium(balance)
+            else:
+                insurance_paid = Decimal('0.00')
+            total, principal_paid, additional_paid, ending_balance = calculator.apply_payment(
+                balance, interest_paid, insurance_paid, period)
+        except Exception as e:
+            return str(e)
+
+        total = to_cents(total)
+        additional_paid = to_cents(additional_paid)
+        ending_balance = to_cents(ending_balance)
+        if total is None or additional_paid is None or ending_balance is None:
+            return None
+        return (total, additional_paid, to_cents(round(principal_paid, 2)), to_cents(round(interest_paid, 2)),
+                ending_balance)
+
+    def summarize(self, lane, calculator, total_interest, total_insurance, total_additional, total_payment, payments):
+        payment_amount_no_insurance = calculator.payment_amount
+        if calculator.credit_insurance:
+            try:
+                payment_amount_no_insurance -= calculator.calculate_average_insurance_premium(calculator.payment_amount)
+            except Exception as e:
+                return str(e)
+        return {
+            'total_interest': cents_to_float(total_interest),
+            'total_insurance': cents_to_float(total_insurance),
+            'total_additional_principal': cents_to_float(total_additional),
+            'total_payments': payments,
+            'total_payment': cents_to_float(total_payment),
+            'insurance_premium_per_payment': None,
+            'actual_loan_term': payments,
+            'payment_amount_no_insurance': float(round(payment_amount_no_insurance, 2)),
+        }
+
+    def build_schedule(self, lane, calculator, calendar, columns):
+        interest_rate = float(calculator.current_interest_rate * Decimal('100'))
+        schedule = Schedule()
+        for period, (active, start, payment_row, additional_row, interest_row, principal_row, insurance, ending) \
+                in enumerate(columns, start=1):
+            if not active[lane]:
+                break
+            schedule.append_cents(period, calendar.dates[period - 1], int(start[lane]), int(payment_row[lane]),
+                                  int(additional_row[lane]), int(interest_row[lane]), int(principal_row[lane]),
+                                  int(insurance[lane]), int(ending[lane]), interest_rate)
+        return schedule
+
+
+def amortize_fixed_rate(calculators, keep_schedule=False, ledger=None):
+    # Returns, per calculator, the dict LoanCalculator.get_amortization_schedule() would return
+    # (without 'schedule' unless keep_schedule is set), or {'error': message}. Loans that don't fail
+    # are also added to the ledger, if given
+    return FixedRateBatch(calculators, keep_schedule=keep_schedule, ledger=ledger).run()
@@ -0,0 +1,152 @@
+# Wire formats for computed loan results, chosen by content negotiation. Besides the JSON the API
+# has always returned (one object per schedule row), a result can be sent with its schedule laid out
+# by column, with field names once and one value array per column: as JSON or as MessagePack. Bodies
+# can also be compressed with gzip or brotli.
+#
+# orjson, msgpack and brotli are optional. Without orjson the column layout is written with the json
+# module, without msgpack MessagePack isn't offered, and without brotli only gzip is.
+
+import gzip
+import json
+
+import numpy as np
+
+from schedule import MONEY_FIELDS, SCHEDULE_FIELDS, format_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNS_MEDIA_TYPE = "application/vnd.pmovescalc.columns+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Other names clients use for MessagePack
+MSGPACK_MEDIA_TYPE_ALIASES = ("application/x-msgpack", "application/vnd.msgpack")
+
+# Suffix of a representation's ETag, so each media type and content coding validates separately
+ETAG_SUFFIXES = {COLUMNS_MEDIA_TYPE: "columns", MSGPACK_MEDIA_TYPE: "msgpack", "gzip": "gzip", "br": "br"}
+
+# Compression settings favouring speed: responses are compressed per request
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def offered_media_types():
+    offered = [JSON_MEDIA_TYPE, COLUMNS_MEDIA_TYPE]
+    if msgpack is not None:
+        offered.append(MSGPACK_MEDIA_TYPE)
+    return offered
+
+
+def offered_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def parse_quality_list(header):
+    # [(value, q)] of an Accept or Accept-Encoding header, highest q first (stable for equal q), without q=0
+    entries = []
+    for item in header.split(","):
+        value, *parameters = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, number = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            entries.append((value.lower(), quality))
+    entries.sort(key=lambda entry: -entry[1])
+    return entries
+
+
+def negotiate_media_type(accept):
+    # The media type to answer with, or None if nothing acceptable is offered. Wildcards get JSON
+    if not accept:
+        return JSON_MEDIA_TYPE
+    offered = offered_media_types()
+    for media_type, _ in parse_quality_list(accept):
+        if media_type in MSGPACK_MEDIA_TYPE_ALIASES:
+            media_type = MSGPACK_MEDIA_TYPE
+        if media_type in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+        if media_type in offered:
+            return media_type
+    return None
+
+
+def negotiate_encoding(accept_encoding):
+    # Content coding to compress with, or None to send the body as is
+    if not accept_encoding:
+        return None
+    offered = offered_encodings()
+    for encoding, _ in parse_quality_list(accept_encoding):
+        if encoding == "*":
+            return offered[0]
+        if encoding in offered:
+            return encoding
+        if encoding == "identity":
+            return None
+    return None
+
+
+def schedule_columns(schedule):
+    # Column name -> values as reported (amounts in currency units, dates as 'YYYY-MM-DD'), in
+    # response column order; numeric columns are NumPy arrays, which orjson writes without a
+    # per-value Python object
+    columns = {}
+    for field in SCHEDULE_FIELDS:
+        raw = getattr(schedule, field)
+        if field == "payment_date":
+            columns[field] = [format_date(ordinal) for ordinal in raw]
+        elif field in MONEY_FIELDS:
+            columns[field] = np.frombuffer(raw, dtype=raw.typecode) / 100
+        else:
+            columns[field] = np.frombuffer(raw, dtype=raw.typecode)
+    return columns
+
+
+def encode_result(summary, schedule, media_type):
+    # Body of a result in the column layout: the summary's fields plus "amortization_schedule", an
+    # object of columns (or null without a schedule)
+    columns = None if schedule is None else schedule_columns(schedule)
+    if media_type == COLUMNS_MEDIA_TYPE and orjson is not None:
+        return orjson.dumps({**summary, "amortization_schedule": columns}, option=orjson.OPT_SERIALIZE_NUMPY)
+    if columns is not None:
+        columns = {field: values.tolist() if isinstance(values, np.ndarray) else values
+                   for field, values in columns.items()}
+    if media_type == COLUMNS_MEDIA_TYPE:
+        return json.dumps({**summary, "amortization_schedule": columns}, separators=(",", ":")).encode()
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb({**summary, "amortization_schedule": columns})
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def compress(body, encoding):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+def representation_etag(etag, media_type, encoding):
+    # The JSON body's ETag, tagged with the media type and content coding of this representation
+    suffixes = [ETAG_SUFFIXES[value] for value in (media_type, encoding) if value in ETAG_SUFFIXES]
+    if not suffixes:
+        return etag
+    return etag[:-1] + "-" + "-".join(suffixes) + '"'
@@ -50,6 +50,7 @@ const Home = () => {
   const [additionalPrincipal, setAdditionalPrincipal] = useState('0');
   const [creditInsurance, setCreditInsurance] = useState(false);
   const [result, setResult] = useState(null);
+  const [scheduleId, setScheduleId] = useState(null);
   const [error, setError] = useState(null);
   const [progress, setProgress] = useState(0);
   const [customPaymentAmount, setCustomPaymentAmount] = useState(false);
@@ -224,9 +225,20 @@ const Home = () => {
 
   const handleSaveAsExcel = async () => {
     try {
-      const response = await axios.post('http://localhost:9000/export-excel', result, {
-        responseType: 'blob',
-      });
+      // Stored schedules are exported by ID; otherwise (or once evicted) the whole result is uploaded
+      let response;
+      if (scheduleId) {
+        try {
+          response = await axios.get(`http://localhost:9000/schedules/${scheduleId}/export`, { responseType: 'blob' });
+        } catch (error) {
+          if (error.response?.status !== 404) {
+            throw error;
+          }
+          response = await axios.post('http://localhost:9000/export-excel', result, { responseType: 'blob' });
+        }
+      } else {
+        response = await axios.post('http://localhost:9000/export-excel', result, { responseType: 'blob' });
+      }
       saveAs(new Blob([response.data]), 'Loan_Calculation.xlsx');
     } catch (error) {
       console.error('Error exporting to Excel:', error);
@@ -302,6 +314,7 @@ const Home = () => {
       const response = await axios.post('http://localhost:9000/calculate', data);
       console.log('Received response:', response.data);
       setResult(response.data);
+      setScheduleId(response.headers['x-schedule-id'] || null);
 
       // Update paymentAmount if customPaymentAmount is false
       if (!customPaymentAmount) {